@@ -4,3 +4,10 @@ workers = 3
 timeout = 120
 accesslog = "/tmp/access.log"
 errorlog = "/tmp/error.log"
+
+
+def post_worker_init(worker):
+    # Build the in-memory search index, when it's enabled, before serving
+    from ncdr import search_index
+
+    search_index.warm()
@@ -2,6 +2,8 @@ import csv
 
 from django.core.management.base import BaseCommand
 
+from ncdr.search import index_unversioned
+
 from ...models import Lead, Metric, Operand, Organisation, Report, Team, Theme
 
 
@@ -89,3 +91,6 @@ class Command(BaseCommand):
             )
 
         self.stdout.write(self.style.SUCCESS("Added Metrics"))
+
+        count = index_unversioned()
+        self.stdout.write(f"Indexed {count} objects for search")
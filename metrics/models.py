@@ -12,7 +12,9 @@ class Lead(models.Model):
 
 
 class Metric(BaseModel):
-    SEARCH_FIELDS = ["indicator"]
+    SEARCH_FIELDS = ["indicator", "definition"]
+    # what ncdr.search treats as a Metric's name
+    SEARCH_NAME_FIELD = "indicator"
 
     denominator = models.ForeignKey(
         "Operand", on_delete=models.CASCADE, related_name="denominator_metrics"
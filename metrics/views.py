@@ -6,6 +6,8 @@ from django.db.models import Q
 from django.urls import reverse
 from django.views.generic import DetailView, ListView, TemplateView
 
+from ncdr import search
+
 from .models import Metric
 
 
@@ -75,10 +77,5 @@ class Search(ListView):
     paginate_by = 30
 
     def get_queryset(self):
-        qs = super().get_queryset()
-        q = self.request.GET.get("q", "")
-        if not q:
-            return Metric.objects.none()
-        return qs.filter(
-            Q(indicator__icontains=q) | Q(definition__icontains=q)
-        ).distinct()
+        # Metrics aren't in a Version
+        return search.search(Metric, None, self.request.GET.get("q", ""))
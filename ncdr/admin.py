@@ -1,6 +1,16 @@
 from django.contrib import admin
 
-from .models import Column, Database, DataElement, Grouping, Schema, Table, Version
+from .models import (
+    Column,
+    Database,
+    DataElement,
+    Grouping,
+    ImportRun,
+    ImportStage,
+    Schema,
+    Table,
+    Version,
+)
 
 
 class DatabaseFilter(admin.SimpleListFilter):
@@ -29,6 +39,7 @@ class ColumnAdmin(admin.ModelAdmin):
         "get_database_name",
         "author",
     ]
+    list_filter = ["version"]
 
     def get_table_name(self, obj):
         return obj.table.name
@@ -48,22 +59,62 @@ class DatabaseAdmin(admin.ModelAdmin):
 
 @admin.register(DataElement)
 class DataElementAdmin(admin.ModelAdmin):
-    list_filter = ["column__table__schema__database__version"]
+    list_filter = ["versions"]
 
 
 @admin.register(Grouping)
 class GroupingAdmin(admin.ModelAdmin):
-    list_filter = ["dataelement__column__table__schema__database__version"]
+    list_filter = ["versions"]
+
+
+class ImportStageInline(admin.TabularInline):
+    model = ImportStage
+    extra = 0
+    can_delete = False
+    fields = readonly_fields = [
+        "name",
+        "duration",
+        "upstream_fetch_time",
+        "rows_read",
+        "rows_written",
+        "queries",
+        "peak_memory",
+    ]
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ImportRun)
+class ImportRunAdmin(admin.ModelAdmin):
+    inlines = [ImportStageInline]
+    list_display = [
+        "__str__",
+        "version",
+        "started_at",
+        "duration",
+        "incremental",
+        "succeeded",
+    ]
+    list_filter = ["succeeded", "incremental"]
+    readonly_fields = [
+        "version",
+        "started_at",
+        "finished_at",
+        "incremental",
+        "succeeded",
+        "error",
+    ]
 
 
 @admin.register(Schema)
 class SchemaAdmin(admin.ModelAdmin):
-    list_filter = ["database__version"]
+    list_filter = ["version"]
 
 
 @admin.register(Table)
 class TableAdmin(admin.ModelAdmin):
-    list_filter = ["schema__database__version", DatabaseFilter]
+    list_filter = ["version", DatabaseFilter]
 
 
 admin.site.register(Version)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class NCDRConfig(AppConfig):
     name = "ncdr"
     verbose_name = "NCDR"
+
+    def ready(self):
+        # Connects the signals which invalidate cached search results
+        from . import search  # noqa: F401
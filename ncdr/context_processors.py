@@ -1,5 +1,8 @@
+from django.utils.functional import SimpleLazyObject
+
 from .models import Version
 
 
 def latest_version(request):
-    return {"latest_version": Version.objects.latest()}
+    # only fetched by the pages which use it
+    return {"latest_version": SimpleLazyObject(Version.objects.latest)}
@@ -1,37 +1,118 @@
+import time
+import traceback
+
+import structlog
 from django.db import transaction
 from django.utils import timezone
-import structlog
-import traceback
-import time
-from ncdr.importers import column, grouping, table, db_api
-from ncdr.models import Version
+
+from ncdr import search
+from ncdr.importers import (
+    bulk,
+    column,
+    content,
+    db_api,
+    grouping,
+    incremental,
+    instrumentation,
+    sources,
+    table,
+)
+from ncdr.models import (
+    Column,
+    Database,
+    DataElement,
+    ImportRun,
+    ImportStage,
+    Schema,
+    Table,
+    Version,
+)
 
 logger = structlog.get_logger("ncdr")
 
 
-def get_upstream_time_stamp():
+def import_version(version, latest, incremental_import, stages, source):
     """
-    Get the upstream timestamp which tells us if we should refresh
+    Import the data from the given source into the given Version, recording
+    each stage
     """
-    query = "Select * from tbl_Export_Standard_RefreshDateTime"
-    # Note access to the upstream db is IP address dependent.
-    return timezone.make_aware(db_api.query(query)[0]["Refresh_DateTime"])
+    # DataElements are built from the grouping mapping as Columns are
+    # imported so it has to be read first
+    with instrumentation.stage("grouping", stages):
+        mapping = grouping.import_from_db(source)
+
+    if incremental_import:
+        with instrumentation.stage("incremental", stages):
+            incremental.import_from_db(
+                version, previous=latest, mapping=mapping, source=source
+            )
+    else:
+        # hash each Database's rows so the next import can be incremental
+        hasher = incremental.ContentHasher()
+        with instrumentation.stage("table", stages):
+            table.import_from_db(version, source, hasher)
+        with instrumentation.stage("column", stages):
+            column.import_from_db(version, mapping, source, hasher)
+            incremental.set_content_hashes(version, hasher.hexdigests())
+
+    with instrumentation.stage("analyze", stages):
+        bulk.analyze(Database, Schema, Table, Column, DataElement)
+
+    with instrumentation.stage("versions", stages):
+        content.add_to_version(version)
 
+    with instrumentation.stage("usage", stages):
+        instrumentation.record_written(column.set_usage_counts(version))
 
-@transaction.atomic
-def check_and_import():
+    with instrumentation.stage("search", stages):
+        instrumentation.record_written(search.index_version(version))
+
+
+def check_and_import(incremental_import=False, source=sources.UPSTREAM):
+    """
+    Import a new Version if the upstream data has been refreshed
+
+    The data is read from the upstream database unless another source is
+    given.
+
+    An incremental import copies the Databases which haven't changed since
+    the latest Version instead of rebuilding them.
+
+    The Version is built in a transaction so a failed import leaves nothing
+    behind except its ImportRun, which records the error.  Returns the
+    ImportRun, or None when there was nothing to import.
+    """
     start = time.time()
+    run = ImportRun(incremental=incremental_import)
+    stages = []
     try:
-        upstream_ts = get_upstream_time_stamp()
-        latest = Version.objects.order_by("-upstream_updated_ts").first()
-        if upstream_ts > latest:
-            version = Version.objects.create(
+        # Share one upstream connection between all of the import stages
+        with db_api.connection(), transaction.atomic():
+            with instrumentation.stage("check", stages):
+                upstream_ts = source.refreshed_at()
+                latest = Version.objects.order_by("-upstream_updated_ts").first()
+
+            if upstream_ts <= latest.upstream_updated_ts:
+                return None
+
+            run.version = Version.objects.create(
                 is_published=False, upstream_updated_ts=upstream_ts
             )
-            table.import_from_db(version)
-            column.import_from_db(version)
-            grouping.import_from_db(version)
-            end = time.time()
-            logger.info(f"Version loaded in {(end-start)/60} minutes")
+            import_version(run.version, latest, incremental_import, stages, source)
     except Exception:
-        logger.error(f"Unable to load in NCDR \n{traceback.format_exc()}")
+        # The Version was rolled back with everything else
+        run.version = None
+        run.error = traceback.format_exc()
+        logger.error(f"Unable to load in NCDR \n{run.error}")
+    else:
+        run.succeeded = True
+        end = time.time()
+        logger.info(f"Version loaded in {(end-start)/60} minutes")
+
+    run.finished_at = timezone.now()
+    run.save()
+    ImportStage.objects.bulk_create(
+        ImportStage(run=run, name=stage.name, **stage.as_dict()) for stage in stages
+    )
+
+    return run
@@ -0,0 +1,84 @@
+"""
+Helpers for loading rows into Postgres with COPY
+"""
+import io
+
+from django.db import connection
+
+# Characters which must be escaped in COPY's text format
+ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def format_value(value):
+    if value is None:
+        return "\\N"
+
+    if isinstance(value, bool):
+        return "t" if value else "f"
+
+    return str(value).translate(ESCAPES)
+
+
+class RowsFile(io.TextIOBase):
+    """
+    A read-only file which renders rows in COPY's text format as it's read
+
+    This lets COPY pull rows from a generator without the whole document ever
+    being built in memory.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._pending = ""
+        self.count = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if size is None:
+            size = -1
+
+        lines = [self._pending]
+        length = len(self._pending)
+        while size < 0 or length < size:
+            try:
+                row = next(self._rows)
+            except StopIteration:
+                break
+
+            line = "\t".join(format_value(value) for value in row) + "\n"
+            lines.append(line)
+            length += len(line)
+            self.count += 1
+
+        data = "".join(lines)
+        if size < 0:
+            size = length
+
+        data, self._pending = data[:size], data[size:]
+        return data
+
+
+def copy_rows(cursor, table, columns, rows):
+    """
+    COPY the given rows (tuples of values) into the named columns of a table
+
+    Returns the number of rows copied.
+    """
+    rows_file = RowsFile(rows)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", rows_file)
+    return rows_file.count
+
+
+def analyze(*models):
+    """
+    Update the planner's statistics of the given models' tables
+
+    Autovacuum only gathers them every so often, and can't see rows which
+    haven't been committed, so without this queries joining the rows just
+    loaded can be planned as though they weren't there.
+    """
+    with connection.cursor() as cursor:
+        for model in models:
+            cursor.execute(f"ANALYZE {model._meta.db_table}")
@@ -1,29 +1,69 @@
 import collections
 
+import more_itertools
+import structlog
+from django.db import connection
+from django.utils import timezone
 from django.utils.text import slugify
 
-from ncdr.importers import db_api as api
+from ncdr.importers import bulk, content, grouping, instrumentation, sources
 
-from ..models import Column, DataElement, Table
+from ..models import Column, Database, DataElement, Schema, Table
 
+logger = structlog.get_logger("ncdr")
 
-def get_data_elementLUT(rows):
+BATCH_SIZE = 1000
+
+
+def get_rows(source=sources.UPSTREAM):
+    return source.definition_rows()
+
+
+def build_data_element(name, mapping):
+    description = mapping.descriptions.get(name, "")
+    groupings = sorted(mapping.links.get(name, ()))
+    grouping_hashes = [mapping.groupings[g].content_hash for g in groupings]
+
+    return DataElement(
+        name=name,
+        slug=slugify(name),
+        description=description,
+        content_hash=content.content_hash(name, description, grouping_hashes),
+    )
+
+
+def create_data_elements(data_elementLUT, rows, mapping):
     """
-    Create all new data elements based on the spread sheet.
+    Get or create any data elements in the given rows we haven't seen yet.
 
-    Data elements are versioned, but they will be implicitly versioned
-    by being attatched to versioned columns
+    Data elements are shared between Versions when their name, description
+    and groupings are unchanged, only new ones need linking to their groupings.
     """
+    new_names = set(row["Data_Element"] for row in rows) - data_elementLUT.keys()
+    data_elements, created = content.get_or_create(
+        DataElement, (build_data_element(name, mapping) for name in new_names)
+    )
+    data_elementLUT.update({de.name: de for de in data_elements.values()})
 
-    csv_de_names = set(row["Data_Element"] for row in rows)
-    data_elements = DataElement.objects.bulk_create(
-        DataElement(name=name, slug=slugify(name)) for name in csv_de_names
+    Through = DataElement.grouping.through
+    links = Through.objects.bulk_create(
+        (
+            Through(dataelement_id=de.pk, grouping_id=mapping.groupings[name].pk)
+            for de in created
+            for name in mapping.links.get(de.name, ())
+        ),
+        batch_size=BATCH_SIZE,
     )
-    return {de.name: de for de in data_elements}
+    instrumentation.record_written(len(links))
 
 
-def get_tables(tableLUT, addresses):
-    for address in addresses:
+def get_addresses(row):
+    """
+    Get the (database, schema, table) names a definition row is present in
+    """
+    # A Column is an instance of a DataElement and can be present in many
+    # Tables.  Each "address" describes Database -> Schema -> Table.
+    for address in row["Present_In"].split(", "):
         database_name, _, schema_table = address.partition(".")
 
         if not schema_table:
@@ -34,49 +74,235 @@ def get_tables(tableLUT, addresses):
 
         schema_name, _, table_name = schema_table.partition(".")
 
-        yield tableLUT[database_name][schema_name][table_name]
+        yield database_name, schema_name, table_name
+
+
+# The fields of a Column we load, along with the address of its Table
+COLUMN_FIELDS = [
+    "data_element_id",
+    "name",
+    "description",
+    "derivation",
+    "data_type",
+    "is_derived_item",
+    "link",
+]
+ColumnRow = collections.namedtuple(
+    "ColumnRow", ["database_name", "schema_name", "table_name"] + COLUMN_FIELDS
+)
+
+STAGING_TABLE = "ncdr_import_column_staging"
+
+
+def build_column_rows(row, data_elementLUT, skip_databases):
+    link = row["Link"] if row["Link"] != "N/A" else ""
+    is_derived_item = row["Is_Derived_Item"].lower().startswith("yes")
+
+    # Build a Column for each Table found.
+    for database_name, schema_name, table_name in get_addresses(row):
+        if database_name in skip_databases:
+            continue
+
+        yield ColumnRow(
+            database_name=database_name,
+            schema_name=schema_name,
+            table_name=table_name,
+            data_element_id=data_elementLUT[row["Data_Element"]].pk,
+            name=row["Item_Name"],
+            description=row["Description"],
+            derivation=row["NCDR_Derivation_Methodology"],
+            data_type=row["Data_Type"],
+            is_derived_item=is_derived_item,
+            link=link,
+        )
+
+
+def copy_columns(version, batches):
+    """
+    Load batches of ColumnRows with COPY
+
+    Each batch is streamed into a temporary staging table then they're all
+    joined to this Version's Tables by name in a single INSERT ... SELECT.
+    """
+    column_table = Column._meta.db_table
+    database_table = Database._meta.db_table
+    schema_table = Schema._meta.db_table
+    table_table = Table._meta.db_table
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            CREATE TEMPORARY TABLE {STAGING_TABLE} (
+                database_name text,
+                schema_name text,
+                table_name text,
+                data_element_id integer,
+                name text,
+                description text,
+                derivation text,
+                data_type text,
+                is_derived_item boolean,
+                link text
+            )
+            """
+        )
+        # Nothing else can use the connection while a COPY is running so
+        # each batch gets its own.
+        for batch in batches:
+            bulk.copy_rows(cursor, STAGING_TABLE, ColumnRow._fields, batch)
+
+        # Fail loudly, as a LUT miss would, if a Table can't be found.
+        cursor.execute(
+            f"""
+            SELECT s.database_name, s.schema_name, s.table_name
+            FROM {STAGING_TABLE} s
+            LEFT JOIN {database_table} d
+                ON d.version_id = %s AND d.name = s.database_name
+            LEFT JOIN {schema_table} sc
+                ON sc.database_id = d.id AND sc.name = s.schema_name
+            LEFT JOIN {table_table} t
+                ON t.schema_id = sc.id AND t.name = s.table_name
+            WHERE t.id IS NULL
+            LIMIT 1
+            """,
+            [version.pk],
+        )
+        missing = cursor.fetchone()
+        if missing:
+            raise Exception(f"Unknown Table in Present_In: {'.'.join(missing)}")
+
+        # usage_count is set once all of the Version's Columns are in, see
+        # set_usage_counts
+        now = timezone.now()
+        fields = ", ".join(COLUMN_FIELDS)
+        cursor.execute(
+            f"""
+            INSERT INTO {column_table}
+                (created, updated, version_id, table_id, usage_count, {fields})
+            SELECT
+                %s, %s, d.version_id, t.id, 1,
+                {", ".join(f"s.{f}" for f in COLUMN_FIELDS)}
+            FROM {STAGING_TABLE} s
+            JOIN {database_table} d
+                ON d.version_id = %s AND d.name = s.database_name
+            JOIN {schema_table} sc
+                ON sc.database_id = d.id AND sc.name = s.schema_name
+            JOIN {table_table} t
+                ON t.schema_id = sc.id AND t.name = s.table_name
+            """,
+            [now, now, version.pk],
+        )
+        count = cursor.rowcount
 
+        # An error above aborts the import's transaction, which removes the
+        # staging table too, so it only needs dropping here.
+        cursor.execute(f"DROP TABLE {STAGING_TABLE}")
 
-def import_from_db(version):
-    query = "SELECT * from tbl_Export_Standard_Definitions"
-    rows = api.query(query)
+    return count
 
+
+def bulk_create_columns(version, batches):
+    """
+    Load batches of ColumnRows with bulk_create
+
+    COPY is Postgres only so this is used for any other database.
+    """
     tables = Table.objects.select_related("schema", "schema__database").filter(
-        schema__database__version=version
+        version=version
     )
-    tableLUT = collections.defaultdict(lambda: collections.defaultdict(dict))
-    for table in tables:
-        tableLUT[table.schema.database.name][table.schema.name][table.name] = table
-
-    data_elementLUT = get_data_elementLUT(rows)
-
-    columns = []
-    for row in rows:
-        # A Column is an instance of a DataElement and can be present in many
-        # Tables.  Each "address" describes Database -> Schema -> Table.
-        addresses = row["Present_In"].split(", ")
-        tables = list(get_tables(tableLUT, addresses))
-
-        # Build a Column for each Table found.
-        for table in tables:
-            link = row["Link"] if row["Link"] != "N/A" else ""
-
-            columns.append(
-                Column(
-                    data_element=data_elementLUT[row["Data_Element"]],
-                    table=table,
-                    name=row["Item_Name"],
-                    description=row["Description"],
-                    derivation=row["NCDR_Derivation_Methodology"],
-                    data_type=row["Data_Type"],
-                    is_derived_item=row["Is_Derived_Item"].lower().startswith("yes"),
-                    link=link,
-                )
+    tableLUT = {
+        (table.schema.database.name, table.schema.name, table.name): table
+        for table in tables
+    }
+
+    count = 0
+    for batch in batches:
+        columns = [
+            Column(
+                version=version,
+                table=tableLUT[(r.database_name, r.schema_name, r.table_name)],
+                **{field: getattr(r, field) for field in COLUMN_FIELDS},
             )
-            # batch create the columns in 100s
-            if len(columns) > 100:
-                Column.objects.bulk_create(columns)
-                columns = []
+            for r in batch
+        ]
+        Column.objects.bulk_create(columns, batch_size=BATCH_SIZE)
+        count += len(columns)
+
+    return count
+
+
+def import_rows(
+    version, rows, skip_databases=frozenset(), mapping=grouping.EMPTY_MAPPING
+):
+    """
+    Import Columns, and their DataElements, from rows of the definitions view
+
+    Columns aren't created in the Databases named in skip_databases but the
+    DataElements for every row are, using the grouping Mapping for their
+    descriptions and Groupings.  The DataElement LUT is returned.
+    """
+    data_elementLUT = {}
+
+    def column_batches():
+        # Work through the rows in batches so only one batch is in memory at
+        # a time, creating the DataElements each batch needs before its
+        # Columns are loaded.
+        for batch in more_itertools.chunked(rows, BATCH_SIZE):
+            create_data_elements(data_elementLUT, batch, mapping)
+            yield [
+                column_row
+                for row in batch
+                for column_row in build_column_rows(
+                    row, data_elementLUT, skip_databases
+                )
+            ]
+
+    if connection.vendor == "postgresql":
+        count = copy_columns(version, column_batches())
+    else:
+        count = bulk_create_columns(version, column_batches())
+
+    instrumentation.record_written(count)
+    logger.info(f"Created {count} Columns")
+
+    return data_elementLUT
+
+
+def import_from_db(
+    version, mapping=grouping.EMPTY_MAPPING, source=sources.UPSTREAM, hasher=None
+):
+    """
+    Import Columns from the upstream definitions view
 
-    # create everything that's left
-    Column.objects.bulk_create(columns)
+    Rows are passed through the given incremental.ContentHasher, if any.
+    """
+    rows = get_rows(source)
+    if hasher is not None:
+        rows = hasher.definition_rows(rows)
+    import_rows(version, rows, mapping=mapping)
+
+
+def set_usage_counts(version):
+    """
+    Count the Columns in the given Version with each Column's DataElement
+
+    The counts are stored on the Columns, with one UPDATE, so pages listing
+    Columns don't count them one by one.  Columns without a DataElement keep
+    the default of 1.  Returns the number of Columns updated.
+    """
+    table = Column._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {table} c SET usage_count = u.count
+            FROM (
+                SELECT data_element_id, count(*) AS count
+                FROM {table}
+                WHERE version_id = %s AND data_element_id IS NOT NULL
+                GROUP BY data_element_id
+            ) u
+            WHERE c.version_id = %s AND c.data_element_id = u.data_element_id
+            """,
+            [version.pk, version.pk],
+        )
+        return cursor.rowcount
@@ -0,0 +1,66 @@
+"""
+Content addressed DataElements and Groupings
+
+DataElements and Groupings rarely change between Versions so rather than
+creating fresh copies on every import we hash what each one contains and
+reuse any existing row with the same hash.  Which of them are in a Version is
+recorded by their versions relationship instead.
+"""
+import hashlib
+import json
+
+import more_itertools
+
+from ncdr.importers import instrumentation
+from ncdr.models import DataElement, Grouping
+
+BATCH_SIZE = 1000
+
+
+def content_hash(*values):
+    data = json.dumps(values, default=str).encode("utf-8")
+    return hashlib.sha1(data).hexdigest()
+
+
+def get_or_create(model, instances):
+    """
+    Swap unsaved instances for existing rows with the same content_hash
+
+    Instances without a match are bulk created.  Returns a dict of every
+    instance keyed by content_hash along with the list of those created.
+    """
+    instances = {instance.content_hash: instance for instance in instances}
+
+    existing = {}
+    for hashes in more_itertools.chunked(instances, BATCH_SIZE):
+        for instance in model.objects.filter(content_hash__in=hashes):
+            existing[instance.content_hash] = instance
+
+    created = model.objects.bulk_create(
+        (i for h, i in instances.items() if h not in existing), batch_size=BATCH_SIZE
+    )
+    instrumentation.record_written(len(created))
+
+    return {**existing, **{i.content_hash: i for i in created}}, created
+
+
+def add_to_version(version):
+    """
+    Add the DataElements used by the given Version's Columns, and their
+    Groupings, to the Version
+    """
+    data_element_pks = list(
+        DataElement.objects.filter(column__version=version)
+        .values_list("pk", flat=True)
+        .distinct()
+    )
+    version.data_elements.add(*data_element_pks)
+
+    grouping_pks = list(
+        Grouping.objects.filter(dataelement__versions=version)
+        .values_list("pk", flat=True)
+        .distinct()
+    )
+    version.groupings.add(*grouping_pks)
+
+    instrumentation.record_written(len(data_element_pks) + len(grouping_pks))
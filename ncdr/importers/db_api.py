@@ -1,9 +1,21 @@
+import contextlib
+import threading
+import time
+from collections.abc import Mapping
+
 import pyodbc
+import structlog
 from django.conf import settings
 
+from ncdr.importers import instrumentation
 
-def query(someQuery):
-    connection_str = ";".join(
+logger = structlog.get_logger("ncdr")
+
+_local = threading.local()
+
+
+def get_connection_string():
+    return ";".join(
         [
             "DRIVER={ODBC Driver 17 for SQL Server}",
             f"SERVER=tcp:{settings.UPSTREAM_DB_HOST}",
@@ -12,11 +24,150 @@ def query(someQuery):
             f"PWD={settings.UPSTREAM_DB_PASSWORD}",
         ]
     )
-    results = []
-    with pyodbc.connect(connection_str) as conn:
-        with conn.cursor() as cur:
-            rows = cur.execute(someQuery).fetchall()
-            columns = [column[0] for column in cur.description]
+
+
+def is_connection_error(error):
+    """
+    Did the given pyodbc error come from a broken connection?
+
+    pyodbc puts the SQLSTATE in the first argument, class 08 covers the
+    connection exceptions (refused, dropped link, etc).
+    """
+    return bool(error.args) and str(error.args[0]).startswith("08")
+
+
+class UpstreamConnection:
+    """
+    A reusable connection to the upstream SQL Server
+
+    The connection is opened on first use and reopened when a query fails
+    because the link to the server has dropped.
+    """
+
+    def __init__(self):
+        self._connection = None
+
+    def connect(self):
+        if self._connection is None:
+            self._connection = pyodbc.connect(
+                get_connection_string(), timeout=settings.UPSTREAM_DB_LOGIN_TIMEOUT
+            )
+            self._connection.timeout = settings.UPSTREAM_DB_QUERY_TIMEOUT
+        return self._connection
+
+    def close(self):
+        if self._connection is None:
+            return
+
+        try:
+            self._connection.close()
+        except pyodbc.Error:
+            # the connection has probably gone already
+            pass
+
+        self._connection = None
+
+    def execute(self, someQuery):
+        """Execute the given query and return the cursor"""
+        attempts = settings.UPSTREAM_DB_RETRIES + 1
+        for attempt in range(1, attempts + 1):
+            try:
+                return self.connect().cursor().execute(someQuery)
+            except pyodbc.Error as e:
+                if attempt == attempts or not is_connection_error(e):
+                    raise
+
+                logger.warning(f"Upstream connection failed, reconnecting: {e}")
+                self.close()
+
+
+@contextlib.contextmanager
+def connection():
+    """
+    Share one upstream connection between every query made in this block
+
+    Opening a connection to the upstream server is slow so an import run wraps
+    all of its stages in this.  Nested blocks reuse the outer connection.
+    """
+    if getattr(_local, "connection", None) is not None:
+        yield _local.connection
+        return
+
+    _local.connection = UpstreamConnection()
+    try:
+        yield _local.connection
+    finally:
+        _local.connection.close()
+        _local.connection = None
+
+
+@contextlib.contextmanager
+def cursor(someQuery):
+    with connection() as conn:
+        start = time.time()
+        cur = conn.execute(someQuery)
+        instrumentation.record_fetch(time.time() - start, 0)
+        try:
+            yield cur
+        finally:
+            cur.close()
+
+
+def query(someQuery):
+    with cursor(someQuery) as cur:
+        columns = [column[0] for column in cur.description]
+        start = time.time()
+        rows = cur.fetchall()
+        instrumentation.record_fetch(time.time() - start, len(rows))
+        return [dict(zip(columns, row)) for row in rows]
+
+
+class Row(Mapping):
+    """
+    A read-only, dict-like view onto a row from the upstream database
+
+    The column name to index lookup is built once per cursor and shared by
+    every Row read from it so a Row costs little more than the raw row.
+    """
+
+    __slots__ = ("_index", "_values")
+
+    def __init__(self, index, values):
+        self._index = index
+        self._values = values
+
+    def __getitem__(self, key):
+        return self._values[self._index[key]]
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __repr__(self):
+        return f"Row({dict(self)!r})"
+
+
+def stream(someQuery, batch_size=None):
+    """
+    Yield the results of the given query one Row at a time
+
+    Unlike query() the rows are fetched from the server in batches of
+    batch_size as they're consumed so the full result set is never held in
+    memory.
+    """
+    if batch_size is None:
+        batch_size = settings.UPSTREAM_DB_FETCH_SIZE
+
+    with cursor(someQuery) as cur:
+        index = {column[0]: i for i, column in enumerate(cur.description)}
+        while True:
+            start = time.time()
+            rows = cur.fetchmany(batch_size)
+            instrumentation.record_fetch(time.time() - start, len(rows))
+            if not rows:
+                break
+
             for row in rows:
-                results.append(dict(zip(columns, row)))
-    return results
+                yield Row(index, row)
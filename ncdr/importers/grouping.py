@@ -1,39 +1,66 @@
+import collections
+
 from django.utils.text import slugify
 
-from ncdr.importers import db_api as api
+from ncdr.importers import content, sources
+
+from ..models import Grouping
 
-from ..models import DataElement, Grouping
+# What the grouping mapping says about the DataElements in it:
+#   groupings: Grouping name -> Grouping
+#   descriptions: DataElement name -> description
+#   links: DataElement name -> names of the Groupings it's in
+Mapping = collections.namedtuple("Mapping", ["groupings", "descriptions", "links"])
 
+EMPTY_MAPPING = Mapping(groupings={}, descriptions={}, links={})
 
-def get_rows():
-    query = "select * from tbl_Export_Standard_GroupingMapping"
-    return api.query(query)
 
+def get_rows(source=sources.UPSTREAM):
+    return source.mapping_rows()
 
-def import_from_db(version):
-    rows = get_rows()
 
-    csv_desc_by_name = {row["Grouping"]: row["Grouping Description"] for row in rows}
-    groupings = Grouping.objects.bulk_create(
-        Grouping(name=name, slug=slugify(name), description=description)
-        for name, description in csv_desc_by_name.items()
+def build_grouping(name, description):
+    return Grouping(
+        name=name,
+        slug=slugify(name),
+        description=description,
+        content_hash=content.content_hash(name, description),
     )
-    groupingLUT = {g.name: g for g in groupings}
 
-    data_elementLUT = {
-        de.name: de
-        for de in DataElement.objects.filter(
-            column__table__schema__database__version=version
-        ).distinct()
-    }
 
+def read_mapping(rows):
+    """
+    Build a Mapping from the rows of the grouping mapping view
+
+    The Groupings are got or created but DataElements are left to the Column
+    import, which builds them from the Mapping.
+    """
+    grouping_descriptions = {}
+    descriptions = {}
+    links = collections.defaultdict(set)
     for row in rows:
-        grouping = groupingLUT[row["Grouping"]]
-        # data_element = deLUT[row["Data Element"]]
+        grouping_descriptions[row["Grouping"]] = row["Grouping Description"]
+        descriptions[row["Data Element"]] = row["Data Element Description"]
+        links[row["Data Element"]].add(row["Grouping"])
+
+    groupings, _ = content.get_or_create(
+        Grouping,
+        (
+            build_grouping(name, description)
+            for name, description in grouping_descriptions.items()
+        ),
+    )
+
+    return Mapping(
+        groupings={g.name: g for g in groupings.values()},
+        descriptions=descriptions,
+        links=dict(links),
+    )
 
-        data_element = data_elementLUT.get(row["Data Element"])
-        if data_element:
-            data_element.description = row["Data Element Description"]
-            data_element.save()
 
-            data_element.grouping.add(grouping)
+def import_from_db(source=sources.UPSTREAM):
+    """
+    Read the grouping mapping, this has to happen before the Column import
+    since a DataElement's description and Groupings come from here
+    """
+    return read_mapping(get_rows(source))
@@ -0,0 +1,334 @@
+"""
+Incremental imports
+
+Most upstream refreshes only change a handful of rows.  Rather than rebuilding
+every Database from the upstream rows we hash the rows that make up each
+Database (its own row plus those for its Schemas, Tables and Columns) and copy
+the Databases whose hash matches the previous Version with INSERT ... SELECT
+queries, leaving only the changed Databases to be built from the upstream rows.
+"""
+import collections
+import hashlib
+import json
+
+import more_itertools
+import structlog
+from django.db import connection
+from django.db.models import Case, CharField, Value, When
+from django.utils import timezone
+
+from ncdr.importers import column, grouping, instrumentation, sources, table
+from ncdr.models import Column, Database, DataElement, Schema, Table
+
+logger = structlog.get_logger("ncdr")
+
+BATCH_SIZE = 500
+
+# The upstream fields we build models from, any change to these changes the
+# hash of the Database they're in.
+STRUCTURE_FIELDS = [
+    "Database",
+    "Schema",
+    "Table/View",
+    "Table or View",
+    "Name",
+    "Description",
+    "Link",
+    "Date_Range",
+]
+DEFINITION_FIELDS = [
+    "Data_Element",
+    "Item_Name",
+    "Description",
+    "Data_Type",
+    "Is_Derived_Item",
+    "NCDR_Derivation_Methodology",
+    "Link",
+]
+
+DATA_ELEMENT_MAP = "ncdr_import_data_element_map"
+
+
+class ContentHasher:
+    """
+    Hash the upstream rows that make up each Database as they're read
+
+    Rows are serialised and sorted before hashing so the order the upstream
+    views return them in doesn't matter.
+    """
+
+    def __init__(self):
+        self.lines = collections.defaultdict(list)
+
+    def structure_rows(self, rows):
+        """Hash rows of the structure view as they're passed on"""
+        for row in rows:
+            values = [row[field] for field in STRUCTURE_FIELDS]
+            self.lines[row["Database"]].append(json.dumps(values, default=str))
+            yield row
+
+    def definition_rows(self, rows):
+        """Hash rows of the definitions view as they're passed on"""
+        for row in rows:
+            values = [row[field] for field in DEFINITION_FIELDS]
+            for address in column.get_addresses(row):
+                line = json.dumps([address, values], default=str)
+                self.lines[address[0]].append(line)
+            yield row
+
+    def hexdigests(self):
+        """Get the hash of each Database name's rows"""
+        return {
+            name: hashlib.sha1("\n".join(sorted(lines)).encode("utf-8")).hexdigest()
+            for name, lines in self.lines.items()
+        }
+
+
+def hash_databases(structure_rows, definition_rows):
+    """Build a hash of the upstream rows for each Database name"""
+    hasher = ContentHasher()
+    for _ in hasher.structure_rows(structure_rows):
+        pass
+    for _ in hasher.definition_rows(definition_rows):
+        pass
+    return hasher.hexdigests()
+
+
+def set_content_hashes(version, content_hashes):
+    """
+    Store the hashes of the given Version's Databases, once they're imported
+
+    Full imports build Databases before their Columns' rows have been read,
+    and hashed, so they're stored afterwards for the next incremental import
+    to compare against.
+    """
+    if not content_hashes:
+        return 0
+
+    return Database.objects.filter(
+        version=version, name__in=content_hashes.keys()
+    ).update(
+        content_hash=Case(
+            *[
+                When(name=name, then=Value(content_hash))
+                for name, content_hash in content_hashes.items()
+            ],
+            output_field=CharField(),
+        )
+    )
+
+
+def columns_for(model, *exclude):
+    """
+    Get the column names of the given model's fields for copying
+
+    The primary key and timestamps are never copied.
+    """
+    exclude = {"id", "created", "updated", *exclude}
+    return [f.column for f in model._meta.concrete_fields if f.name not in exclude]
+
+
+def placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+
+def copy_databases(cursor, previous, version, names):
+    """
+    Copy the named Databases, their Schemas and Tables, to the given Version
+    """
+    now = timezone.now()
+    names = list(names)
+    copied = {}
+
+    database_columns = ", ".join(columns_for(Database, "version"))
+    cursor.execute(
+        f"""
+        INSERT INTO {Database._meta.db_table}
+            (created, updated, version_id, {database_columns})
+        SELECT %s, %s, %s, {database_columns}
+        FROM {Database._meta.db_table}
+        WHERE version_id = %s AND name IN ({placeholders(names)})
+        """,
+        [now, now, version.pk, previous.pk, *names],
+    )
+    copied["databases"] = cursor.rowcount
+
+    schema_columns = columns_for(Schema, "database", "version")
+    cursor.execute(
+        f"""
+        INSERT INTO {Schema._meta.db_table}
+            (created, updated, version_id, database_id, {", ".join(schema_columns)})
+        SELECT
+            %s, %s, new_db.version_id, new_db.id,
+            {", ".join(f"s.{c}" for c in schema_columns)}
+        FROM {Schema._meta.db_table} s
+        JOIN {Database._meta.db_table} old_db ON old_db.id = s.database_id
+        JOIN {Database._meta.db_table} new_db
+            ON new_db.name = old_db.name AND new_db.version_id = %s
+        WHERE old_db.version_id = %s AND old_db.name IN ({placeholders(names)})
+        """,
+        [now, now, version.pk, previous.pk, *names],
+    )
+    copied["schemas"] = cursor.rowcount
+
+    table_columns = columns_for(Table, "schema", "version")
+    cursor.execute(
+        f"""
+        INSERT INTO {Table._meta.db_table}
+            (created, updated, version_id, schema_id, {", ".join(table_columns)})
+        SELECT
+            %s, %s, new_db.version_id, new_s.id,
+            {", ".join(f"t.{c}" for c in table_columns)}
+        FROM {Table._meta.db_table} t
+        JOIN {Schema._meta.db_table} old_s ON old_s.id = t.schema_id
+        JOIN {Database._meta.db_table} old_db ON old_db.id = old_s.database_id
+        JOIN {Database._meta.db_table} new_db
+            ON new_db.name = old_db.name AND new_db.version_id = %s
+        JOIN {Schema._meta.db_table} new_s
+            ON new_s.database_id = new_db.id AND new_s.name = old_s.name
+        WHERE old_db.version_id = %s AND old_db.name IN ({placeholders(names)})
+        """,
+        [now, now, version.pk, previous.pk, *names],
+    )
+    copied["tables"] = cursor.rowcount
+
+    return copied
+
+
+def create_data_element_map(cursor, previous, data_elementLUT):
+    """
+    Load a temporary table mapping the previous Version's DataElements to the
+    ones created for this import, matched on name
+    """
+    cursor.execute(
+        f"CREATE TEMPORARY TABLE {DATA_ELEMENT_MAP} "
+        "(old_id integer PRIMARY KEY, new_id integer NOT NULL)"
+    )
+
+    previous_data_elements = (
+        DataElement.objects.filter(column__version=previous)
+        .values_list("pk", "name")
+        .distinct()
+    )
+    pairs = [
+        (pk, data_elementLUT[name].pk)
+        for pk, name in previous_data_elements
+        if name in data_elementLUT
+    ]
+    for batch in more_itertools.chunked(pairs, BATCH_SIZE):
+        values = ", ".join(["(%s, %s)"] * len(batch))
+        params = [value for pair in batch for value in pair]
+        cursor.execute(f"INSERT INTO {DATA_ELEMENT_MAP} VALUES {values}", params)
+
+
+def copy_columns(cursor, previous, version, names):
+    """
+    Copy the Columns in the named Databases to the given Version
+
+    Expects the Tables to have been copied already and the DataElement map
+    to have been loaded.
+    """
+    now = timezone.now()
+    names = list(names)
+
+    column_columns = columns_for(Column, "table", "data_element", "version")
+    cursor.execute(
+        f"""
+        INSERT INTO {Column._meta.db_table}
+            (
+                created, updated, version_id, table_id, data_element_id,
+                {", ".join(column_columns)}
+            )
+        SELECT
+            %s, %s, new_db.version_id, new_t.id, de_map.new_id,
+            {", ".join(f"c.{name}" for name in column_columns)}
+        FROM {Column._meta.db_table} c
+        JOIN {Table._meta.db_table} old_t ON old_t.id = c.table_id
+        JOIN {Schema._meta.db_table} old_s ON old_s.id = old_t.schema_id
+        JOIN {Database._meta.db_table} old_db ON old_db.id = old_s.database_id
+        JOIN {Database._meta.db_table} new_db
+            ON new_db.name = old_db.name AND new_db.version_id = %s
+        JOIN {Schema._meta.db_table} new_s
+            ON new_s.database_id = new_db.id AND new_s.name = old_s.name
+        JOIN {Table._meta.db_table} new_t
+            ON new_t.schema_id = new_s.id AND new_t.name = old_t.name
+        LEFT JOIN {DATA_ELEMENT_MAP} de_map ON de_map.old_id = c.data_element_id
+        WHERE old_db.version_id = %s AND old_db.name IN ({placeholders(names)})
+        """,
+        [now, now, version.pk, previous.pk, *names],
+    )
+    return cursor.rowcount
+
+
+def import_from_db(
+    version, previous, mapping=grouping.EMPTY_MAPPING, source=sources.UPSTREAM
+):
+    """
+    Import the upstream data into the given Version, copying any Databases
+    which haven't changed since the previous Version
+
+    Both views have to be read in full before anything is written so the
+    hashes can be compared.  Returns a summary of the changes.
+    """
+    structure_rows = list(table.get_rows(source))
+    definition_rows = list(column.get_rows(source))
+
+    content_hashes = hash_databases(structure_rows, definition_rows)
+    previous_hashes = dict(previous.databases.values_list("name", "content_hash"))
+
+    unchanged = {
+        name
+        for name, content_hash in content_hashes.items()
+        if previous_hashes.get(name) == content_hash
+    }
+
+    table.import_rows(
+        version,
+        (row for row in structure_rows if row["Database"] not in unchanged),
+        content_hashes,
+    )
+    data_elementLUT = column.import_rows(
+        version, definition_rows, skip_databases=unchanged, mapping=mapping
+    )
+
+    copied = {"databases": 0, "schemas": 0, "tables": 0, "columns": 0}
+    if unchanged:
+        with connection.cursor() as cursor:
+            copied.update(copy_databases(cursor, previous, version, unchanged))
+
+            create_data_element_map(cursor, previous, data_elementLUT)
+            try:
+                copied["columns"] = copy_columns(cursor, previous, version, unchanged)
+            finally:
+                cursor.execute(f"DROP TABLE {DATA_ELEMENT_MAP}")
+
+    instrumentation.record_written(sum(copied.values()))
+
+    summary = {
+        "added": sorted(content_hashes.keys() - previous_hashes.keys()),
+        "removed": sorted(previous_hashes.keys() - content_hashes.keys()),
+        "changed": sorted(
+            name
+            for name in content_hashes.keys() & previous_hashes.keys()
+            if name not in unchanged
+        ),
+        "unchanged": sorted(unchanged),
+        "copied": copied,
+    }
+
+    logger.info(
+        f"Incremental import of {version}: "
+        f"{len(summary['added'])} Databases added, "
+        f"{len(summary['removed'])} removed, "
+        f"{len(summary['changed'])} changed, "
+        f"{len(summary['unchanged'])} unchanged"
+    )
+    for name in ["added", "removed", "changed"]:
+        if summary[name]:
+            logger.info(f"Databases {name}: {', '.join(summary[name])}")
+    logger.info(
+        "Copied {databases} Databases, {schemas} Schemas, {tables} Tables and "
+        "{columns} Columns from the previous Version".format(**copied)
+    )
+
+    return summary
@@ -0,0 +1,93 @@
+"""
+Per-stage metrics for import runs
+
+Each stage of an import is run inside a stage() block which records how long
+it took, the time spent waiting on the upstream database, the rows read from
+upstream and written locally, the queries it made and the process' peak
+memory.  The upstream api and the importers report to whichever stage is
+current, so nothing has to be threaded through their signatures.
+"""
+import contextlib
+import resource
+import threading
+import time
+
+import structlog
+from django.db import connection
+
+logger = structlog.get_logger("ncdr")
+
+_local = threading.local()
+
+
+class Stage:
+    def __init__(self, name):
+        self.name = name
+        self.duration = 0.0
+        self.upstream_fetch_time = 0.0
+        self.rows_read = 0
+        self.rows_written = 0
+        self.queries = 0
+        self.peak_memory = 0
+
+    def count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def as_dict(self):
+        return {
+            "duration": round(self.duration, 3),
+            "upstream_fetch_time": round(self.upstream_fetch_time, 3),
+            "rows_read": self.rows_read,
+            "rows_written": self.rows_written,
+            "queries": self.queries,
+            "peak_memory": self.peak_memory,
+        }
+
+
+def current():
+    return getattr(_local, "stage", None)
+
+
+@contextlib.contextmanager
+def stage(name, stages=None):
+    """
+    Record the metrics of the code run in this block as a Stage
+
+    The Stage is appended to the given list, if any, and logged when the
+    block exits.
+    """
+    if current() is not None:
+        raise RuntimeError(f"Can't start {name} inside the {current().name} stage")
+
+    _local.stage = Stage(name)
+    start = time.time()
+    try:
+        with connection.execute_wrapper(_local.stage.count_query):
+            yield _local.stage
+    finally:
+        finished, _local.stage = _local.stage, None
+        finished.duration = time.time() - start
+        # ru_maxrss is the peak for the whole process (in KiB on Linux), so
+        # it only grows between stages.
+        finished.peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        if stages is not None:
+            stages.append(finished)
+
+        logger.info(f"Import stage {name} finished", **finished.as_dict())
+
+
+def record_fetch(seconds, rows):
+    """Record rows fetched from the upstream database"""
+    stage = current()
+    if stage is not None:
+        stage.upstream_fetch_time += seconds
+        stage.rows_read += rows
+
+
+def record_written(rows):
+    """Record rows written to our database"""
+    stage = current()
+    if stage is not None:
+        stage.rows_written += rows
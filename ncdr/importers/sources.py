@@ -0,0 +1,121 @@
+"""
+Sources of upstream rows for the importers
+
+The importers read rows from a source rather than querying the upstream
+database directly.  UpstreamSource is the real thing, CSVSource reads the
+snapshots of the upstream views in data/csvs so imports can be run (and
+benchmarked) without access to the upstream database.
+"""
+import csv
+import datetime
+import itertools
+import os
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from ncdr.importers import db_api, instrumentation
+
+STRUCTURE = "vw_Export_Standard_DB_Structure.csv"
+DEFINITIONS = "vw_Export_Standard_Definitions.csv"
+GROUPING_MAPPING = "vw_Export_Standard_GroupingMapping.csv"
+
+
+class UpstreamSource:
+    """Read rows from the upstream database"""
+
+    def __str__(self):
+        return f"upstream database {settings.UPSTREAM_DB_DATABASE}"
+
+    def refreshed_at(self):
+        """
+        Get the upstream timestamp which tells us if we should refresh
+        """
+        query = "Select * from tbl_Export_Standard_RefreshDateTime"
+        # Note access to the upstream db is IP address dependent.
+        return timezone.make_aware(db_api.query(query)[0]["Refresh_DateTime"])
+
+    def structure_rows(self):
+        return db_api.stream("select * from tbl_Export_Standard_DB_Structure")
+
+    def definition_rows(self):
+        return db_api.stream("SELECT * from tbl_Export_Standard_Definitions")
+
+    def mapping_rows(self):
+        return db_api.stream("select * from tbl_Export_Standard_GroupingMapping")
+
+
+def scaled(name, copy):
+    """Name the given copy of something, the original (copy 0) is unchanged"""
+    return f"{name}_{copy}" if copy else name
+
+
+def scaled_address(address, copy):
+    """Point a Present_In address at the given copy of its Database"""
+    database_name, dot, schema_table = address.partition(".")
+    return f"{scaled(database_name, copy)}{dot}{schema_table}"
+
+
+class CSVSource:
+    """
+    Read rows from a directory of CSV snapshots of the upstream views
+
+    The snapshots are exported from SQL Server as latin-1 with ¬ delimiters.
+    With a scale above 1 each Database and DataElement is repeated that many
+    times, under a suffixed name, to give a larger synthetic data set.
+    """
+
+    def __init__(self, path, scale=1):
+        if scale < 1:
+            raise ValueError(f"Scale must be at least 1, not {scale}")
+
+        self.path = path
+        self.scale = scale
+
+    def __str__(self):
+        return f"CSVs in {self.path} (x{self.scale})"
+
+    def read(self, filename):
+        path = os.path.join(self.path, filename)
+        with open(path, encoding="latin-1", newline="") as f:
+            reader = csv.DictReader(f, delimiter="¬")
+            # Read in batches, like db_api.stream, so reading the file is
+            # recorded as fetch time
+            while True:
+                start = time.time()
+                rows = list(itertools.islice(reader, settings.UPSTREAM_DB_FETCH_SIZE))
+                instrumentation.record_fetch(time.time() - start, len(rows))
+                if not rows:
+                    break
+
+                yield from rows
+
+    def refreshed_at(self):
+        mtime = os.path.getmtime(os.path.join(self.path, STRUCTURE))
+        return datetime.datetime.fromtimestamp(mtime, tz=timezone.utc)
+
+    def structure_rows(self):
+        for copy in range(self.scale):
+            for row in self.read(STRUCTURE):
+                row["Database"] = scaled(row["Database"], copy)
+                yield row
+
+    def definition_rows(self):
+        for copy in range(self.scale):
+            for row in self.read(DEFINITIONS):
+                row["Data_Element"] = scaled(row["Data_Element"], copy)
+                row["Present_In"] = ", ".join(
+                    scaled_address(address, copy)
+                    for address in row["Present_In"].split(", ")
+                )
+                yield row
+
+    def mapping_rows(self):
+        for copy in range(self.scale):
+            for row in self.read(GROUPING_MAPPING):
+                row["Data Element"] = scaled(row["Data Element"], copy)
+                yield row
+
+
+UPSTREAM = UpstreamSource()
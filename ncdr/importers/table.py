@@ -1,50 +1,118 @@
-from ncdr.importers import db_api as api
+import time
+
+import structlog
+
+from ncdr.importers import instrumentation, sources
 from ncdr.models import Database, Schema, Table
 
+logger = structlog.get_logger("ncdr")
+
+BATCH_SIZE = 1000
+
+
+def log_stage(name, count, start):
+    instrumentation.record_written(count)
+    logger.info(f"Created {count} {name} in {time.time() - start:.2f}s")
+
+
+def get_rows(source=sources.UPSTREAM):
+    return source.structure_rows()
+
+
+def build_database(row, version, content_hashes):
+    # bulk_create skips Database.save() so set the default display name here
+    return Database(
+        name=row["Database"],
+        display_name=row["Name"] or row["Database"].replace("_", "").title(),
+        description=row["Description"],
+        link=row["Link"],
+        version=version,
+        content_hash=content_hashes.get(row["Database"], ""),
+    )
+
+
+def build_schema(row, version):
+    return Schema(name=row["Schema"], version=version)
+
+
+def build_table(row, version):
+    return Table(
+        version=version,
+        name=row["Table/View"],
+        description=row["Description"],
+        link=row["Link"],
+        is_table=row["Table or View"] == "Table",
+        date_range=row["Date_Range"],
+    )
+
+
+def create_databases(version, databases):
+    start = time.time()
+    Database.objects.bulk_create(databases, batch_size=BATCH_SIZE)
+    log_stage("Databases", len(databases), start)
+
+    return {db.name: db for db in Database.objects.filter(version=version)}
+
+
+def create_schemas(version, schemas, databaseLUT):
+    """
+    Create Schemas from (database name, unsaved Schema) pairs
+    """
+    start = time.time()
+    for database_name, schema in schemas:
+        schema.database = databaseLUT[database_name]
+    Schema.objects.bulk_create((s for _, s in schemas), batch_size=BATCH_SIZE)
+    log_stage("Schemas", len(schemas), start)
+
+    schemas = Schema.objects.filter(version=version).select_related("database")
+    return {(s.database.name, s.name): s for s in schemas}
+
+
+def create_tables_or_views(tables, schemaLUT):
+    """
+    Create Tables from ((database name, schema name), unsaved Table) pairs
+    """
+    start = time.time()
+    for key, table in tables:
+        table.schema = schemaLUT[key]
+    Table.objects.bulk_create((t for _, t in tables), batch_size=BATCH_SIZE)
+    log_stage("Tables", len(tables), start)
+
+
+def import_rows(version, rows, content_hashes=None):
+    """
+    Import Databases, Schemas and Tables from rows of the upstream view
+
+    Each row of the view describes one of the three levels (a Database row
+    has no Schema, a Schema row has no Table) so we route the rows as they're
+    streamed in then create each level in dependency order.
+    """
+    if content_hashes is None:
+        content_hashes = {}
+
+    databases, schemas, tables = [], [], []
+
+    for row in rows:
+        if not row["Schema"]:
+            databases.append(build_database(row, version, content_hashes))
+        elif row["Table or View"] == "N/A":
+            schemas.append((row["Database"], build_schema(row, version)))
+        else:
+            key = (row["Database"], row["Schema"])
+            tables.append((key, build_table(row, version)))
+
+    databaseLUT = create_databases(version, databases)
+    schemaLUT = create_schemas(version, schemas, databaseLUT)
+    create_tables_or_views(tables, schemaLUT)
+
+
+def import_from_db(version, source=sources.UPSTREAM, hasher=None):
+    """
+    Import Databases, Schemas and Tables from a single read of the upstream view
 
-def create_databases(version):
-    query = "select * from tbl_Export_Standard_DB_Structure where [Schema] = ''"
-    results = api.query(query)
-    for row in results:
-        Database.objects.create(
-            name=row["Database"],
-            display_name=row["Name"],
-            description=row["Description"],
-            link=row["Link"],
-            version=version,
-        )
-
-
-def create_schemas(version):
-    query = "select * from tbl_Export_Standard_DB_Structure where [Schema] \
-<> '' and [Table or View] = 'N/A'"
-    results = api.query(query)
-    for row in results:
-        database = Database.objects.get(version=version, name=row["Database"])
-        Schema.objects.create(name=row["Schema"], database=database)
-
-
-def create_tables_or_views(version):
-    query = "select * from tbl_Export_Standard_DB_Structure where [Schema] \
-<> '' and [Table or View] <> 'N/A'"
-    results = api.query(query)
-    for row in results:
-        schema = Schema.objects.get(
-            name=row["Schema"],
-            database__name=row["Database"],
-            database__version=version,
-        )
-        Table.objects.create(
-            name=row["Table/View"],
-            description=row["Description"],
-            link=row["Link"],
-            is_table=row["Table or View"] == "Table",
-            date_range=row["Date_Range"],
-            schema=schema,
-        )
-
-
-def import_from_db(version):
-    create_databases(version)
-    create_schemas(version)
-    create_tables_or_views(version)
+    Rows are passed through the given incremental.ContentHasher, if any.
+    """
+    rows = get_rows(source)
+    if hasher is not None:
+        rows = hasher.structure_rows(rows)
+    import_rows(version, rows)
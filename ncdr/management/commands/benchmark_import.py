@@ -0,0 +1,91 @@
+import cProfile
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from ncdr.importers import import_version
+from ncdr.importers.sources import CSVSource
+from ncdr.models import Version
+
+
+class Command(BaseCommand):
+    help = "Time an import of the CSV snapshots of the upstream views"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            default=os.path.join(settings.BASE_DIR, "data", "csvs", "1"),
+            help="Directory of CSV snapshots to import",
+        )
+        parser.add_argument(
+            "--scale",
+            type=int,
+            default=1,
+            help="Repeat every Database and DataElement this many times",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Copy Databases which haven't changed from the latest Version",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the imported Version instead of rolling it back",
+        )
+        parser.add_argument(
+            "--profile",
+            metavar="PATH",
+            help="Profile the import and write the pstats file to PATH",
+        )
+
+    def handle(self, *args, **options):
+        source = CSVSource(options["path"], scale=options["scale"])
+        self.stdout.write(f"Importing {source}")
+
+        profiler = cProfile.Profile() if options["profile"] else None
+        stages = []
+
+        with transaction.atomic():
+            latest = Version.objects.order_by("-upstream_updated_ts").first()
+            version = Version.objects.create(
+                is_published=False, upstream_updated_ts=timezone.now()
+            )
+
+            start = time.time()
+            if profiler is not None:
+                profiler.enable()
+            try:
+                import_version(version, latest, options["incremental"], stages, source)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                    profiler.dump_stats(options["profile"])
+            duration = time.time() - start
+
+            if not options["keep"]:
+                transaction.set_rollback(True)
+
+        for stage in stages:
+            self.stdout.write(
+                f"{stage.name:>12}: {stage.duration:8.2f}s "
+                f"{stage.rows_read:>9} rows read "
+                f"{stage.rows_written:>9} written "
+                f"({stage.rows_written / max(stage.duration, 0.001):,.0f}/s) "
+                f"{stage.queries:>6} queries "
+                f"peak memory {stage.peak_memory / 1024:,.0f} MiB"
+            )
+
+        rows_read = sum(stage.rows_read for stage in stages)
+        rows_written = sum(stage.rows_written for stage in stages)
+        self.stdout.write(
+            f"Imported {rows_read} rows, writing {rows_written}, in {duration:.2f}s "
+            f"({rows_read / duration:,.0f} rows read/s, "
+            f"{rows_written / duration:,.0f} written/s)"
+        )
+        if options["keep"]:
+            self.stdout.write(f"Kept {version}")
@@ -0,0 +1,113 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ncdr import search_index
+from ncdr.models import Version
+from ncdr.search import SearchResults, searchableLUT
+from ncdr.search_index import InvertedIndex
+
+PAGE_SIZE = 30
+
+
+class Command(BaseCommand):
+    help = "Compare searching the in-memory index with searching the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("queries", nargs="*", metavar="query")
+        parser.add_argument(
+            "--search-version",
+            type=int,
+            dest="version_pk",
+            help="Version to search, defaults to the published one",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=10, help="Run each query this many times"
+        )
+
+    def handle(self, *args, **options):
+        versions = Version.objects.all()
+        try:
+            if options["version_pk"]:
+                version = versions.get(pk=options["version_pk"])
+            else:
+                version = versions.filter(is_published=True).latest()
+        except Version.DoesNotExist:
+            raise CommandError("No Version to search")
+
+        # SearchResults uses the index search_index keeps, when there is one,
+        # so reuse it rather than building another
+        index = search_index.get(version) or InvertedIndex(version)
+        self.stdout.write(f"Built the index of {version} in {index.build_time:.2f}s")
+
+        total = 0
+        for model_name, report in index.memory_report().items():
+            total += report["bytes"]
+            self.stdout.write(
+                f"{model_name:>12}: {report['objects']:>7} objects "
+                f"{report['words']:>7} words {report['postings']:>8} postings "
+                f"{report['bytes'] / 1024:>9,.0f} KiB"
+            )
+        self.stdout.write(f"{'total':>12}: {total / 1024 / 1024:,.1f} MiB")
+
+        queries = options["queries"] or self.sample_queries(index)
+        for query in queries:
+            database_time, database_results = self.time(
+                options["repeat"], self.search_database, version, query
+            )
+            memory_time, memory_results = self.time(
+                options["repeat"], self.search_memory, index, query
+            )
+
+            # ties are ranked in a different order, and ts_rank also counts
+            # how often words appear, so only the counts are compared
+            differences = [
+                name
+                for name in searchableLUT
+                if database_results[name][0] != memory_results[name][0]
+            ]
+            self.stdout.write(
+                f"{query!r:>20}: database {database_time * 1000:8.2f}ms "
+                f"memory {memory_time * 1000:8.2f}ms "
+                f"({database_time / max(memory_time, 1e-9):,.0f}x)"
+                + (
+                    f" counts differ for {', '.join(differences)}"
+                    if differences
+                    else ""
+                )
+            )
+
+    def sample_queries(self, index):
+        """Pick some words, and prefixes of them, from the Columns' names"""
+        words = index.models["column"].words
+        step = max(len(words) // 5, 1)
+        sampled = words[::step][:5]
+        return list(dict.fromkeys(sampled + [word[:3] for word in sampled]))
+
+    def time(self, repeat, search, *args):
+        start = time.time()
+        for _ in range(repeat):
+            results = search(*args)
+        return (time.time() - start) / repeat, results
+
+    def search_database(self, version, query):
+        """Count and get the first page of every model, as the Search view does"""
+        results = SearchResults(version, query)
+        # always the database, even if the memory backend is on
+        results.index = None
+        counts = results.count()
+        return {
+            name: (
+                counts[name],
+                list(
+                    results.get_queryset(name).values_list("pk", flat=True)[:PAGE_SIZE]
+                ),
+            )
+            for name in searchableLUT
+        }
+
+    def search_memory(self, index, query):
+        return {
+            name: (len(pks), pks[:PAGE_SIZE])
+            for name, pks in index.search(query).items()
+        }
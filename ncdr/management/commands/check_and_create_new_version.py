@@ -1,8 +1,48 @@
-from django.core.management.base import BaseCommand
+import cProfile
+
+from django.core.management.base import BaseCommand, CommandError
 
 from ncdr.importers import check_and_import
 
 
 class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Copy Databases which haven't changed from the latest Version",
+        )
+        parser.add_argument(
+            "--profile",
+            metavar="PATH",
+            help="Profile the import and write the pstats file to PATH",
+        )
+
     def handle(self, *args, **options):
-        check_and_import()
+        profiler = None
+        if options["profile"]:
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        try:
+            run = check_and_import(incremental_import=options["incremental"])
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(options["profile"])
+                self.stdout.write(f"Wrote profile to {options['profile']}")
+
+        if run is None:
+            self.stdout.write("No new upstream data")
+            return
+
+        for stage in run.stages.all():
+            self.stdout.write(
+                f"{stage.name}: {stage.duration:.2f}s "
+                f"(upstream {stage.upstream_fetch_time:.2f}s), "
+                f"{stage.rows_read} rows read, {stage.rows_written} written, "
+                f"{stage.queries} queries, peak memory {stage.peak_memory} KiB"
+            )
+
+        if not run.succeeded:
+            raise CommandError(f"Import failed, see {run}")
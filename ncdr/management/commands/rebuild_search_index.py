@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ncdr.models import Version
+from ncdr.search import index_version
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search documents of every Version, or the given ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument("versions", nargs="*", type=int, metavar="version")
+
+    def handle(self, *args, **options):
+        versions = Version.objects.order_by("pk")
+        if options["versions"]:
+            versions = versions.filter(pk__in=options["versions"])
+
+        for version in versions:
+            with transaction.atomic():
+                count = index_version(version)
+            self.stdout.write(f"Indexed {count} objects in {version}")
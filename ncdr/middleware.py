@@ -1,4 +1,4 @@
-from .models import Version
+from . import published
 
 
 def latest_version(get_response):
@@ -12,11 +12,14 @@ def latest_version(get_response):
             "'ncdr.middleware.latest_version'."
         )
 
-        if request.user.is_authenticated and request.user.current_version:
-            version = request.user.current_version
-        else:
-            # Unauthenticated users should get a published version too
-            version = Version.objects.filter(is_published=True).latest()
+        # cached, so this doesn't query on every request
+        version = published.get()
+
+        user = request.user
+        if user.is_authenticated and user.current_version_id:
+            # only fetch the user's Version if it isn't the published one
+            if user.current_version_id != version.pk:
+                version = user.current_version
 
         request.version = version
 
@@ -0,0 +1,16 @@
+# Generated by Django 2.1.7 on 2026-10-18 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("ncdr", "0015_auto_20210705_1346")]
+
+    operations = [
+        migrations.AddField(
+            model_name="database",
+            name="content_hash",
+            field=models.CharField(blank=True, default="", max_length=40),
+        )
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 2.1.7 on 2026-10-18 10:46
+
+from django.db import migrations, models
+
+
+def add_versions(apps, schema_editor):
+    """
+    Record the Versions existing DataElements and Groupings are in
+
+    Until now they were only linked to a Version through their Columns.
+    """
+    DataElement = apps.get_model("ncdr", "DataElement")
+    Grouping = apps.get_model("ncdr", "Grouping")
+    Version = apps.get_model("ncdr", "Version")
+
+    DataElementVersion = DataElement.versions.through
+    GroupingVersion = Grouping.versions.through
+
+    for version in Version.objects.all():
+        data_element_pks = (
+            DataElement.objects.filter(column__table__schema__database__version=version)
+            .values_list("pk", flat=True)
+            .distinct()
+        )
+        DataElementVersion.objects.bulk_create(
+            DataElementVersion(dataelement_id=pk, version_id=version.pk)
+            for pk in data_element_pks
+        )
+
+        grouping_pks = (
+            Grouping.objects.filter(dataelement__versions=version)
+            .values_list("pk", flat=True)
+            .distinct()
+        )
+        GroupingVersion.objects.bulk_create(
+            GroupingVersion(grouping_id=pk, version_id=version.pk)
+            for pk in grouping_pks
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("ncdr", "0016_database_content_hash")]
+
+    operations = [
+        migrations.AddField(
+            model_name="dataelement",
+            name="content_hash",
+            field=models.CharField(
+                blank=True, db_index=True, default="", max_length=40
+            ),
+        ),
+        migrations.AddField(
+            model_name="dataelement",
+            name="versions",
+            field=models.ManyToManyField(
+                related_name="data_elements", to="ncdr.Version"
+            ),
+        ),
+        migrations.AddField(
+            model_name="grouping",
+            name="content_hash",
+            field=models.CharField(
+                blank=True, db_index=True, default="", max_length=40
+            ),
+        ),
+        migrations.AddField(
+            model_name="grouping",
+            name="versions",
+            field=models.ManyToManyField(related_name="groupings", to="ncdr.Version"),
+        ),
+        migrations.RunPython(add_versions, reverse_code=migrations.RunPython.noop),
+    ]
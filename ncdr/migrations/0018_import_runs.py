@@ -0,0 +1,80 @@
+# Generated by Django 2.1.7 on 2026-10-18 10:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ncdr", "0017_content_addressed_data_elements"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportRun",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("started_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                ("incremental", models.BooleanField(default=False)),
+                ("succeeded", models.BooleanField(default=False)),
+                ("error", models.TextField(blank=True, default="")),
+                (
+                    "version",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="import_runs",
+                        to="ncdr.Version",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-started_at"],
+                "get_latest_by": "started_at",
+            },
+        ),
+        migrations.CreateModel(
+            name="ImportStage",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.TextField()),
+                ("duration", models.FloatField(default=0)),
+                ("upstream_fetch_time", models.FloatField(default=0)),
+                ("rows_read", models.IntegerField(default=0)),
+                ("rows_written", models.IntegerField(default=0)),
+                ("queries", models.IntegerField(default=0)),
+                ("peak_memory", models.IntegerField(default=0)),
+                (
+                    "run",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stages",
+                        to="ncdr.ImportRun",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["pk"],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 2.1.7 on 2026-10-18 10:53
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ncdr", "0018_import_runs"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchDocument",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("model_name", models.TextField()),
+                ("object_id", models.IntegerField()),
+                ("document", django.contrib.postgres.search.SearchVectorField()),
+                (
+                    "version",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_documents",
+                        to="ncdr.Version",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="searchdocument",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["document"], name="ncdr_search_documen_f36b7d_gin"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="searchdocument",
+            unique_together={("version", "model_name", "object_id")},
+        ),
+    ]
@@ -0,0 +1,53 @@
+import structlog
+from django.db import DatabaseError, migrations, transaction
+
+logger = structlog.get_logger("ncdr")
+
+# The tables whose names are searched by substring and similarity
+TABLES = ["ncdr_column", "ncdr_table", "ncdr_dataelement"]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """
+    Create the pg_trgm extension and a trigram index on each table's name
+
+    The indexes are on UPPER(name) since that's what icontains compares.
+    pg_trgm ships with Postgres' contrib package, which isn't always
+    installed, so without it we skip the indexes and searches fall back to
+    not using them.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            logger.warning("pg_trgm isn't available, skipping the trigram indexes")
+            return
+
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except DatabaseError as e:
+            logger.warning(
+                f"Unable to create pg_trgm, skipping the trigram indexes: {e}"
+            )
+            return
+
+        for table in TABLES:
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_name_trgm "
+                f"ON {table} USING gin (UPPER(name) gin_trgm_ops)"
+            )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for table in TABLES:
+            cursor.execute(f"DROP INDEX IF EXISTS {table}_name_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("ncdr", "0019_search_documents")]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, reverse_code=drop_trigram_indexes)
+    ]
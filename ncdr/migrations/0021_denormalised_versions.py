@@ -0,0 +1,53 @@
+# Generated by Django 2.1.7 on 2026-10-18 11:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Copy each Schema's Version from its Database, then each Table's from its
+# Schema and each Column's from its Table
+SET_VERSIONS = """
+UPDATE ncdr_schema s SET version_id = d.version_id
+FROM ncdr_database d WHERE d.id = s.database_id;
+
+UPDATE ncdr_table t SET version_id = s.version_id
+FROM ncdr_schema s WHERE s.id = t.schema_id;
+
+UPDATE ncdr_column c SET version_id = t.version_id
+FROM ncdr_table t WHERE t.id = c.table_id;
+"""
+
+
+def version_field(related_name, null):
+    return models.ForeignKey(
+        null=null,
+        on_delete=django.db.models.deletion.CASCADE,
+        related_name=related_name,
+        to="ncdr.Version",
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("ncdr", "0020_trigram_indexes")]
+
+    operations = [
+        migrations.AddField(
+            model_name="schema", name="version", field=version_field("schemas", True)
+        ),
+        migrations.AddField(
+            model_name="table", name="version", field=version_field("tables", True)
+        ),
+        migrations.AddField(
+            model_name="column", name="version", field=version_field("columns", True)
+        ),
+        migrations.RunSQL(SET_VERSIONS, reverse_sql=migrations.RunSQL.noop),
+        migrations.AlterField(
+            model_name="schema", name="version", field=version_field("schemas", False)
+        ),
+        migrations.AlterField(
+            model_name="table", name="version", field=version_field("tables", False)
+        ),
+        migrations.AlterField(
+            model_name="column", name="version", field=version_field("columns", False)
+        ),
+    ]
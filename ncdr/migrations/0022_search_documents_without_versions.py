@@ -0,0 +1,22 @@
+# Generated by Django 2.1.7 on 2026-10-18 11:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("ncdr", "0021_denormalised_versions")]
+
+    operations = [
+        migrations.AlterField(
+            model_name="searchdocument",
+            name="version",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="search_documents",
+                to="ncdr.Version",
+            ),
+        )
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.1.7 on 2026-10-18 11:16
+
+from django.db import migrations, models
+
+# Count the Columns with each DataElement in every existing Version, as
+# column.set_usage_counts does when a Version is imported
+SET_USAGE_COUNTS = """
+UPDATE ncdr_column c SET usage_count = u.count
+FROM (
+    SELECT version_id, data_element_id, count(*) AS count
+    FROM ncdr_column
+    WHERE data_element_id IS NOT NULL
+    GROUP BY version_id, data_element_id
+) u
+WHERE c.version_id = u.version_id AND c.data_element_id = u.data_element_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("ncdr", "0022_search_documents_without_versions")]
+
+    operations = [
+        migrations.AddField(
+            model_name="column",
+            name="usage_count",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunSQL(SET_USAGE_COUNTS, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,88 @@
+from django.db import migrations
+
+# Build the SearchDocuments of the Versions imported before there were any.
+# Searches only match objects with a document so, without these, those
+# Versions would have no search results.
+
+# The fields of each model which are searched, with their weights, as
+# ncdr.search.build_vector builds them when a Version is imported
+DOCUMENTS = {
+    "column": [("name", "A"), ("description", "B")],
+    "database": [
+        ("display_name", "A"),
+        ("name", "A"),
+        ("description", "B"),
+        ("link", "C"),
+    ],
+    "dataelement": [("name", "A"), ("description", "B")],
+    "grouping": [("name", "A"), ("description", "B")],
+    "table": [("name", "A"), ("description", "B"), ("link", "C")],
+    "metric": [("indicator", "A"), ("definition", "B")],
+}
+
+# The table each model's objects, and the Versions they're in, are read from.
+# Metrics aren't in a Version, see ncdr.search.index_unversioned.
+VERSIONS = {
+    "column": ("ncdr_column o", "o.version_id"),
+    "database": ("ncdr_database o", "o.version_id"),
+    "dataelement": (
+        "ncdr_dataelement o "
+        "JOIN ncdr_dataelement_versions v ON v.dataelement_id = o.id",
+        "v.version_id",
+    ),
+    "grouping": (
+        "ncdr_grouping o JOIN ncdr_grouping_versions v ON v.grouping_id = o.id",
+        "v.version_id",
+    ),
+    "table": ("ncdr_table o", "o.version_id"),
+    "metric": ("metrics_metric o", None),
+}
+
+
+def build_documents(model_name):
+    """
+    Build the SearchDocuments of the given model's objects in every Version,
+    or with no Version for Metrics
+
+    Objects which already have a document, from rebuild_search_index or
+    import_metrics, are left alone.
+    """
+    document = " || ".join(
+        f"setweight(to_tsvector('simple'::regconfig, COALESCE(o.{field}, '')), "
+        f"'{weight}')"
+        for field, weight in DOCUMENTS[model_name]
+    )
+    source, version = VERSIONS[model_name]
+    if version is None:
+        version, same_version = "NULL", "d.version_id IS NULL"
+    else:
+        same_version = f"d.version_id = {version}"
+
+    return f"""
+    INSERT INTO ncdr_searchdocument (version_id, model_name, object_id, document)
+    SELECT {version}, '{model_name}', o.id, {document}
+    FROM {source}
+    WHERE NOT EXISTS (
+        SELECT 1 FROM ncdr_searchdocument d
+        WHERE {same_version}
+        AND d.model_name = '{model_name}'
+        AND d.object_id = o.id
+    );
+    """
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("metrics", "0003_auto_20190605_0927"),
+        ("ncdr", "0023_column_usage_counts"),
+    ]
+
+    operations = [
+        # Metrics' documents are built whether or not METRICS_ENABLED is on,
+        # as import_metrics does, so they're ready if they're turned on
+        migrations.RunSQL(
+            [build_documents(model_name) for model_name in DOCUMENTS],
+            reverse_sql=migrations.RunSQL.noop,
+        )
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+# unique_together on (version, model_name, object_id) doesn't stop duplicate
+# documents without a Version since NULLs aren't equal, so any duplicates are
+# dropped, keeping the first, and a partial unique index covers those rows.
+UNIQUE_UNVERSIONED = """
+DELETE FROM ncdr_searchdocument a
+USING ncdr_searchdocument b
+WHERE a.version_id IS NULL AND b.version_id IS NULL
+AND a.model_name = b.model_name AND a.object_id = b.object_id
+AND a.id > b.id;
+
+CREATE UNIQUE INDEX ncdr_searchdocument_unversioned_uniq
+ON ncdr_searchdocument (model_name, object_id)
+WHERE version_id IS NULL;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("ncdr", "0024_build_search_documents")]
+
+    operations = [
+        migrations.RunSQL(
+            UNIQUE_UNVERSIONED,
+            reverse_sql="DROP INDEX ncdr_searchdocument_unversioned_uniq",
+        )
+    ]
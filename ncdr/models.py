@@ -6,6 +6,8 @@ from django.contrib.auth.models import (
     _user_has_module_perms,
     _user_has_perm,
 )
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import FileExtensionValidator
 from django.db import models, transaction
 from django.urls import reverse
@@ -61,6 +63,11 @@ class Column(BaseModel, models.Model):
         "DataElement", on_delete=models.SET_NULL, null=True, blank=True
     )
     table = models.ForeignKey("Table", on_delete=models.CASCADE)
+    # the Table's Version, denormalised so Columns can be filtered by Version
+    # without joining through Table, Schema and Database
+    version = models.ForeignKey(
+        "Version", on_delete=models.CASCADE, related_name="columns"
+    )
 
     name = models.TextField()
     description = models.TextField(blank=True, default="")
@@ -75,6 +82,9 @@ class Column(BaseModel, models.Model):
     author = models.TextField(blank=True, null=True)
     created_date_ext = models.DateField(blank=True, null=True)
     link = models.URLField(max_length=500, blank=True, null=True)
+    # the number of Columns in the Version with this Column's DataElement,
+    # counted when the Version is imported (see column.set_usage_counts)
+    usage_count = models.PositiveIntegerField(default=1)
 
     class Meta:
         ordering = ["name"]
@@ -84,6 +94,11 @@ class Column(BaseModel, models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if self.version_id is None:
+            self.version_id = self.table.version_id
+        return super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse(
             "column_detail",
@@ -92,17 +107,7 @@ class Column(BaseModel, models.Model):
 
     @cached_property
     def images(self):
-        table = self.table
-        schema = table.schema
-        database = schema.database
-
-        relations = ColumnImageRelation.objects.filter(
-            database_name=database.name,
-            schema_name=schema.name,
-            table_name=table.name,
-            column_name=self.name,
-        ).select_related("column_image")
-        return list(set([i.column_image for i in relations]))
+        return images_for_columns([self])[self.pk]
 
     @property
     def link_display_name(self):
@@ -110,13 +115,6 @@ class Column(BaseModel, models.Model):
             stripped = self.link.lstrip("http://").lstrip("https://")
             return stripped.lstrip("www.").split("/")[0]
 
-    @cached_property
-    def usage_count(self):
-        count = self.tables.count()
-        if self.data_element:
-            count += self.data_element.column_set.count()
-        return count
-
 
 class Database(BaseModel):
     SEARCH_FIELDS = ["display_name", "name", "description", "link"]
@@ -131,6 +129,11 @@ class Database(BaseModel):
     link = models.URLField(max_length=500, blank=True, null=True)
     owner = models.TextField(blank=True, null=True)
 
+    # A hash of the upstream rows this Database, its Schemas, Tables and
+    # Columns were built from.  Used by incremental imports to find unchanged
+    # Databases.
+    content_hash = models.CharField(max_length=40, blank=True, default="")
+
     class Meta:
         ordering = ["display_name"]
         unique_together = ["name", "version"]
@@ -162,11 +165,18 @@ class DataElement(BaseModel, models.Model):
     SEARCH_FIELDS = ["name", "description"]
 
     grouping = models.ManyToManyField("Grouping")
+    versions = models.ManyToManyField("Version", related_name="data_elements")
 
     name = models.TextField()
     description = models.TextField(default="")
     slug = models.SlugField(max_length=255, blank=True)
 
+    # A hash of the name, description and Groupings.  Imports reuse an
+    # existing DataElement with the same hash instead of creating a new one.
+    content_hash = models.CharField(
+        max_length=40, blank=True, default="", db_index=True
+    )
+
     class Meta:
         ordering = ["name"]
         verbose_name = "Data Element"
@@ -177,20 +187,35 @@ class DataElement(BaseModel, models.Model):
     def get_absolute_url(self):
         return reverse("data_element_detail", kwargs={"slug": self.slug})
 
-    def get_description(self):
+    def get_description(self, version):
+        """
+        Get the description, or that of a Column in the given Version if
+        there isn't one
+
+        DataElements are shared between Versions so only the Version being
+        viewed's Columns are used.  Without any there's no description.
+        """
         if self.description:
             return self.description
-        else:
-            return self.column_set.first().description
+
+        column = self.column_set.filter(version=version).first()
+        return column.description if column else ""
 
 
 class Grouping(BaseModel, models.Model):
     SEARCH_FIELDS = ["name", "description"]
 
+    versions = models.ManyToManyField("Version", related_name="groupings")
+
     name = models.TextField()
     slug = models.SlugField(max_length=255, blank=True)
     description = models.TextField(null=True, blank=True)
 
+    # A hash of the name and description, see DataElement.content_hash
+    content_hash = models.CharField(
+        max_length=40, blank=True, default="", db_index=True
+    )
+
     class Meta:
         ordering = ["name"]
         verbose_name = "Grouping"
@@ -202,12 +227,72 @@ class Grouping(BaseModel, models.Model):
         return reverse("grouping_detail", kwargs={"slug": self.slug})
 
 
+class ImportRun(models.Model):
+    """
+    A run of the upstream import which created, or failed to create, a Version
+    """
+
+    version = models.ForeignKey(
+        "Version",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="import_runs",
+    )
+
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    incremental = models.BooleanField(default=False)
+    succeeded = models.BooleanField(default=False)
+    error = models.TextField(blank=True, default="")
+
+    class Meta:
+        get_latest_by = "started_at"
+        ordering = ["-started_at"]
+
+    def __str__(self):
+        return f"Import Run {self.pk}"
+
+    @property
+    def duration(self):
+        if self.finished_at:
+            return self.finished_at - self.started_at
+
+
+class ImportStage(models.Model):
+    """The metrics recorded for one stage of an ImportRun"""
+
+    run = models.ForeignKey(
+        "ImportRun", on_delete=models.CASCADE, related_name="stages"
+    )
+
+    name = models.TextField()
+    # seconds
+    duration = models.FloatField(default=0)
+    upstream_fetch_time = models.FloatField(default=0)
+    rows_read = models.IntegerField(default=0)
+    rows_written = models.IntegerField(default=0)
+    queries = models.IntegerField(default=0)
+    # peak resident memory of the import process at the end of the stage, KiB
+    peak_memory = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["pk"]
+
+    def __str__(self):
+        return self.name
+
+
 class Schema(BaseModel, models.Model):
     name = models.TextField()
 
     database = models.ForeignKey(
         "Database", on_delete=models.CASCADE, related_name="schemas"
     )
+    # the Database's Version, denormalised like Column.version
+    version = models.ForeignKey(
+        "Version", on_delete=models.CASCADE, related_name="schemas"
+    )
 
     class Meta:
         ordering = ["name"]
@@ -217,6 +302,43 @@ class Schema(BaseModel, models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if self.version_id is None:
+            self.version_id = self.database.version_id
+        return super().save(*args, **kwargs)
+
+
+class SearchDocument(models.Model):
+    """
+    The full text search document for one searchable object in a Version
+
+    Documents are built by ncdr.search when a Version is imported so
+    searches use the GIN index rather than scanning every row.
+    """
+
+    # null for the models which aren't in a Version, like Metric
+    version = models.ForeignKey(
+        "Version",
+        on_delete=models.CASCADE,
+        null=True,
+        related_name="search_documents",
+    )
+
+    # the searchableLUT key of the model, eg "column"
+    model_name = models.TextField()
+    object_id = models.IntegerField()
+    document = SearchVectorField()
+
+    class Meta:
+        indexes = [GinIndex(fields=["document"])]
+        # also indexes the version and model_name each search filters on.
+        # NULLs aren't equal to each other so migration 0025 adds a partial
+        # unique index for the documents without a Version.
+        unique_together = ["version", "model_name", "object_id"]
+
+    def __str__(self):
+        return f"{self.model_name} {self.object_id} in {self.version}"
+
 
 class Table(BaseModel):
     SEARCH_FIELDS = ["name", "description", "link"]
@@ -234,6 +356,10 @@ class Table(BaseModel):
     schema = models.ForeignKey(
         "Schema", on_delete=models.CASCADE, related_name="tables"
     )
+    # the Schema's Version, denormalised like Column.version
+    version = models.ForeignKey(
+        "Version", on_delete=models.CASCADE, related_name="tables"
+    )
 
     class Meta:
         ordering = ["name"]
@@ -243,6 +369,11 @@ class Table(BaseModel):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if self.version_id is None:
+            self.version_id = self.schema.version_id
+        return super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         kwargs = {"pk": self.pk, "db_name": self.schema.database.name}
         return reverse("table_detail", kwargs=kwargs)
@@ -346,11 +477,18 @@ class ColumnImage(models.Model):
     )
     created = models.DateTimeField(default=timezone.now)
 
-    def columns(self):
-        result = []
-        for relation in self.columnimagerelation_set.all():
-            result.append((relation.path(), relation.column_url()))
-        return result
+    def columns(self, urls=None):
+        """
+        Get the path of each Column the image is for, with the url of the
+        published Column at that path or None
+
+        Pages listing several images pass in the urls of all of their
+        relations, from published_column_urls, so they're found in one query.
+        """
+        relations = list(self.columnimagerelation_set.all())
+        if urls is None:
+            urls = published_column_urls(relations)
+        return [(r.path(), urls.get(r.column_path)) for r in relations]
 
 
 class ColumnImageRelation(models.Model):
@@ -371,18 +509,90 @@ class ColumnImageRelation(models.Model):
         ]
 
     def path(self):
-        return f"{self.database_name}.{self.schema_name}{self.table_name}.{self.column_name}"
+        return f"{self.database_name}.{self.schema_name}.{self.table_name}.{self.column_name}"
+
+    @property
+    def column_path(self):
+        return (self.database_name, self.schema_name, self.table_name, self.column_name)
 
     def column_url(self):
-        column = Column.objects.filter(
-            table__schema__database__version__is_published=True,
-            table__schema__database__name=self.database_name,
-            table__schema__name=self.schema_name,
-            table__name=self.table_name,
-            name=self.column_name,
-        ).first()
-        if column:
-            return column.get_absolute_url()
+        return published_column_urls([self]).get(self.column_path)
+
+
+def get_column_path(column):
+    """
+    Get the (database, schema, table, column) names of the given Column,
+    which ColumnImageRelations are matched on
+
+    Select the Column's Table, Schema and Database with it to avoid three
+    queries.
+    """
+    table = column.table
+    return (table.schema.database.name, table.schema.name, table.name, column.name)
+
+
+def images_for_columns(columns):
+    """
+    Get the ColumnImages for each of the given Columns, keyed by their pk
+
+    Images are matched by name, in any Version, so this is one query however
+    many Columns there are.
+    """
+    paths = {column.pk: get_column_path(column) for column in columns}
+
+    # narrowed down by name here and matched on the whole path below
+    relations = (
+        ColumnImageRelation.objects.filter(
+            table_name__in={path[2] for path in paths.values()},
+            column_name__in={path[3] for path in paths.values()},
+        )
+        .select_related("column_image")
+        .order_by("column_image_id")
+    )
+    images = {}
+    for relation in relations:
+        images.setdefault(relation.column_path, {})[
+            relation.column_image_id
+        ] = relation.column_image
+
+    return {pk: list(images.get(path, {}).values()) for pk, path in paths.items()}
+
+
+def published_column_urls(relations):
+    """
+    Get the url of the published Column at each of the given
+    ColumnImageRelations' paths, keyed by path
+
+    Paths without a published Column are left out.  This is one query however
+    many relations there are.
+    """
+    relations = list(relations)
+    if not relations:
+        return {}
+
+    columns = (
+        Column.objects.filter(
+            version__is_published=True,
+            table__name__in={r.table_name for r in relations},
+            name__in={r.column_name for r in relations},
+        )
+        .order_by("pk")
+        .values_list(
+            "table__schema__database__name",
+            "table__schema__name",
+            "table__name",
+            "name",
+            "pk",
+        )
+    )
+    paths = {r.column_path for r in relations}
+
+    urls = {}
+    for *path, pk in columns:
+        path = tuple(path)
+        if path in paths and path not in urls:
+            urls[path] = reverse("column_detail", kwargs={"db_name": path[0], "pk": pk})
+    return urls
 
 
 class Version(models.Model):
@@ -417,6 +627,11 @@ class Version(models.Model):
             changed_to_published=publish,
         )
 
+        # imported here since ncdr.published imports this module
+        from . import published
+
+        transaction.on_commit(published.invalidate)
+
     def publish(self, user):
         self._set_publish_state(True, user)
 
@@ -0,0 +1,199 @@
+"""
+Keyset pagination
+
+Django's Paginator counts every row and then OFFSETs past the earlier pages,
+so each page is slower than the one before.  KeysetPaginationMixin instead
+pages through a ListView's queryset in keyset_ordering, filtering for the rows
+after (or before) the last one shown, so a deep page costs the same as the
+first.  Pages are linked by cursors, encoding the ordering's values for the
+row at the edge of a page, rather than numbered.
+
+The total is counted once and cached, so it's approximate for querysets which
+can change, like Versions, but exact for a Version's contents.
+"""
+import base64
+import hashlib
+import json
+
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+
+def encode_cursor(values):
+    data = json.dumps(values, cls=DjangoJSONEncoder).encode()
+    # the padding is dropped to keep the = signs out of URLs
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def get_field(model, name):
+    return model._meta.pk if name == "pk" else model._meta.get_field(name)
+
+
+def decode_cursor(cursor, ordering, model):
+    """
+    Get the values of the fields in ordering from the given cursor
+
+    Cursors come from URLs so each value is converted to its field's type,
+    anything which can't be raises Http404 rather than failing the query.
+    """
+    padding = "=" * (-len(cursor) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(f"{cursor}{padding}".encode()))
+    except ValueError:
+        raise Http404("Invalid cursor")
+
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise Http404("Invalid cursor")
+
+    fields = [get_field(model, name.lstrip("-")) for name in ordering]
+    try:
+        values = [field.to_python(value) for field, value in zip(fields, values)]
+    except (TypeError, ValueError, ValidationError):
+        raise Http404("Invalid cursor")
+
+    # None can't be compared with, and the ordering's fields aren't nullable
+    if None in values:
+        raise Http404("Invalid cursor")
+
+    return values
+
+
+def keyset_filter(ordering, values, after=True):
+    """
+    Build a Q matching rows after, or before, the one with the given values
+    for the fields in ordering
+
+    For ("name", "pk") that's name > x OR (name = x AND pk > y).
+    """
+    q = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        descending = field.startswith("-")
+        name = field.lstrip("-")
+        lookup = "lt" if descending == after else "gt"
+
+        q |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+    return q
+
+
+class KeysetPage:
+    """
+    One page of a KeysetPaginator
+
+    Quacks enough like Django's Page for templates and ListView.
+    """
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f"<Keyset page of {len(self.object_list)}>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Page through a queryset in the given ordering of its model's fields
+
+    The ordering must be unique, so end it with "pk".
+    """
+
+    # lets templates tell this apart from Django's Paginator
+    keyset = True
+
+    def __init__(self, queryset, per_page, ordering, count_timeout):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.count_timeout = count_timeout
+
+    @cached_property
+    def count(self):
+        """The number of rows, cached for count_timeout seconds"""
+        queryset = self.queryset.order_by()
+        try:
+            sql = str(queryset.query)
+        except EmptyResultSet:
+            return 0
+
+        key = f"pagination:count:{hashlib.sha1(sql.encode()).hexdigest()}"
+        return caches["default"].get_or_set(key, queryset.count, self.count_timeout)
+
+    def get_cursor(self, obj):
+        return encode_cursor(
+            [getattr(obj, field.lstrip("-")) for field in self.ordering]
+        )
+
+    def page(self, after=None, before=None):
+        """Get the page after the after cursor, before the before one, or the first"""
+        queryset = self.queryset.order_by(*self.ordering)
+
+        if before is not None:
+            values = decode_cursor(before, self.ordering, self.queryset.model)
+            queryset = queryset.filter(keyset_filter(self.ordering, values, False))
+            # read backwards from the cursor, and put the page back in order
+            rows = list(queryset.reverse()[: self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[: self.per_page][::-1]
+            has_next = True
+        else:
+            if after is not None:
+                values = decode_cursor(after, self.ordering, self.queryset.model)
+                queryset = queryset.filter(keyset_filter(self.ordering, values))
+            rows = list(queryset[: self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            rows = rows[: self.per_page]
+            has_previous = after is not None
+
+        return KeysetPage(
+            rows,
+            self,
+            next_cursor=self.get_cursor(rows[-1]) if has_next and rows else None,
+            previous_cursor=self.get_cursor(rows[0]) if has_previous and rows else None,
+        )
+
+
+class KeysetPaginationMixin:
+    """
+    Page a ListView with a KeysetPaginator in keyset_ordering
+
+    Pages are chosen with the after and before GET params, which the
+    pagination template tag links to, instead of page.
+    """
+
+    keyset_ordering = ("name", "pk")
+    count_timeout = 60 * 60
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(
+            queryset, page_size, self.keyset_ordering, self.count_timeout
+        )
+        page = paginator.page(
+            after=self.request.GET.get("after"), before=self.request.GET.get("before")
+        )
+        return paginator, page, page.object_list, page.has_other_pages()
@@ -0,0 +1,74 @@
+"""
+The published Version
+
+Every request needs the published Version (see middleware.latest_version) so
+rather than querying for it each time it's cached in the default cache, under
+a generation token, and in each process.  A process only checks the token
+every PUBLISHED_VERSION_CHECK_INTERVAL seconds.
+
+Publishing or unpublishing a Version replaces the token, so with a cache the
+workers share they all fetch the new published Version within that interval.
+The cached Version also expires after PUBLISHED_VERSION_TIMEOUT seconds, which
+bounds the delay when each worker has its own cache.
+"""
+import collections
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Version
+
+GENERATION_KEY = "published_version:generation"
+
+Cached = collections.namedtuple("Cached", ["version", "checked_at"])
+
+_cached = None
+
+
+def version_key(generation):
+    return f"published_version:{generation}"
+
+
+def get_generation():
+    """Get the token the published Version is cached under"""
+    return caches["default"].get_or_set(
+        GENERATION_KEY, lambda: uuid.uuid4().hex, timeout=None
+    )
+
+
+def get():
+    """Get the latest published Version"""
+    global _cached
+
+    now = time.monotonic()
+    cached = _cached
+    if (
+        cached is not None
+        and now - cached.checked_at < settings.PUBLISHED_VERSION_CHECK_INTERVAL
+    ):
+        return cached.version
+
+    cache = caches["default"]
+    generation = get_generation()
+    version = cache.get(version_key(generation))
+    if version is None:
+        version = Version.objects.filter(is_published=True).latest()
+        cache.set(version_key(generation), version, settings.PUBLISHED_VERSION_TIMEOUT)
+
+    _cached = Cached(version, now)
+    return version
+
+
+def invalidate():
+    """
+    Forget the published Version, in this process and the cache
+
+    Call this once the change of published Version has been committed, so the
+    Version fetched under the new token can't be the old one.
+    """
+    global _cached
+
+    _cached = None
+    caches["default"].delete(GENERATION_KEY)
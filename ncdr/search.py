@@ -0,0 +1,624 @@
+"""
+Full text search
+
+Each searchable object in a Version gets a SearchDocument holding a tsvector
+of its SEARCH_FIELDS, built once when the Version is imported.  Searches
+match those documents with a GIN index and rank them with ts_rank instead of
+scanning every row of every Version with icontains.
+
+Results are scored by their rank plus a boost when their name is, or starts
+with, the search text, so the exact match comes first rather than among the
+objects which only mention it in their descriptions.  Ties go to the objects
+used most (see usage).
+
+Fuzzy searches, for misspelt names, compare names by trigram similarity
+using pg_trgm when it's installed.
+
+A Version's contents don't change once it's imported so result counts and
+pages of result ids are cached per Version, in the "search" cache, until its
+documents are rebuilt or it's deleted.
+"""
+import functools
+import hashlib
+import re
+import uuid
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    FloatField,
+    Func,
+    IntegerField,
+    OuterRef,
+    Prefetch,
+    Q,
+    Subquery,
+    TextField,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Upper
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils.functional import cached_property
+
+from metrics.models import Metric
+
+from . import search_index
+from .models import (
+    Column,
+    Database,
+    DataElement,
+    Grouping,
+    SearchDocument,
+    Table,
+    Version,
+)
+
+# The simple config doesn't stem or drop stop words, which suits the names of
+# tables and columns, and lets us do prefix matching on whole words.
+CONFIG = "simple"
+
+# Every model with SearchDocuments.  Metrics aren't in a Version so neither
+# are their SearchDocuments (see index_unversioned).
+indexedLUT = {
+    "column": {"model": Column, "version_link": "version"},
+    "database": {"model": Database, "version_link": "version"},
+    "dataelement": {"model": DataElement, "version_link": "versions"},
+    "grouping": {"model": Grouping, "version_link": "versions"},
+    "table": {"model": Table, "version_link": "version"},
+    "metric": {"model": Metric, "version_link": None},
+}
+
+# The models which are searched.  Metrics are only searched when the metrics
+# pages are enabled, since that's where their results link to, but their
+# documents are built either way so they can be turned on at any time.
+searchableLUT = {
+    model_name: info
+    for model_name, info in indexedLUT.items()
+    if model_name != "metric" or settings.METRICS_ENABLED
+}
+
+# Matches in names rank above descriptions, which rank above anything else
+WEIGHTS = {
+    "name": "A",
+    "display_name": "A",
+    "indicator": "A",
+    "description": "B",
+    "definition": "B",
+}
+
+# Added to the rank of results whose name is the search text, or starts with
+# it.  ts_rank rarely reaches 1 so these outweigh where else the words matched.
+EXACT_MATCH_BOOST = 2.0
+PREFIX_MATCH_BOOST = 1.0
+
+
+def get_model_name(model):
+    return model.__name__.lower()
+
+
+def get_name_field(model):
+    """Get the field which names the given model's objects, see SEARCH_NAME_FIELD"""
+    return getattr(model, "SEARCH_NAME_FIELD", "name")
+
+
+def in_version(model_name, version):
+    """
+    Get the objects of the given model in the given Version, or all of them
+    if the model isn't versioned
+    """
+    info = indexedLUT[model_name]
+    qs = info["model"].objects.all()
+    if info["version_link"] is None:
+        return qs
+    return qs.filter(**{info["version_link"]: version})
+
+
+def build_vector(model):
+    vectors = [
+        SearchVector(field, config=CONFIG, weight=WEIGHTS.get(field, "C"))
+        for field in model.SEARCH_FIELDS
+    ]
+    vector = vectors[0]
+    for other in vectors[1:]:
+        vector = vector + other
+    return vector
+
+
+def insert_documents(model_name, version):
+    """
+    Build the SearchDocuments for the given model's objects in the given
+    Version, or with no Version for unversioned models
+
+    The documents are built in the database with one INSERT ... SELECT so
+    nothing passes through Python.  Returns the number created.
+    """
+    model = indexedLUT[model_name]["model"]
+    version_pk = version.pk if version is not None else None
+    documents = (
+        in_version(model_name, version)
+        .annotate(
+            search_version=Value(version_pk, output_field=IntegerField()),
+            search_model_name=Value(model_name, output_field=TextField()),
+            search_object_id=F("pk"),
+            search_document=build_vector(model),
+        )
+        .order_by()
+        # Only selecting annotations keeps the columns in this order
+        .values_list(
+            "search_version",
+            "search_model_name",
+            "search_object_id",
+            "search_document",
+        )
+    )
+    sql, params = documents.query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {SearchDocument._meta.db_table}
+                (version_id, model_name, object_id, document)
+            {sql}
+            """,
+            params,
+        )
+        return cursor.rowcount
+
+
+def index_version(version):
+    """
+    Build the SearchDocuments for every searchable object in the given Version
+
+    Returns the number created.
+    """
+    SearchDocument.objects.filter(version=version).delete()
+
+    count = sum(
+        insert_documents(model_name, version)
+        for model_name, info in indexedLUT.items()
+        if info["version_link"] is not None
+    )
+
+    # Drop any results cached from the old documents once the new ones are
+    # visible to other connections
+    transaction.on_commit(lambda: invalidate(version))
+
+    return count
+
+
+def index_unversioned():
+    """
+    Build the SearchDocuments for the models which aren't in a Version, even
+    if they aren't searched
+
+    Every Version's searches include them so all of the cached results are
+    dropped.  Returns the number created.
+    """
+    SearchDocument.objects.filter(version=None).delete()
+
+    count = sum(
+        insert_documents(model_name, None)
+        for model_name, info in indexedLUT.items()
+        if info["version_link"] is None
+    )
+
+    def invalidate_all():
+        for version in Version.objects.all():
+            invalidate(version)
+
+    transaction.on_commit(invalidate_all)
+
+    return count
+
+
+def generation_key(version):
+    return f"search:{version.pk}:generation"
+
+
+def get_generation(version):
+    """
+    Get the token which the given Version's cached results are keyed on
+
+    It's random, rather than a counter, so a token evicted from the cache
+    can't be handed out again and resurrect results cached under it.
+    """
+    return caches["search"].get_or_set(
+        generation_key(version), lambda: uuid.uuid4().hex, timeout=None
+    )
+
+
+def invalidate(version):
+    """
+    Forget the given Version's cached search results
+
+    Its generation token is dropped so the results cached under it can't be
+    found, they're left for the cache to evict.
+    """
+    caches["search"].delete(generation_key(version))
+
+
+@receiver(post_delete, sender=Version)
+def invalidate_deleted_version(sender, instance, **kwargs):
+    invalidate(instance)
+
+
+def normalise(text):
+    """Normalise search text so equivalent searches share cached results"""
+    return " ".join(text.lower().split())
+
+
+class NormalisedName(Func):
+    """
+    Lower case a name and replace anything but letters and digits with single
+    spaces, to compare with search text split into words the same way
+    """
+
+    template = (
+        "btrim(regexp_replace(lower(%(expressions)s), '[^[:alnum:]]+', ' ', 'g'))"
+    )
+    output_field = TextField()
+
+
+def usage(model_name, version):
+    """
+    How widely used each object is, to break ties between results
+
+    That's a Column's usage_count, or the number of Columns in the version
+    with a DataElement.  Other models' objects are all used equally, so this
+    returns None for them.
+    """
+    if model_name == "column":
+        return F("usage_count")
+    if model_name != "dataelement":
+        return None
+
+    counts = (
+        Column.objects.filter(version=version, data_element=OuterRef("pk"))
+        .order_by()
+        .values("data_element")
+        .annotate(count=Count("pk"))
+    )
+    return Coalesce(
+        Subquery(counts.values("count"), output_field=IntegerField()), Value(0)
+    )
+
+
+class PrefixSearchQuery(SearchQuery):
+    """
+    Match documents with a word starting with each word of the given text
+
+    "arriv mode" becomes the tsquery 'arriv':* & 'mode':* so, like the
+    icontains search this replaces, partially typed words still match.
+    """
+
+    def __init__(self, text, **kwargs):
+        words = re.findall(r"\w+", text.lower())
+        super().__init__(" & ".join(f"{word}:*" for word in words), **kwargs)
+
+    def as_sql(self, compiler, connection):
+        sql, params = super().as_sql(compiler, connection)
+        return sql.replace("plainto_tsquery", "to_tsquery"), params
+
+
+def search(model, version, search_param):
+    """
+    Search the given model at the given version for the given search parameter
+
+    Results are ordered by score, best first, then by usage and the model's
+    ordering, with ties broken by pk.  The version is
+    None for models which aren't versioned, like Metric.
+    """
+    words = " ".join(search_index.tokenise(search_param))
+    if not words:
+        return model.objects.none()
+
+    model_name = get_model_name(model)
+    query = PrefixSearchQuery(search_param, config=CONFIG)
+    documents = SearchDocument.objects.filter(
+        version=version, model_name=model_name, document=query
+    )
+    ranks = documents.filter(object_id=OuterRef("pk")).annotate(
+        rank=SearchRank(F("document"), query)
+    )
+
+    results = model.objects.filter(pk__in=documents.values("object_id")).annotate(
+        rank=Subquery(ranks.values("rank")[:1], output_field=FloatField()),
+        normalised_name=NormalisedName(get_name_field(model)),
+    )
+    results = results.annotate(
+        score=F("rank")
+        + Case(
+            When(normalised_name=words, then=Value(EXACT_MATCH_BOOST)),
+            When(normalised_name__startswith=words, then=Value(PREFIX_MATCH_BOOST)),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    )
+
+    # pk breaks any remaining ties so pages of results don't overlap
+    object_usage = usage(model_name, version)
+    if object_usage is None:
+        return results.order_by("-score", *model._meta.ordering, "pk")
+    return results.annotate(usage=object_usage).order_by(
+        "-score", "-usage", *model._meta.ordering, "pk"
+    )
+
+
+@functools.lru_cache()
+def has_trigram_support():
+    """
+    Is pg_trgm installed?
+
+    The trigram indexes are only created when it's available (see migration
+    0020) so we check before using its operators.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def set_similarity_threshold():
+    """
+    Set the similarity the % operator compares against for this connection
+
+    % doesn't take the threshold as an argument but it's what lets the
+    trigram indexes be used, so we set it from SEARCH_FUZZY_THRESHOLD before
+    searching.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT set_config('pg_trgm.similarity_threshold', %s, false)",
+            [str(settings.SEARCH_FUZZY_THRESHOLD)],
+        )
+
+
+def similar_names(model, version, search_param):
+    """
+    Get the objects of the given model at the given version with names similar
+    to the search parameter, most similar first
+
+    Expects pg_trgm to be installed and the threshold to have been set.
+    """
+    # Trigrams are case insensitive so compare UPPER(name), which the
+    # trigram indexes are built on.
+    text = search_param.upper()
+    model_name = get_model_name(model)
+    name = Upper(get_name_field(model))
+    return (
+        in_version(model_name, version)
+        .annotate(upper_name=name, similarity=TrigramSimilarity(name, text))
+        .filter(upper_name__trigram_similar=text)
+        .order_by("-similarity", *model._meta.ordering, "pk")
+    )
+
+
+def fuzzy_search(model, version, search_param):
+    """
+    Search the names of the given model at the given version for similar text
+
+    Similarity is measured by pg_trgm, names less similar than the
+    SEARCH_FUZZY_THRESHOLD setting are left out and the rest are ordered by
+    similarity, best first.  Without pg_trgm this is a normal search.
+    """
+    if not search_param or not search_param.strip():
+        return model.objects.none()
+
+    if not has_trigram_support():
+        return search(model, version, search_param)
+
+    set_similarity_threshold()
+    return similar_names(model, version, search_param)
+
+
+class SearchResults:
+    """
+    The results of one search of a Version across every searchable model
+
+    The querysets are built as they're needed and the number of results for
+    every model is counted in a single query, so everything handling a
+    request should share one instance (see for_request).
+
+    Counts and the ids of each page of results are cached, keyed on the
+    Version and the normalised text, so a repeated search only touches the
+    database to fetch the objects being shown.  Searches of the published
+    Version are answered by search_index instead, when it's enabled.
+    """
+
+    def __init__(self, version, text, fuzzy=False):
+        self.version = version
+        self.text = text
+        self.fuzzy = fuzzy
+        # without pg_trgm a fuzzy search is a normal search
+        self.use_trigrams = fuzzy and has_trigram_support()
+        self._querysets = {}
+        self._threshold_set = False
+        # the in-memory index doesn't do fuzzy searches
+        self.index = None if fuzzy else search_index.get(version)
+
+    @property
+    def has_words(self):
+        return bool(self.text) and bool(re.search(r"\w", self.text))
+
+    def get_queryset(self, model_name):
+        if model_name not in self._querysets:
+            info = searchableLUT[model_name]
+            model = info["model"]
+            version = self.version if info["version_link"] is not None else None
+            if not self.has_words:
+                qs = model.objects.none()
+            elif self.use_trigrams:
+                if not self._threshold_set:
+                    set_similarity_threshold()
+                    self._threshold_set = True
+                qs = similar_names(model, self.version, self.text)
+            else:
+                qs = search(model, version, self.text)
+            self._querysets[model_name] = qs
+
+        return self._querysets[model_name]
+
+    @cached_property
+    def generation(self):
+        return get_generation(self.version)
+
+    def cache_key(self, *parts):
+        text = hashlib.sha1(normalise(self.text).encode()).hexdigest()
+        mode = "fuzzy" if self.use_trigrams else "words"
+        return ":".join(
+            ["search", str(self.version.pk), self.generation, mode, text]
+            + [str(part) for part in parts]
+        )
+
+    @cached_property
+    def counts(self):
+        """
+        The number of results for each model, in searchableLUT order
+        """
+        if not self.has_words:
+            return dict.fromkeys(searchableLUT, 0)
+
+        if self.index is not None:
+            return {name: len(pks) for name, pks in self.indexed_ids.items()}
+
+        key = self.cache_key("counts")
+        counts = caches["search"].get(key)
+        if counts is None:
+            counts = self.count()
+            caches["search"].set(key, counts)
+        return counts
+
+    def count(self):
+        """Count the results for each model in the database"""
+        counts = dict.fromkeys(searchableLUT, 0)
+        if not self.use_trigrams:
+            # Every result has a SearchDocument so count those by model,
+            # including the unversioned models' documents.  Documents of
+            # models which aren't searched, like Metrics when they're
+            # disabled, are left out.
+            query = PrefixSearchQuery(self.text, config=CONFIG)
+            documents = (
+                SearchDocument.objects.filter(
+                    Q(version=self.version) | Q(version=None),
+                    model_name__in=list(searchableLUT),
+                    document=query,
+                )
+                .values_list("model_name")
+                .annotate(count=Count("pk"))
+                .order_by()
+            )
+            counts.update(documents)
+            return counts
+
+        # Count each model's results in a subquery and UNION them together
+        selects, params = [], []
+        for model_name in searchableLUT:
+            qs = self.get_queryset(model_name).order_by().values("pk")
+            sql, qs_params = qs.query.sql_with_params()
+            selects.append(f"SELECT %s, COUNT(*) FROM ({sql}) AS {model_name}_results")
+            params += [model_name, *qs_params]
+
+        with connection.cursor() as cursor:
+            cursor.execute(" UNION ALL ".join(selects), params)
+            counts.update(cursor.fetchall())
+        return counts
+
+    @cached_property
+    def indexed_ids(self):
+        return self.index.search(self.text)
+
+    def get_ids(self, model_name, start, stop):
+        """Get the pks of the given model's results from start to stop"""
+        if not self.has_words:
+            return []
+
+        if self.index is not None:
+            return self.indexed_ids[model_name][start:stop]
+
+        key = self.cache_key(model_name, start, stop)
+        ids = caches["search"].get(key)
+        if ids is None:
+            qs = self.get_queryset(model_name).values_list("pk", flat=True)
+            ids = list(qs[start:stop])
+            caches["search"].set(key, ids)
+        return ids
+
+    def first_match(self):
+        """The name of the first model with any results"""
+        return next((name for name, count in self.counts.items() if count), None)
+
+
+class ResultList:
+    """
+    One model's search results as a sequence a Paginator can count and slice
+
+    The count comes from SearchResults.counts and each slice's pks from
+    SearchResults.get_ids, so only the objects on the page are queried.
+    """
+
+    def __init__(self, results, model_name):
+        self.results = results
+        self.model_name = model_name
+        self.model = searchableLUT[model_name]["model"]
+
+    def get_queryset(self):
+        """Get the model's objects with what their result templates show"""
+        qs = self.model.objects.all()
+        if self.model_name == "column":
+            return qs.select_related("table__schema__database")
+        if self.model_name == "table":
+            return qs.select_related("schema__database")
+        if self.model_name == "dataelement":
+            columns = Column.objects.filter(version=self.results.version)
+            return qs.prefetch_related(Prefetch("column_set", queryset=columns))
+        return qs
+
+    def count(self):
+        return self.results.counts[self.model_name]
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self[: len(self)])
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            end = key + 1
+            objects = self[key:end]
+            if not objects:
+                raise IndexError("Search result index out of range")
+            return objects[0]
+
+        ids = self.results.get_ids(self.model_name, key.start or 0, key.stop)
+        objects = self.get_queryset().in_bulk(ids)
+        # objects deleted since the ids were cached are skipped
+        return [objects[pk] for pk in ids if pk in objects]
+
+
+def for_request(request):
+    """
+    Get the SearchResults for the search in the given request's GET params
+
+    The results are kept on the request so views, templates, etc can share
+    them.
+    """
+    text = request.GET.get("q", "")
+    fuzzy = request.GET.get("mode") == "fuzzy"
+
+    results = getattr(request, "_search_results", None)
+    if results is None or (results.text, results.fuzzy) != (text, fuzzy):
+        results = SearchResults(request.version, text, fuzzy)
+        request._search_results = results
+    return results
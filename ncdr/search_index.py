@@ -0,0 +1,346 @@
+"""
+An in-memory inverted index of the published Version
+
+The catalogue is small enough to hold in memory so, with the SEARCH_BACKEND
+setting set to "memory", each worker builds an index of the published
+Version's searchable objects when it boots (see etc/gunicorn.py), or when the
+published Version changes, and answers searches of it without querying
+Postgres.  Other Versions, and fuzzy searches, still use the database.
+
+The postings are built from the words, and their positions, in the Version's
+SearchDocuments and searches are split into words the way PrefixSearchQuery's
+tsquery is, so both backends find the same results.  Only their ranking
+differs, since ts_rank also counts how often words appear, benchmark_search
+reports any other differences.
+
+Postings are arrays rather than lists of ints so tens of thousands of Columns
+only take a few MiB.
+"""
+import bisect
+import re
+import sys
+import threading
+import time
+from array import array
+
+import structlog
+from django.conf import settings
+from django.db import connection
+from django.db.models import IntegerField, Value
+
+from .models import SearchDocument, Version
+
+logger = structlog.get_logger("ncdr")
+
+# The ts_rank weights of the A, B, C and D labels search.WEIGHTS gives words
+RANKS = {"A": 1.0, "B": 0.4, "C": 0.2, "D": 0.1}
+
+_index = None
+_lock = threading.Lock()
+
+
+def tokenise(text):
+    return re.findall(r"[^\W_]+", text.lower()) if text else []
+
+
+def query_words(text):
+    """
+    Split search text into words like PrefixSearchQuery's tsquery does
+
+    Postgres splits the words of a tsquery on underscores into parts which
+    have to be next to each other, "arrival_mode" matches "Arrival_Mode" but
+    not "mode of arrival", so each word is a list of its parts.
+    """
+    words = []
+    for word in re.findall(r"\w+", text.lower()):
+        parts = [part for part in word.split("_") if part]
+        if parts:
+            words.append(parts)
+    return words
+
+
+def read_lexemes(documents):
+    """
+    Get (object id, word, positions, weights) for each word in the given
+    SearchDocuments, as Postgres parsed them
+    """
+    sql, params = documents.values("object_id", "document").query.sql_with_params()
+    # a server side cursor so only a batch of rows is in memory at a time
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT d.object_id, w.lexeme, w.positions, w.weights::text[]
+            FROM ({sql}) d, unnest(d.document) w
+            """,
+            params,
+        )
+        yield from cursor
+
+
+class Postings:
+    """
+    The objects a word appears in, the weight of the best field it's in and
+    the positions it's at in each, to match words which have to be together
+    """
+
+    __slots__ = ("objects", "ranks", "ends", "word_positions")
+
+    def __init__(self):
+        # indexes into ModelIndex.pks
+        self.objects = array("I")
+        self.ranks = array("f")
+        # each object's word positions end at its entry in ends
+        self.ends = array("I")
+        self.word_positions = array("H")
+
+    def add(self, position, rank, word_positions):
+        self.objects.append(position)
+        self.ranks.append(rank)
+        self.word_positions.extend(word_positions)
+        self.ends.append(len(self.word_positions))
+
+    def positions_in(self, entry):
+        """Get the word positions of the given entry's object"""
+        start = self.ends[entry - 1] if entry else 0
+        end = self.ends[entry]
+        return self.word_positions[start:end]
+
+    def __len__(self):
+        return len(self.objects)
+
+
+class ModelIndex:
+    """
+    The words in one model's searchable objects
+
+    Rows are (pk, usage, name) and lexemes (object id, word, positions,
+    weights), see read_lexemes.  Objects are stored in the model's default
+    ordering so matches with the same score and usage come out in the order a
+    queryset would give them.
+    """
+
+    __slots__ = ("pks", "usages", "names", "words", "postings")
+
+    def __init__(self, rows, lexemes):
+        self.pks = array("q")
+        self.usages = array("I")
+        # normalised like search.NormalisedName, to find exact and prefix matches
+        self.names = []
+        positions = {}
+        for position, (pk, usage, name) in enumerate(rows):
+            self.pks.append(pk)
+            self.usages.append(usage)
+            self.names.append(" ".join(tokenise(name)))
+            positions[pk] = position
+
+        postings = {}
+        for object_id, word, word_positions, weights in lexemes:
+            position = positions.get(object_id)
+            if position is None:
+                continue
+            rank = max(RANKS[weight] for weight in weights)
+            postings.setdefault(word, Postings()).add(position, rank, word_positions)
+
+        # sorted so words starting with a prefix are found with a bisect
+        self.words = sorted(postings)
+        self.postings = postings
+
+    def prefixed(self, prefix):
+        start = bisect.bisect_left(self.words, prefix)
+        for word in self.words[start:]:
+            if not word.startswith(prefix):
+                break
+            yield self.postings[word]
+
+    def match_prefix(self, prefix, with_positions=False):
+        """
+        Get the rank of the best field a word starting with prefix is in, for
+        each object, and the positions of those words if asked for
+        """
+        ranks, word_positions = {}, {}
+        for postings in self.prefixed(prefix):
+            for entry, (position, rank) in enumerate(
+                zip(postings.objects, postings.ranks)
+            ):
+                if rank > ranks.get(position, 0):
+                    ranks[position] = rank
+                if with_positions:
+                    word_positions.setdefault(position, set()).update(
+                        postings.positions_in(entry)
+                    )
+        return ranks, word_positions
+
+    def match(self, parts):
+        """
+        Get the objects matching one word of a search, with its rank in each
+
+        Like Postgres' <-> operator, each part has to be straight after the
+        one before it.  A word matched in several places ranks as the worst
+        field its parts are in.
+        """
+        if len(parts) == 1:
+            ranks, _ = self.match_prefix(parts[0])
+            return ranks
+
+        matches = [self.match_prefix(part, with_positions=True) for part in parts]
+        objects = set(matches[0][0]).intersection(*(ranks for ranks, _ in matches))
+
+        matched = {}
+        for position in objects:
+            starts = matches[0][1][position]
+            for offset, (_, word_positions) in enumerate(matches[1:], start=1):
+                starts = {
+                    start
+                    for start in starts
+                    if start + offset in word_positions[position]
+                }
+            if starts:
+                matched[position] = min(ranks[position] for ranks, _ in matches)
+        return matched
+
+    def search(self, words):
+        """
+        Get the pks of objects matching every given word, see query_words
+
+        Like search.search, scored by the best field each word matched in,
+        plus a boost if the name is or starts with the words, best first and
+        then by usage.
+        """
+        scores = None
+        for parts in words:
+            matched = self.match(parts)
+
+            if scores is None:
+                scores = matched
+            else:
+                scores = {
+                    position: score + matched[position]
+                    for position, score in scores.items()
+                    if position in matched
+                }
+
+            if not scores:
+                return []
+
+        # imported here since ncdr.search imports this module
+        from .search import EXACT_MATCH_BOOST, PREFIX_MATCH_BOOST
+
+        text = " ".join(part for parts in words for part in parts)
+        for position in scores:
+            name = self.names[position]
+            if name == text:
+                scores[position] += EXACT_MATCH_BOOST
+            elif name.startswith(text):
+                scores[position] += PREFIX_MATCH_BOOST
+
+        positions = sorted(scores, key=lambda p: (-scores[p], -self.usages[p], p))
+        return [self.pks[position] for position in positions]
+
+    def memory_usage(self):
+        """Approximate size in bytes, of the containers and what they hold"""
+        size = sys.getsizeof(self.pks) + sys.getsizeof(self.words)
+        size += sys.getsizeof(self.usages) + sys.getsizeof(self.names)
+        size += sum(sys.getsizeof(name) for name in self.names)
+        size += sys.getsizeof(self.postings)
+        for word, postings in self.postings.items():
+            size += sys.getsizeof(word) + sys.getsizeof(postings)
+            size += sys.getsizeof(postings.objects) + sys.getsizeof(postings.ranks)
+            size += sys.getsizeof(postings.ends)
+            size += sys.getsizeof(postings.word_positions)
+        return size
+
+
+class InvertedIndex:
+    """An index of every searchable model in one Version"""
+
+    def __init__(self, version):
+        # imported here since ncdr.search imports this module
+        from .search import get_name_field, in_version, searchableLUT, usage
+
+        start = time.time()
+
+        self.version_pk = version.pk
+        self.models = {}
+        for model_name, info in searchableLUT.items():
+            model = info["model"]
+            rows = (
+                in_version(model_name, version)
+                .annotate(
+                    search_usage=usage(model_name, version)
+                    or Value(0, output_field=IntegerField())
+                )
+                .order_by(*model._meta.ordering, "pk")
+                .values_list("pk", "search_usage", get_name_field(model))
+            )
+            documents = SearchDocument.objects.filter(
+                version=version if info["version_link"] is not None else None,
+                model_name=model_name,
+            )
+            self.models[model_name] = ModelIndex(
+                rows.iterator(), read_lexemes(documents)
+            )
+
+        self.build_time = time.time() - start
+
+    def search(self, text):
+        """Get the pks of each model's results, best first"""
+        words = query_words(text)
+        return {
+            model_name: index.search(words) if words else []
+            for model_name, index in self.models.items()
+        }
+
+    def memory_report(self):
+        """The number of objects, words and bytes used for each model"""
+        return {
+            model_name: {
+                "objects": len(index.pks),
+                "words": len(index.words),
+                "postings": sum(len(p) for p in index.postings.values()),
+                "bytes": index.memory_usage(),
+            }
+            for model_name, index in self.models.items()
+        }
+
+
+def get(version):
+    """
+    Get the index of the given Version, if it's published and SEARCH_BACKEND
+    is "memory"
+
+    The index is rebuilt when the published Version changes.
+    """
+    global _index
+
+    if settings.SEARCH_BACKEND != "memory" or not version.is_published:
+        return None
+
+    index = _index
+    if index is not None and index.version_pk == version.pk:
+        return index
+
+    with _lock:
+        # another thread may have built it while we waited
+        if _index is None or _index.version_pk != version.pk:
+            _index = InvertedIndex(version)
+            logger.info(
+                f"Built the search index of {version} in {_index.build_time:.2f}s",
+                **{
+                    f"{name}_bytes": report["bytes"]
+                    for name, report in _index.memory_report().items()
+                },
+            )
+        return _index
+
+
+def warm():
+    """Build the index of the published Version, if SEARCH_BACKEND is "memory" """
+    if settings.SEARCH_BACKEND != "memory":
+        return
+
+    try:
+        version = Version.objects.filter(is_published=True).latest()
+    except Version.DoesNotExist:
+        return
+
+    get(version)
@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     "django.contrib.contenttypes",
     "django.contrib.sessions",
     "django.contrib.messages",
+    "django.contrib.postgres",
     "django.contrib.staticfiles",
     "django_ses",
     "markdown_deux",
@@ -117,6 +118,16 @@ UPSTREAM_DB_DATABASE = env.str("UPSTREAM_DB_DATABASE", default="")
 UPSTREAM_DB_USERNAME = env.str("UPSTREAM_DB_USERNAME", default="")
 UPSTREAM_DB_PASSWORD = env.str("UPSTREAM_DB_PASSWORD", default="")
 
+# Timeouts (in seconds) for the upstream connection.  A query timeout of 0
+# waits forever.  Queries which fail because the connection dropped are retried
+# on a fresh connection UPSTREAM_DB_RETRIES times.
+UPSTREAM_DB_LOGIN_TIMEOUT = env.int("UPSTREAM_DB_LOGIN_TIMEOUT", default=30)
+UPSTREAM_DB_QUERY_TIMEOUT = env.int("UPSTREAM_DB_QUERY_TIMEOUT", default=600)
+UPSTREAM_DB_RETRIES = env.int("UPSTREAM_DB_RETRIES", default=2)
+
+# How many rows to pull from the upstream server at a time when streaming
+UPSTREAM_DB_FETCH_SIZE = env.int("UPSTREAM_DB_FETCH_SIZE", default=1000)
+
 
 TEMPLATES = [
     {
@@ -142,6 +153,20 @@ WSGI_APPLICATION = "ncdr.wsgi.application"
 # https://docs.djangoproject.com/en/1.11/ref/settings/#databases
 DATABASES = {"default": env.db_url("DATABASE_URL", default="postgres://localhost/ncdr")}
 
+# Cache
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+# Search results are cached per Version (see ncdr.search).  LocMemCache evicts
+# the least recently used entries once it holds max_entries.  The published
+# Version is cached in default, set CACHE_URL to a cache the workers share so
+# they all see a newly published Version promptly (see ncdr.published).
+CACHES = {
+    "default": env.cache_url("CACHE_URL", default="locmemcache://"),
+    "search": env.cache_url(
+        "SEARCH_CACHE_URL",
+        default="locmemcache://search?max_entries=10000&timeout=86400",
+    ),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
@@ -229,6 +254,30 @@ structlog.configure(
     cache_logger_on_first_use=True,
 )
 
+# How similar, from 0 to 1, a name has to be to the search text to be found by
+# a fuzzy search.  0.3 is pg_trgm's default.
+SEARCH_FUZZY_THRESHOLD = env.float("SEARCH_FUZZY_THRESHOLD", default=0.3)
+
+# Where searches of the published Version are answered from, "database" or
+# "memory" for an index held by each worker (see ncdr.search_index).
+SEARCH_BACKEND = env("SEARCH_BACKEND", default="database")
+
+# Whether the metrics pages are served, and Metrics searched
+METRICS_ENABLED = env.bool("METRICS_ENABLED", default=False)
+
+# How many Versions' search suggestions each worker keeps, and how long, in
+# seconds, browsers can cache them.
+SEARCH_SUGGEST_VERSIONS = env.int("SEARCH_SUGGEST_VERSIONS", default=4)
+SEARCH_SUGGEST_MAX_AGE = env.int("SEARCH_SUGGEST_MAX_AGE", default=300)
+
+# How often, in seconds, each worker checks the default cache for a newly
+# published Version, and how long the cache keeps it before it's fetched from
+# the database again (see ncdr.published)
+PUBLISHED_VERSION_CHECK_INTERVAL = env.int(
+    "PUBLISHED_VERSION_CHECK_INTERVAL", default=5
+)
+PUBLISHED_VERSION_TIMEOUT = env.int("PUBLISHED_VERSION_TIMEOUT", default=60)
+
 # Auth URLS
 # Redefine these so the URLs are reversed and take into account SCRIPT_NAME
 # from the WSGI env.  Without this a login_required page will redirect to
@@ -0,0 +1,58 @@
+"""
+Suggestions for the search box
+
+Each Version's distinct names, of every searchable model, are held in a
+sorted list so the names starting with some text are found with a bisect.
+Versions don't change once they're imported so the lists are built once per
+worker and kept for the SEARCH_SUGGEST_VERSIONS most recently used Versions.
+"""
+import bisect
+import functools
+
+from django.conf import settings
+
+from .models import Version
+from .search import get_name_field, in_version, searchableLUT
+
+
+class SuggestIndex:
+    """The distinct names of every searchable model in one Version"""
+
+    __slots__ = ("keys", "names")
+
+    def __init__(self, version):
+        names = set()
+        for model_name, info in searchableLUT.items():
+            rows = (
+                in_version(model_name, version)
+                .order_by()
+                .values_list(get_name_field(info["model"]), flat=True)
+                .distinct()
+            )
+            names.update((name.lower(), name, model_name) for name in rows if name)
+
+        entries = sorted(names)
+        # lower cased names to bisect, with the (name, model name) they're for
+        self.keys = [key for key, _, _ in entries]
+        self.names = [(name, model_name) for _, name, model_name in entries]
+
+    def suggest(self, prefix, limit):
+        """Get up to limit (name, model name) pairs starting with prefix"""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+
+        start = bisect.bisect_left(self.keys, prefix)
+        # every key starting with prefix sorts before this
+        end = bisect.bisect_left(self.keys, prefix + "\uffff", lo=start)
+        end = min(end, start + limit)
+        return self.names[start:end]
+
+
+@functools.lru_cache(maxsize=settings.SEARCH_SUGGEST_VERSIONS)
+def build_index(version_pk):
+    return SuggestIndex(Version.objects.get(pk=version_pk))
+
+
+def suggest(version, prefix, limit):
+    return build_index(version.pk).suggest(prefix, limit)
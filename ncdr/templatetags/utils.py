@@ -10,6 +10,11 @@ def chunked(iterable, chunk_size):
     return more_itertools.chunked(iterable, chunk_size)
 
 
+@register.filter
+def description_in(data_element, version):
+    return data_element.get_description(version)
+
+
 @register.filter(name="url_name")
 def url_name(request):
     return resolve(request.path_info).url_name
@@ -21,12 +26,14 @@ def pagination(context):
     Assumes we are in a list view with a paginator.
 
     Adds a variable to the context which is the string
-    used by the paginator without the page attribute
-    so that we can set that ourselves.
+    used by the paginator without the page attributes
+    (page, or the after and before cursors of a keyset paginator)
+    so that we can set those ourselves.
     """
     query_dict = context["request"].GET.copy()
-    if "page" in query_dict:
-        query_dict.pop("page")
+    for param in ["page", "after", "before"]:
+        if param in query_dict:
+            query_dict.pop(param)
     encoded_query = query_dict.urlencode()
     if encoded_query:
         query = f"&{encoded_query}"
@@ -30,7 +30,7 @@ from .views.column_image import (
 from .views.data_element import DataElementDetail, DataElementList
 from .views.database import DatabaseDetail, DatabaseList
 from .views.grouping import GroupingDetail, GroupingList
-from .views.search import Search, SearchRedirect
+from .views.search import Search, SearchRedirect, Suggest
 from .views.table import TableDetail
 from .views.version import (  # Timeline,
     AuditLog,
@@ -87,6 +87,7 @@ urlpatterns = [
     path("grouping/<slug:slug>/", GroupingDetail.as_view(), name="grouping_detail"),
     path("publish/<int:pk>/", PublishVersion.as_view(), name="publish_version"),
     path("search/", SearchRedirect.as_view(), name="search_redirect"),
+    path("search/suggest", Suggest.as_view(), name="search_suggest"),
     path("search/<slug:model_name>/", Search.as_view(), name="search"),
     path(
         "switch-to-latest-version",
@@ -117,10 +118,12 @@ urlpatterns = [
         "column_images/column_path_options_list",
         ColumnPathOptionsList.as_view(),
         name="column_path_options_list",
-    )
-    # path("metrics/", include("metrics.urls")),
+    ),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
+if settings.METRICS_ENABLED:
+    urlpatterns += [path("metrics/", include("metrics.urls"))]
+
 
 if settings.DEBUG:
     import debug_toolbar
@@ -15,7 +15,9 @@ class ColumnDetail(DetailView):
         except Database.DoesNotExist:
             raise Http404
 
-        return Column.objects.filter(table__schema__database=database)
+        return Column.objects.filter(table__schema__database=database).select_related(
+            "table__schema__database", "data_element"
+        )
 
 
 class Login(LoginView):
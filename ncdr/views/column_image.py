@@ -6,7 +6,7 @@ from django.urls import reverse_lazy
 from django.views.generic import CreateView, DeleteView, ListView, UpdateView
 
 from ..forms import ColumnImageForm
-from ..models import Column, ColumnImage
+from ..models import Column, ColumnImage, published_column_urls
 
 
 class ColumnImageList(LoginRequiredMixin, ListView):
@@ -14,6 +14,24 @@ class ColumnImageList(LoginRequiredMixin, ListView):
     model = ColumnImage
     order_by = "-created"
 
+    def get_queryset(self):
+        return super().get_queryset().prefetch_related("columnimagerelation_set")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+
+        # find the published Columns for every image at once
+        images = context["object_list"]
+        urls = published_column_urls(
+            relation
+            for image in images
+            for relation in image.columnimagerelation_set.all()
+        )
+        for image in images:
+            image.column_links = image.columns(urls)
+
+        return context
+
 
 class ColumnImageCreate(LoginRequiredMixin, CreateView):
     template_name = "column_image_edit.html"
@@ -50,7 +68,8 @@ class ColumnPathOptionsList(LoginRequiredMixin, ListView):
     [db.name, schema.name, table.name, column.name]
 
     If there is a q GET parameter we query the columns with an icontains on the
-    name.
+    name, which uses the trigram index on Column.name when pg_trgm is
+    installed.
     """
 
     paginate_by = 10
@@ -62,7 +81,7 @@ class ColumnPathOptionsList(LoginRequiredMixin, ListView):
     )
 
     def get_queryset(self):
-        qs = Column.objects.filter(table__schema__database__version__is_published=True)
+        qs = Column.objects.filter(version__is_published=True)
         query_term = self.request.GET.get("q")
         if query_term:
             qs = qs.filter(name__icontains=query_term)
@@ -8,21 +8,18 @@ from django.urls import reverse
 from django.views.generic import ListView
 
 from ..models import Column, DataElement
+from ..pagination import KeysetPaginationMixin
 
 
-class DataElementDetail(ListView):
+class DataElementDetail(KeysetPaginationMixin, ListView):
     model = Column
     paginate_by = 10
     template_name = "data_element_detail.html"
 
     def get(self, request, *args, **kwargs):
         try:
-            self.object = (
-                DataElement.objects.filter(
-                    column__table__schema__database__version=request.version
-                )
-                .distinct()
-                .get(slug=self.kwargs["slug"])
+            self.object = DataElement.objects.filter(versions=request.version).get(
+                slug=self.kwargs["slug"]
             )
         except DataElement.DoesNotExist:
             raise Http404
@@ -38,15 +35,12 @@ class DataElementDetail(ListView):
         return (
             super()
             .get_queryset()
-            .filter(
-                table__schema__database__version=self.request.version,
-                data_element=self.object,
-            )
+            .filter(version=self.request.version, data_element=self.object)
             .select_related("table__schema__database")
         )
 
 
-class DataElementList(ListView):
+class DataElementList(KeysetPaginationMixin, ListView):
     model = DataElement
     template_name = "data_element_list.html"
     NUMERIC = "0-9"
@@ -76,15 +70,13 @@ class DataElementList(ListView):
         return context
 
     def get_queryset(self):
-        columns = Column.objects.filter(
-            table__schema__database__version=self.request.version
-        )
+        columns = Column.objects.filter(version=self.request.version)
         qs = (
             super()
             .get_queryset()
-            .filter(column__in=columns)
+            .filter(versions=self.request.version)
             .prefetch_related(Prefetch("column_set", queryset=columns))
-        ).distinct()
+        )
 
         symbol = self.request.GET.get("letter")
 
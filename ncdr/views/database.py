@@ -9,6 +9,12 @@ class DatabaseDetail(DetailView):
     slug_field = "name"
     template_name = "database_detail.html"
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # only their names are shown, and linked to with the Database's name
+        context["tables"] = self.object.tables.only("name")
+        return context
+
     def get_queryset(self):
         """Only show the user their currently selected verison."""
         return super().get_queryset().filter(version=self.request.version)
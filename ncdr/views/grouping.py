@@ -3,21 +3,18 @@ from django.http import Http404
 from django.views.generic import ListView
 
 from ..models import Column, DataElement, Grouping
+from ..pagination import KeysetPaginationMixin
 
 
-class GroupingDetail(ListView):
+class GroupingDetail(KeysetPaginationMixin, ListView):
     model = DataElement
     paginate_by = 50
     template_name = "grouping_detail.html"
 
     def get(self, request, *args, **kwargs):
         try:
-            self.object = (
-                Grouping.objects.filter(
-                    dataelement__column__table__schema__database__version=request.version
-                )
-                .distinct()
-                .get(slug=self.kwargs["slug"])
+            self.object = Grouping.objects.filter(versions=request.version).get(
+                slug=self.kwargs["slug"]
             )
         except Grouping.DoesNotExist:
             raise Http404
@@ -33,19 +30,13 @@ class GroupingDetail(ListView):
         return (
             super()
             .get_queryset()
-            .filter(
-                column__table__schema__database__version=self.request.version,
-                grouping=self.object,
-            )
+            .filter(versions=self.request.version, grouping=self.object)
             .prefetch_related(
                 Prefetch(
                     "column_set",
-                    queryset=Column.objects.filter(
-                        table__schema__database__version=self.request.version
-                    ),
+                    queryset=Column.objects.filter(version=self.request.version),
                 )
             )
-            .distinct()
         )
 
 
@@ -54,11 +45,4 @@ class GroupingList(ListView):
     template_name = "grouping_list.html"
 
     def get_queryset(self):
-        return (
-            super()
-            .get_queryset()
-            .filter(
-                dataelement__column__table__schema__database__version=self.request.version
-            )
-            .distinct()
-        )
+        return super().get_queryset().filter(versions=self.request.version)
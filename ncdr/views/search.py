@@ -1,58 +1,12 @@
-import functools
-import operator
-
-from django.db.models import Q
-from django.http import Http404
+from django.conf import settings
+from django.http import Http404, JsonResponse
 from django.urls import reverse
+from django.utils.cache import patch_response_headers, patch_vary_headers
 from django.utils.http import urlencode
-from django.views.generic import ListView, RedirectView
-
-from ..models import Column, Database, DataElement, Grouping, Table
-
-# from metrics.models import Metric
-
-
-searchableLUT = {
-    "column": {"model": Column, "version_link": "table__schema__database__version"},
-    "database": {"model": Database, "version_link": "version"},
-    "dataelement": {
-        "model": DataElement,
-        "version_link": "column__table__schema__database__version",
-    },
-    "grouping": {
-        "model": Grouping,
-        "version_link": "dataelement__column__table__schema__database__version",
-    },
-    # "metric": {"model": Metric, "version_link": None},
-    "table": {"model": Table, "version_link": "schema__database__version"},
-}
-
-
-def search(model, version, search_param):
-    """
-    Search the given model at the given version for fields containing the given search parameter
-
-    Version relationship path is looked up from the searchableLUT.
-
-    Build up an OR based query such that searching for "change" would give you:
-
-        Q(name="change") | Q(description="change")
-
-    assuming SEARCH_FIELDS contained "name" and "description".
-    """
-    if not search_param:
-        return model.objects.none()
-
-    # Limit results to the current version
-    version_link = searchableLUT[model.__name__.lower()]["version_link"]
-    qs = model.objects.all()
-    if version_link:
-        qs = model.objects.filter(**{version_link: version})
+from django.views.generic import ListView, RedirectView, View
 
-    filters = [
-        Q(**{f"{field}__icontains": search_param}) for field in model.SEARCH_FIELDS
-    ]
-    return qs.filter(functools.reduce(operator.or_, filters)).distinct()
+from .. import search, suggest
+from ..search import searchableLUT
 
 
 class Search(ListView):
@@ -66,43 +20,81 @@ class Search(ListView):
         if info is None:
             raise Http404
 
-        q = self.request.GET.get("q", "")
+        results = search.for_request(request)
 
-        # Required for ListView to function
-        self.object_list = search(info["model"], request.version, q)
+        # Required for ListView to function, pages of results are cached
+        self.object_list = search.ResultList(results, model_name)
 
-        # Get model and result counts
-        models = [x["model"] for x in searchableLUT.values()]
-        results = [
+        # Model result counts, from a single query
+        facets = [
             {
-                "name": model.__name__.lower(),
-                "display_name": model._meta.verbose_name_plural,
-                "count": search(model, request.version, q).count(),
+                "name": name,
+                "display_name": searchableLUT[name]["model"]._meta.verbose_name_plural,
+                "count": count,
             }
-            for model in models
+            for name, count in results.counts.items()
         ]
 
+        q = results.text
         context = super().get_context_data(**kwargs)
-        context["results"] = results
+        context["results"] = facets
         context["model_name"] = model_name
         context["model_display_name"] = info["model"]._meta.verbose_name
         context["model_template"] = f"search/{model_name}.html"
-        context["query"] = urlencode({"q": q})
+        context["fuzzy"] = results.fuzzy
+        context["query"] = urlencode(
+            {"q": q, "mode": "fuzzy"} if results.fuzzy else {"q": q}
+        )
+        context["fuzzy_query"] = urlencode({"q": q, "mode": "fuzzy"})
         return self.render_to_response(context)
 
 
 class SearchRedirect(RedirectView):
+    """
+    Redirect to the results for the first model with any, or Columns if none
+    """
+
     def get_redirect_url(self, *args, **kwargs):
-        q = self.request.GET.get("q")
-        url = reverse("search", kwargs={"model_name": "column"})
+        model_name = search.for_request(self.request).first_match() or "column"
+        url = reverse("search", kwargs={"model_name": model_name})
+        return f"{url}?{self.request.GET.urlencode()}"
+
 
-        full_url = f"{url}?{self.request.GET.urlencode()}"
+class Suggest(View):
+    """
+    An api end point listing the names which start with the q GET parameter,
+    for the search box to suggest as it's typed in
+
+    Each suggestion links to the search results for its name.  Browsers can
+    cache them for SEARCH_SUGGEST_MAX_AGE, varying on the session since
+    logged in users can be looking at an unpublished Version.
+    """
 
-        if not q:
-            return full_url
+    default_limit = 10
+    max_limit = 50
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.GET.get("limit", self.default_limit))
+        except ValueError:
+            return self.default_limit
+        return max(1, min(limit, self.max_limit))
+
+    def get(self, request, *args, **kwargs):
+        names = suggest.suggest(
+            request.version, request.GET.get("q", ""), self.get_limit()
+        )
+        suggestions = [
+            {
+                "name": name,
+                "model_name": model_name,
+                "url": f"{reverse('search', kwargs={'model_name': model_name})}"
+                f"?{urlencode({'q': name})}",
+            }
+            for name, model_name in names
+        ]
 
-        for model in [x["model"] for x in searchableLUT.values()]:
-            if search(model, self.request.version, q).exists():
-                url = reverse("search", kwargs={"model_name": model.__name__.lower()})
-                break
-        return full_url
+        response = JsonResponse({"suggestions": suggestions})
+        patch_response_headers(response, cache_timeout=settings.SEARCH_SUGGEST_MAX_AGE)
+        patch_vary_headers(response, ["Cookie"])
+        return response
@@ -1,28 +1,35 @@
-from django.http import Http404
 from django.views.generic import DetailView
 
-from ..models import Database, Table
+from ..models import Table
 
 
 class TableDetail(DetailView):
+    """
+    A Table and its Columns
+
+    The page takes the same number of queries however many Tables and Columns
+    there are.  The Table is fetched with its Schema and Database, which the
+    Columns' urls are built from, and the side nav's Tables only load their
+    names since their urls use the Database name already loaded.
+    """
+
     model = Table
     template_name = "table_detail.html"
 
     def get_context_data(self, **kwargs):
         # get the list of tables in this database
         context = super().get_context_data(**kwargs)
-        context["tables"] = self.object.schema.tables.all()
+        context["tables"] = self.object.schema.tables.only("name", "schema")
+        context["columns"] = self.object.column_set.select_related("data_element")
         return context
 
     def get_queryset(self):
-        try:
-            database = self.request.version.databases.get(name=self.kwargs["db_name"])
-        except Database.DoesNotExist:
-            raise Http404
-
         return (
             super()
             .get_queryset()
-            .filter(schema__database=database)
-            .filter(pk=self.kwargs["pk"])
+            .filter(
+                version=self.request.version,
+                schema__database__name=self.kwargs["db_name"],
+            )
+            .select_related("schema__database")
         )
@@ -8,6 +8,7 @@ from django.urls import reverse
 from django.views.generic import ListView, RedirectView, View
 
 from ..models import Version, VersionAuditLog
+from ..pagination import KeysetPaginationMixin
 
 
 class AuditLog(LoginRequiredMixin, ListView):
@@ -92,9 +93,10 @@ class UnPublishVersion(LoginRequiredMixin, View):
         return redirect(request.GET.get("next", reverse("index_view")))
 
 
-class VersionList(LoginRequiredMixin, ListView):
+class VersionList(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     paginate_by = 50
-    queryset = Version.objects.order_by("-pk", "-created_at")
+    queryset = Version.objects.all()
+    keyset_ordering = ("-pk",)
 
     template_name = "version_list.html"
 
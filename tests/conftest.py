@@ -7,9 +7,12 @@ Docs: https://docs.pytest.org/en/latest/fixture.html#conftest-py-sharing-fixture
 from tempfile import NamedTemporaryFile
 
 import pytest
+from django.core.cache import caches
 from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
 
 from metrics.models import Lead, Metric, Operand, Organisation, Report, Team
+from ncdr import published, suggest
 from ncdr.models import (
     Column,
     ColumnImage,
@@ -23,10 +26,31 @@ from ncdr.models import (
 )
 
 
+def pytest_addoption(parser):
+    parser.addoption(
+        "--time-budgets",
+        action="store_true",
+        help="Check pages are rendered within their time budgets too",
+    )
+
+
 @pytest.fixture(autouse=True)
-def use_local_media_storage(settings):
+def use_local_media_storage(settings, tmp_path):
+    # uploads go in the test's temporary directory rather than the checkout
+    settings.MEDIA_ROOT = str(tmp_path)
     settings.MEDIA_FILE_STORAGE = "django.core.files.storage.FileSystemStorage"
-    ColumnImage._meta.get_field("image").storage = FileSystemStorage()
+    ColumnImage._meta.get_field("image").storage = FileSystemStorage(
+        location=str(tmp_path)
+    )
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # Cached values outlive the test's transaction, and pks are reused
+    caches["default"].clear()
+    caches["search"].clear()
+    suggest.build_index.cache_clear()
+    published.invalidate()
 
 
 @pytest.fixture
@@ -73,6 +97,7 @@ def published_column(published_table):
 def published_data_element(published_column):
     data_element = DataElement.objects.create(name="test", slug="test")
     data_element.column_set.add(published_column)
+    data_element.versions.add(published_column.table.schema.database.version)
     return data_element
 
 
@@ -85,6 +110,7 @@ def published_database(published_version):
 def published_grouping(published_data_element):
     grouping = Grouping.objects.create(name="test", slug="test")
     grouping.dataelement_set.add(published_data_element)
+    grouping.versions.add(*published_data_element.versions.all())
     return grouping
 
 
@@ -115,6 +141,7 @@ def unpublished_column(unpublished_table):
 def unpublished_data_element(unpublished_column):
     data_element = DataElement.objects.create(name="test", slug="test")
     data_element.column_set.add(unpublished_column)
+    data_element.versions.add(unpublished_column.table.schema.database.version)
     return data_element
 
 
@@ -127,6 +154,7 @@ def unpublished_database(unpublished_version):
 def unpublished_grouping(unpublished_data_element):
     grouping = Grouping.objects.create(name="test", slug="test")
     grouping.dataelement_set.add(unpublished_data_element)
+    grouping.versions.add(*unpublished_data_element.versions.all())
     return grouping
 
 
@@ -142,7 +170,9 @@ def unpublished_table(unpublished_schema):
 
 @pytest.fixture
 def unpublished_version():
-    return Version.objects.create(is_published=False)
+    return Version.objects.create(
+        is_published=False, upstream_updated_ts=timezone.now()
+    )
 
 
 @pytest.fixture
@@ -1,5 +1,10 @@
+import mock
 import pytest
 
+from metrics.models import Metric
+from metrics.views import Search
+from ncdr.search import index_unversioned, searchableLUT
+
 # from django.urls import reverse
 
 # from metrics.models import Metric
@@ -9,6 +14,13 @@ import pytest
 pytestmark = pytest.mark.django_db
 
 
+def index_unversioned_metrics():
+    # as with METRICS_ENABLED
+    metric = {"model": Metric, "version_link": None}
+    with mock.patch.dict(searchableLUT, {"metric": metric}):
+        index_unversioned()
+
+
 # def test_metrics_detail(client, metric):
 #     url = reverse("metrics-detail", kwargs={"pk": metric.pk})
 #     resp = client.get(url)
@@ -40,3 +52,18 @@ pytestmark = pytest.mark.django_db
 #     resp = client.get(url)
 #     assert list(resp.context_data["object_list"]) == [Metric.objects.get()]
 #     assert resp.status_code == 200
+
+
+def test_search(metric, rf):
+    index_unversioned_metrics()
+
+    request = rf.get("/metrics/search/", {"q": "tes"})
+    resp = Search.as_view()(request)
+
+    assert list(resp.context_data["object_list"]) == [metric]
+
+
+def test_search_without_query(metric, rf):
+    resp = Search.as_view()(rf.get("/metrics/search/"))
+
+    assert list(resp.context_data["object_list"]) == []
@@ -0,0 +1,11 @@
+from ncdr.importers.bulk import RowsFile
+
+
+def test_rows_file():
+    rows = [("tab\there", 1, True, None), ("back\\slash\nnewline", 2, False, "")]
+    rows_file = RowsFile(rows)
+
+    assert rows_file.read(5) == "tab\\t"
+    assert rows_file.read() == "here\t1\tt\t\\N\nback\\\\slash\\nnewline\t2\tf\t\n"
+    assert rows_file.read() == ""
+    assert rows_file.count == 2
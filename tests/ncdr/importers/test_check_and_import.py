@@ -0,0 +1,135 @@
+import contextlib
+import datetime
+
+import mock
+import pytest
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+
+from ncdr.importers import check_and_import, incremental
+from ncdr.models import Database, ImportRun, Version
+
+from .test_column import definition_row
+from .test_grouping import mapping_row
+from .test_table import structure_row
+
+# Tell pytest all tests in this file need DB access
+# Docs: https://pytest-django.readthedocs.io/en/latest/database.html#enabling-database-access-in-tests  # noqa: E501
+pytestmark = pytest.mark.django_db
+
+
+STRUCTURE = [
+    structure_row("NHSE_111"),
+    structure_row("NHSE_111", schema="dbo"),
+    structure_row("NHSE_111", "dbo", "tbl_Calls", "Table"),
+]
+DEFINITIONS = [definition_row("Age", "Age", "NHSE_111.dbo.tbl_Calls")]
+MAPPING = [mapping_row("Patient", "Age")]
+
+
+@contextlib.contextmanager
+def upstream(definitions=DEFINITIONS, upstream_ts=None):
+    if upstream_ts is None:
+        upstream_ts = timezone.now() + datetime.timedelta(days=1)
+
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(
+            mock.patch(
+                "ncdr.importers.sources.UpstreamSource.refreshed_at",
+                return_value=upstream_ts,
+            )
+        )
+        for name, rows in [
+            ("table", STRUCTURE),
+            ("column", definitions),
+            ("grouping", MAPPING),
+        ]:
+            stack.enter_context(
+                mock.patch(f"ncdr.importers.{name}.get_rows", return_value=iter(rows))
+            )
+        yield
+
+
+def test_check_and_import(published_version):
+    with upstream():
+        run = check_and_import()
+
+    assert run.succeeded
+    assert run.error == ""
+    assert run.version == Version.objects.latest()
+    assert run.finished_at >= run.started_at
+
+    stages = {stage.name: stage for stage in run.stages.all()}
+    assert list(stages) == [
+        "check",
+        "grouping",
+        "table",
+        "column",
+        "analyze",
+        "versions",
+        "usage",
+        "search",
+    ]
+    assert stages["search"].rows_written == 5
+    assert stages["table"].rows_written == 3
+    assert stages["column"].rows_written == 3  # DataElement, its link and Column
+    assert all(stage.queries > 0 for stage in stages.values())
+
+
+def test_check_and_import_hashes_databases(published_version):
+    with upstream():
+        full = check_and_import()
+
+    database = Database.objects.get(version=full.version)
+    hashes = incremental.hash_databases(STRUCTURE, DEFINITIONS)
+    assert database.content_hash == hashes["NHSE_111"]
+
+    # so an incremental import after a full one can copy what's unchanged
+    upstream_ts = timezone.now() + datetime.timedelta(days=2)
+    copy_databases = mock.patch.object(
+        incremental, "copy_databases", wraps=incremental.copy_databases
+    )
+    with upstream(upstream_ts=upstream_ts), copy_databases as copy:
+        run = check_and_import(incremental_import=True)
+
+    assert run.succeeded
+    assert copy.call_args[0][3] == {"NHSE_111"}
+    copied = Database.objects.get(version=run.version)
+    assert copied.content_hash == database.content_hash
+
+
+def test_check_and_import_nothing_new(published_version):
+    with upstream(upstream_ts=published_version.upstream_updated_ts):
+        assert check_and_import() is None
+
+    assert not ImportRun.objects.exists()
+
+
+def test_check_and_import_failure(published_version):
+    with upstream(definitions=[definition_row("Age", "Age", "missing")]):
+        run = check_and_import()
+
+    assert not run.succeeded
+    assert "Present_In field not in the expected format" in run.error
+    assert run.version is None
+    assert Version.objects.latest() == published_version
+
+    # the stages up to the failure are kept
+    names = [stage.name for stage in run.stages.all()]
+    assert names == ["check", "grouping", "table", "column"]
+
+    with mock.patch(
+        "ncdr.importers.sources.UpstreamSource.refreshed_at", side_effect=Exception
+    ):
+        with pytest.raises(CommandError):
+            call_command("check_and_create_new_version")
+
+
+def test_command_profile(published_version, tmp_path):
+    path = tmp_path / "import.pstats"
+
+    with upstream():
+        call_command("check_and_create_new_version", profile=str(path))
+
+    assert path.exists()
+    assert ImportRun.objects.get().succeeded
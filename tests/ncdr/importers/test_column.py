@@ -0,0 +1,144 @@
+import mock
+import pytest
+
+from ncdr.importers import column, grouping
+from ncdr.models import Column, DataElement
+
+from .test_grouping import mapping_row
+
+# Tell pytest all tests in this file need DB access
+# Docs: https://pytest-django.readthedocs.io/en/latest/database.html#enabling-database-access-in-tests  # noqa: E501
+pytestmark = pytest.mark.django_db
+
+
+def definition_row(data_element, item_name, present_in, **kwargs):
+    row = {
+        "Data_Element": data_element,
+        "Item_Name": item_name,
+        "Description": "",
+        "Data_Type": "int",
+        "Is_Derived_Item": "No",
+        "NCDR_Derivation_Methodology": "N/A",
+        "Link": "N/A",
+        "Present_In": present_in,
+    }
+    row.update(kwargs)
+    return row
+
+
+def test_import_from_db(published_table):
+    rows = [
+        definition_row("Arrival mode", "AEA_Arrival_Mode", "test.test.test"),
+        definition_row(
+            "Arrival mode",
+            "Arrival_Mode",
+            "test.test.test",
+            Is_Derived_Item="Yes - External",
+            Link="http://example.com",
+        ),
+        definition_row("Age", "Age", "test.test.test"),
+    ]
+
+    with mock.patch("ncdr.importers.sources.db_api.stream", return_value=iter(rows)):
+        with mock.patch("ncdr.importers.column.BATCH_SIZE", 2):
+            column.import_from_db(published_table.schema.database.version)
+
+    # data elements are only created once even when split over batches
+    assert DataElement.objects.filter(name="Arrival mode").count() == 1
+
+    columns = Column.objects.filter(table=published_table)
+    assert columns.count() == 3
+    assert {c.version_id for c in columns} == {published_table.version_id}
+
+    arrival_mode = columns.get(name="Arrival_Mode")
+    assert arrival_mode.data_element.name == "Arrival mode"
+    assert arrival_mode.is_derived_item
+    assert arrival_mode.link == "http://example.com"
+    assert columns.get(name="AEA_Arrival_Mode").link == ""
+
+
+def test_import_from_db_bad_address(published_table):
+    rows = [definition_row("Age", "Age", "test")]
+
+    with mock.patch("ncdr.importers.sources.db_api.stream", return_value=iter(rows)):
+        with pytest.raises(Exception):
+            column.import_from_db(published_table.schema.database.version)
+
+
+def test_import_from_db_unknown_table(published_table):
+    rows = [definition_row("Age", "Age", "test.test.missing")]
+
+    with mock.patch("ncdr.importers.sources.db_api.stream", return_value=iter(rows)):
+        with pytest.raises(Exception):
+            column.import_from_db(published_table.schema.database.version)
+
+
+def test_import_from_db_without_copy(published_table):
+    rows = [
+        definition_row("Age", "Age", "test.test.test"),
+        definition_row("Arrival mode", "Arrival_Mode", "test.test.test"),
+    ]
+
+    with mock.patch("ncdr.importers.sources.db_api.stream", return_value=iter(rows)):
+        with mock.patch.object(column.connection, "vendor", "sqlite"):
+            column.import_from_db(published_table.schema.database.version)
+
+    names = Column.objects.filter(version=published_table.version).values_list(
+        "name", flat=True
+    )
+    assert sorted(names) == ["Age", "Arrival_Mode"]
+
+
+def test_import_from_db_reuses_data_elements(published_table, unpublished_table):
+    mapping_rows = [
+        mapping_row("Patient", "Age", "Age in years"),
+        mapping_row("Activity", "Arrival mode"),
+    ]
+    rows = [
+        definition_row("Age", "Age", "test.test.test"),
+        definition_row("Arrival mode", "Arrival_Mode", "test.test.test"),
+    ]
+
+    with mock.patch(
+        "ncdr.importers.sources.db_api.stream", return_value=iter(mapping_rows)
+    ):
+        mapping = grouping.import_from_db()
+    with mock.patch("ncdr.importers.sources.db_api.stream", return_value=iter(rows)):
+        column.import_from_db(published_table.schema.database.version, mapping)
+
+    age = DataElement.objects.get(name="Age")
+    assert age.description == "Age in years"
+    assert [g.name for g in age.grouping.all()] == ["Patient"]
+
+    # Arrival mode's description changes in the next Version
+    mapping_rows[1] = mapping_row("Activity", "Arrival mode", "How they arrived")
+    with mock.patch(
+        "ncdr.importers.sources.db_api.stream", return_value=iter(mapping_rows)
+    ):
+        mapping = grouping.import_from_db()
+    with mock.patch("ncdr.importers.sources.db_api.stream", return_value=iter(rows)):
+        column.import_from_db(unpublished_table.schema.database.version, mapping)
+
+    unpublished_columns = Column.objects.filter(table=unpublished_table)
+    assert unpublished_columns.get(name="Age").data_element == age
+
+    arrival_modes = DataElement.objects.filter(name="Arrival mode").order_by("pk")
+    assert [de.description for de in arrival_modes] == ["", "How they arrived"]
+    assert unpublished_columns.get(name="Arrival_Mode").data_element == arrival_modes[1]
+    assert [g.name for g in arrival_modes[1].grouping.all()] == ["Activity"]
+
+
+def test_set_usage_counts(published_table, unpublished_table):
+    version = published_table.version
+    age = DataElement.objects.create(name="Age", slug="age")
+    for name in ["Age", "Age_In_Years"]:
+        Column.objects.create(name=name, data_element=age, table=published_table)
+    Column.objects.create(name="Other", table=published_table)
+    # Columns in other Versions aren't counted
+    Column.objects.create(name="Age", data_element=age, table=unpublished_table)
+
+    assert column.set_usage_counts(version) == 2
+
+    counts = Column.objects.filter(version=version).values_list("name", "usage_count")
+    assert sorted(counts) == [("Age", 2), ("Age_In_Years", 2), ("Other", 1)]
+    assert Column.objects.get(table=unpublished_table).usage_count == 1
@@ -0,0 +1,40 @@
+import pytest
+
+from ncdr.importers import content
+from ncdr.models import DataElement, Grouping
+
+# Tell pytest all tests in this file need DB access
+# Docs: https://pytest-django.readthedocs.io/en/latest/database.html#enabling-database-access-in-tests  # noqa: E501
+pytestmark = pytest.mark.django_db
+
+
+def test_content_hash():
+    assert content.content_hash("a", "b") == content.content_hash("a", "b")
+    assert content.content_hash("a", "b") != content.content_hash("ab", "")
+
+
+def test_get_or_create():
+    existing = Grouping.objects.create(name="old", content_hash="1")
+
+    groupings, created = content.get_or_create(
+        Grouping, [Grouping(name="old", content_hash="1"), Grouping(content_hash="2")]
+    )
+
+    assert groupings["1"] == existing
+    assert [g.content_hash for g in created] == ["2"]
+    assert Grouping.objects.count() == 2
+
+
+def test_add_to_version(published_column, unpublished_version):
+    data_element = DataElement.objects.create(name="test")
+    data_element.column_set.add(published_column)
+    data_element.grouping.create(name="test")
+    unused = DataElement.objects.create(name="unused")
+    unused.grouping.create(name="unused")
+
+    version = published_column.table.schema.database.version
+    content.add_to_version(version)
+
+    assert list(version.data_elements.all()) == [data_element]
+    assert [g.name for g in version.groupings.all()] == ["test"]
+    assert not unpublished_version.data_elements.exists()
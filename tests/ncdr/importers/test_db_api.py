@@ -0,0 +1,103 @@
+import mock
+import pyodbc
+import pytest
+
+from ncdr.importers import db_api
+
+
+def fake_connection(*rows):
+    connection = mock.MagicMock()
+    cursor = connection.cursor.return_value.execute.return_value
+    cursor.description = [("Database",), ("Schema",)]
+    cursor.fetchall.return_value = list(rows)
+    cursor.fetchmany.side_effect = [list(rows[:1]), list(rows[1:]), []]
+    return connection
+
+
+def test_query():
+    connection = fake_connection(("NHSE_111", "dbo"))
+    with mock.patch("ncdr.importers.db_api.pyodbc.connect", return_value=connection):
+        result = db_api.query("select * from tbl_Export_Standard_DB_Structure")
+
+    assert result == [{"Database": "NHSE_111", "Schema": "dbo"}]
+    connection.close.assert_called_once()
+
+
+def test_stream():
+    connection = fake_connection(("NHSE_111", "dbo"), ("NHSE_IAPT", ""))
+    with mock.patch("ncdr.importers.db_api.pyodbc.connect", return_value=connection):
+        rows = db_api.stream("select * from tbl_Export_Standard_DB_Structure")
+
+        assert next(rows) == {"Database": "NHSE_111", "Schema": "dbo"}
+        assert next(rows) == {"Database": "NHSE_IAPT", "Schema": ""}
+
+    cursor = connection.cursor.return_value.execute.return_value
+    cursor.fetchmany.assert_called_with(1000)
+
+
+def test_stream_batch_size():
+    connection = fake_connection(("NHSE_111", "dbo"))
+    with mock.patch("ncdr.importers.db_api.pyodbc.connect", return_value=connection):
+        rows = list(db_api.stream("select 1", batch_size=10))
+
+    assert len(rows) == 1
+    cursor = connection.cursor.return_value.execute.return_value
+    cursor.fetchmany.assert_called_with(10)
+
+
+def test_row():
+    row = db_api.Row({"Database": 0, "Schema": 1}, ("NHSE_111", "dbo"))
+
+    assert row["Schema"] == "dbo"
+    assert row.get("Table/View") is None
+    assert list(row.keys()) == ["Database", "Schema"]
+    assert dict(row) == {"Database": "NHSE_111", "Schema": "dbo"}
+
+
+def test_connection_is_shared(settings):
+    settings.UPSTREAM_DB_LOGIN_TIMEOUT = 5
+    settings.UPSTREAM_DB_QUERY_TIMEOUT = 60
+
+    connection = fake_connection(("NHSE_111", "dbo"))
+    with mock.patch(
+        "ncdr.importers.db_api.pyodbc.connect", return_value=connection
+    ) as connect:
+        with db_api.connection():
+            db_api.query("select 1")
+            db_api.query("select 2")
+            connection.close.assert_not_called()
+
+    connect.assert_called_once_with(db_api.get_connection_string(), timeout=5)
+    assert connection.timeout == 60
+    connection.close.assert_called_once()
+
+
+def test_reconnects_when_the_connection_drops():
+    dropped = mock.MagicMock()
+    dropped.cursor.return_value.execute.side_effect = pyodbc.OperationalError(
+        "08S01", "Communication link failure"
+    )
+    connection = fake_connection(("NHSE_111", "dbo"))
+
+    with mock.patch(
+        "ncdr.importers.db_api.pyodbc.connect", side_effect=[dropped, connection]
+    ):
+        result = db_api.query("select 1")
+
+    assert result == [{"Database": "NHSE_111", "Schema": "dbo"}]
+    dropped.close.assert_called_once()
+
+
+def test_query_errors_are_not_retried():
+    broken = mock.MagicMock()
+    broken.cursor.return_value.execute.side_effect = pyodbc.ProgrammingError(
+        "42S02", "Invalid object name"
+    )
+
+    with mock.patch(
+        "ncdr.importers.db_api.pyodbc.connect", return_value=broken
+    ) as connect:
+        with pytest.raises(pyodbc.ProgrammingError):
+            db_api.query("select * from missing")
+
+    connect.assert_called_once()
@@ -0,0 +1,59 @@
+import mock
+import pytest
+
+from ncdr.importers import grouping
+from ncdr.models import Grouping
+
+# Tell pytest all tests in this file need DB access
+# Docs: https://pytest-django.readthedocs.io/en/latest/database.html#enabling-database-access-in-tests  # noqa: E501
+pytestmark = pytest.mark.django_db
+
+
+def mapping_row(grouping_name, data_element, description=""):
+    return {
+        "Grouping": grouping_name,
+        "Grouping Description": f"{grouping_name} description",
+        "Data Element": data_element,
+        "Data Element Description": description,
+    }
+
+
+ROWS = [
+    mapping_row("Patient", "test", "A test data element"),
+    mapping_row("Activity", "test", "A test data element"),
+    mapping_row("Activity", "other"),
+]
+
+
+def test_import_from_db():
+    with mock.patch("ncdr.importers.sources.db_api.stream", return_value=iter(ROWS)):
+        mapping = grouping.import_from_db()
+
+    assert Grouping.objects.count() == 2
+    assert Grouping.objects.get(name="Activity").description == "Activity description"
+
+    assert mapping.groupings["Patient"] == Grouping.objects.get(name="Patient")
+    assert mapping.descriptions == {"test": "A test data element", "other": ""}
+    assert mapping.links == {"test": {"Patient", "Activity"}, "other": {"Activity"}}
+
+
+def test_import_from_db_reuses_groupings():
+    with mock.patch("ncdr.importers.sources.db_api.stream", return_value=iter(ROWS)):
+        first = grouping.import_from_db()
+
+    rows = ROWS + [dict(mapping_row("Patient", "test"), **{"Grouping Description": ""})]
+    with mock.patch("ncdr.importers.sources.db_api.stream", return_value=iter(rows)):
+        second = grouping.import_from_db()
+
+    assert second.groupings["Activity"].pk == first.groupings["Activity"].pk
+
+    # a changed description gets a new Grouping
+    assert second.groupings["Patient"].pk != first.groupings["Patient"].pk
+    assert Grouping.objects.count() == 3
+
+
+def test_import_from_db_query_count(django_assert_num_queries):
+    with mock.patch("ncdr.importers.sources.db_api.stream", return_value=iter(ROWS)):
+        # existing grouping lookup and the new groupings
+        with django_assert_num_queries(2):
+            grouping.import_from_db()
@@ -0,0 +1,110 @@
+import mock
+import pytest
+from django.utils import timezone
+
+from ncdr.importers import incremental
+from ncdr.models import Column, Database, Table, Version
+
+from .test_column import definition_row
+from .test_table import structure_row
+
+# Tell pytest all tests in this file need DB access
+# Docs: https://pytest-django.readthedocs.io/en/latest/database.html#enabling-database-access-in-tests  # noqa: E501
+pytestmark = pytest.mark.django_db
+
+
+STRUCTURE = [
+    structure_row("NHSE_111"),
+    structure_row("NHSE_IAPT"),
+    structure_row("NHSE_111", schema="dbo"),
+    structure_row("NHSE_IAPT", schema="dbo"),
+    structure_row("NHSE_111", "dbo", "tbl_Calls", "Table"),
+    structure_row("NHSE_IAPT", "dbo", "tbl_Referrals", "Table"),
+]
+
+DEFINITIONS = [
+    definition_row("Age", "Age", "NHSE_111.dbo.tbl_Calls, NHSE_IAPT.dbo.tbl_Referrals"),
+    definition_row("Call length", "Call_Length", "NHSE_111.dbo.tbl_Calls"),
+    definition_row("Referral date", "Referral_Date", "NHSE_IAPT.dbo.tbl_Referrals"),
+]
+
+
+def run_import(previous, structure, definitions):
+    version = Version.objects.create(upstream_updated_ts=timezone.now())
+    with mock.patch(
+        "ncdr.importers.table.get_rows", return_value=iter(structure)
+    ), mock.patch("ncdr.importers.column.get_rows", return_value=iter(definitions)):
+        summary = incremental.import_from_db(version, previous)
+    return version, summary
+
+
+def test_hash_databases_ignores_row_order():
+    hashes = incremental.hash_databases(STRUCTURE, DEFINITIONS)
+    reversed_hashes = incremental.hash_databases(STRUCTURE[::-1], DEFINITIONS[::-1])
+
+    assert hashes == reversed_hashes
+    assert hashes.keys() == {"NHSE_111", "NHSE_IAPT"}
+
+
+def test_hash_databases_only_changes_affected_database():
+    changed = DEFINITIONS[:2] + [
+        definition_row(
+            "Referral date",
+            "Referral_Date",
+            "NHSE_IAPT.dbo.tbl_Referrals",
+            Description="changed",
+        )
+    ]
+
+    hashes = incremental.hash_databases(STRUCTURE, DEFINITIONS)
+    changed_hashes = incremental.hash_databases(STRUCTURE, changed)
+
+    assert hashes["NHSE_111"] == changed_hashes["NHSE_111"]
+    assert hashes["NHSE_IAPT"] != changed_hashes["NHSE_IAPT"]
+
+
+def test_import_from_db(published_version):
+    first, summary = run_import(published_version, STRUCTURE, DEFINITIONS)
+
+    assert summary["added"] == ["NHSE_111", "NHSE_IAPT"]
+    assert summary["unchanged"] == []
+
+    definitions = DEFINITIONS[:2] + [
+        definition_row(
+            "Referral date",
+            "Referral_Date",
+            "NHSE_IAPT.dbo.tbl_Referrals",
+            Description="changed",
+        )
+    ]
+    second, summary = run_import(first, STRUCTURE, definitions)
+
+    assert summary["changed"] == ["NHSE_IAPT"]
+    assert summary["unchanged"] == ["NHSE_111"]
+    assert summary["copied"] == {
+        "databases": 1,
+        "schemas": 1,
+        "tables": 1,
+        "columns": 2,
+    }
+
+    # the copied Database keeps its hash so the next import can compare it
+    first_111 = Database.objects.get(version=first, name="NHSE_111")
+    second_111 = Database.objects.get(version=second, name="NHSE_111")
+    assert second_111.pk != first_111.pk
+    assert second_111.content_hash == first_111.content_hash
+
+    calls = Table.objects.get(schema__database=second_111)
+    assert calls.name == "tbl_Calls"
+    assert calls.version == second
+    assert calls.schema.version == second
+
+    # copied Columns point at this Version's DataElements
+    copied = Column.objects.filter(table=calls).order_by("name")
+    assert [c.name for c in copied] == ["Age", "Call_Length"]
+    assert {c.version for c in copied} == {second}
+    age = Column.objects.get(version=second, table__name="tbl_Referrals", name="Age")
+    assert copied[0].data_element_id == age.data_element_id
+
+    referral_date = Column.objects.get(version=second, name="Referral_Date")
+    assert referral_date.description == "changed"
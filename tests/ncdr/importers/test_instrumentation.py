@@ -0,0 +1,40 @@
+import mock
+import pytest
+
+from ncdr.importers import db_api, instrumentation
+from ncdr.models import Grouping
+
+from .test_db_api import fake_connection
+
+# Tell pytest all tests in this file need DB access
+# Docs: https://pytest-django.readthedocs.io/en/latest/database.html#enabling-database-access-in-tests  # noqa: E501
+pytestmark = pytest.mark.django_db
+
+
+def test_stage():
+    connection = fake_connection(("NHSE_111", "dbo"), ("NHSE_IAPT", ""))
+    stages = []
+
+    with mock.patch("ncdr.importers.db_api.pyodbc.connect", return_value=connection):
+        with instrumentation.stage("test", stages) as stage:
+            rows = list(db_api.stream("select * from tbl_Export_Standard_DB_Structure"))
+            Grouping.objects.create(name="test")
+            instrumentation.record_written(1)
+
+    assert stages == [stage]
+    assert stage.rows_read == len(rows) == 2
+    assert stage.rows_written == 1
+    assert stage.queries == 1
+    assert stage.duration >= stage.upstream_fetch_time >= 0
+    assert stage.peak_memory > 0
+
+    # nothing is recorded outside of a stage
+    instrumentation.record_written(1)
+    assert stage.rows_written == 1
+
+
+def test_stage_cant_be_nested():
+    with instrumentation.stage("outer"):
+        with pytest.raises(RuntimeError):
+            with instrumentation.stage("inner"):
+                pass
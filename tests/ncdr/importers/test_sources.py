@@ -0,0 +1,92 @@
+import io
+
+import pytest
+from django.core.management import call_command
+
+from ncdr.importers import sources
+from ncdr.models import Column, Version
+
+from .test_column import definition_row
+from .test_grouping import mapping_row
+from .test_table import structure_row
+
+
+def write_csv(path, filename, rows):
+    lines = [rows[0].keys()] + [row.values() for row in rows]
+    text = "\r\n".join("¬".join(f'"{v}"' for v in line) for line in lines)
+    (path / filename).write_text(text, encoding="latin-1")
+
+
+@pytest.fixture
+def csvs(tmp_path):
+    structure = [
+        structure_row("NHSE_111"),
+        structure_row("NHSE_111", schema="dbo"),
+        structure_row("NHSE_111", "dbo", "tbl_Calls", "Table"),
+        structure_row("NHSE_111", "dbo", "vw_Calls", "View"),
+    ]
+    definitions = [
+        definition_row(
+            "Age",
+            "Age",
+            "NHSE_111.dbo.tbl_Calls, NHSE_111.dbo.vw_Calls",
+            Description="Age in £",
+        )
+    ]
+    write_csv(tmp_path, sources.STRUCTURE, structure)
+    write_csv(tmp_path, sources.DEFINITIONS, definitions)
+    write_csv(tmp_path, sources.GROUPING_MAPPING, [mapping_row("Patient", "Age")])
+    return tmp_path
+
+
+def test_csv_source(csvs):
+    source = sources.CSVSource(str(csvs))
+
+    tables = [row["Table/View"] for row in source.structure_rows()]
+    assert tables == ["", "", "tbl_Calls", "vw_Calls"]
+    assert [row["Description"] for row in source.definition_rows()] == ["Age in £"]
+    assert source.refreshed_at().tzinfo is not None
+
+
+def test_csv_source_scale(csvs):
+    source = sources.CSVSource(str(csvs), scale=2)
+
+    databases = [row["Database"] for row in source.structure_rows()]
+    assert databases == ["NHSE_111"] * 4 + ["NHSE_111_1"] * 4
+
+    definitions = list(source.definition_rows())
+    assert [row["Data_Element"] for row in definitions] == ["Age", "Age_1"]
+    assert definitions[1]["Present_In"] == (
+        "NHSE_111_1.dbo.tbl_Calls, NHSE_111_1.dbo.vw_Calls"
+    )
+
+    mapping = [row["Data Element"] for row in source.mapping_rows()]
+    assert mapping == ["Age", "Age_1"]
+
+
+def test_csv_source_bad_scale(csvs):
+    with pytest.raises(ValueError):
+        sources.CSVSource(str(csvs), scale=0)
+
+
+@pytest.mark.django_db
+def test_benchmark_import(published_version):
+    stdout = io.StringIO()
+
+    call_command("benchmark_import", stdout=stdout)
+
+    # the bundled snapshot is imported then rolled back
+    assert "column:" in stdout.getvalue()
+    assert Version.objects.get() == published_version
+    assert not Column.objects.exists()
+
+
+@pytest.mark.django_db
+def test_benchmark_import_keep(published_version, csvs):
+    call_command("benchmark_import", path=str(csvs), keep=True, stdout=io.StringIO())
+
+    version = Version.objects.latest()
+    assert version != published_version
+    assert version.databases.get().name == "NHSE_111"
+    columns = Column.objects.filter(table__schema__database__version=version)
+    assert [c.description for c in columns] == ["Age in £", "Age in £"]
@@ -0,0 +1,69 @@
+import mock
+import pytest
+
+from ncdr.importers import table
+from ncdr.models import Database, Schema, Table
+
+# Tell pytest all tests in this file need DB access
+# Docs: https://pytest-django.readthedocs.io/en/latest/database.html#enabling-database-access-in-tests  # noqa: E501
+pytestmark = pytest.mark.django_db
+
+
+def structure_row(database, schema="", table_name="", table_or_view="N/A", **kwargs):
+    row = {
+        "Database": database,
+        "Schema": schema,
+        "Table/View": table_name,
+        "Table or View": table_or_view,
+        "Name": "",
+        "Description": "",
+        "Link": "",
+        "Date_Range": "",
+    }
+    row.update(kwargs)
+    return row
+
+
+# The upstream view makes no ordering promises so children come first here
+ROWS = [
+    structure_row("NHSE_111", "dbo", "tbl_Calls", "Table", Date_Range="Apr 2015"),
+    structure_row("NHSE_IAPT", "dbo", "vw_Referrals", "View"),
+    structure_row("NHSE_111", schema="dbo"),
+    structure_row("NHSE_IAPT", schema="dbo"),
+    structure_row("NHSE_111", Name="NHS 111 data"),
+    structure_row("NHSE_IAPT"),
+]
+
+
+def test_import_from_db(unpublished_version):
+    with mock.patch(
+        "ncdr.importers.sources.db_api.stream", return_value=iter(ROWS)
+    ) as m:
+        table.import_from_db(unpublished_version)
+
+    m.assert_called_once()
+
+    databases = Database.objects.filter(version=unpublished_version)
+    assert databases.get(name="NHSE_111").display_name == "NHS 111 data"
+    assert databases.get(name="NHSE_IAPT").display_name == "Nhseiapt"
+
+    schemas = Schema.objects.filter(database__version=unpublished_version)
+    assert schemas.count() == 2
+    assert {s.version for s in schemas} == {unpublished_version}
+
+    calls = Table.objects.get(schema__database__name="NHSE_111")
+    assert calls.name == "tbl_Calls"
+    assert calls.is_table
+    assert calls.date_range == "Apr 2015"
+    assert calls.version == unpublished_version
+
+    referrals = Table.objects.get(schema__database__name="NHSE_IAPT")
+    assert referrals.name == "vw_Referrals"
+    assert not referrals.is_table
+
+
+def test_import_from_db_query_count(unpublished_version, django_assert_num_queries):
+    with mock.patch("ncdr.importers.sources.db_api.stream", return_value=iter(ROWS)):
+        # one insert and one lookup query per level, tables need no lookup
+        with django_assert_num_queries(5):
+            table.import_from_db(unpublished_version)
@@ -0,0 +1,93 @@
+import pytest
+from django.db.models import Q
+from django.http import Http404
+
+from ncdr.models import Column, Version
+from ncdr.pagination import KeysetPaginator, encode_cursor, keyset_filter
+
+# Tell pytest all tests in this file need DB access
+# Docs: https://pytest-django.readthedocs.io/en/latest/database.html#enabling-database-access-in-tests  # noqa: E501
+pytestmark = pytest.mark.django_db
+
+
+def test_keyset_filter():
+    assert keyset_filter(["name", "pk"], ["a", 1]) == Q(name__gt="a") | (
+        Q(name="a") & Q(pk__gt=1)
+    )
+    assert keyset_filter(["-pk"], [3], after=False) == Q(pk__gt=3)
+
+
+@pytest.fixture
+def columns(published_table):
+    # duplicate names are ordered by pk
+    return [
+        Column.objects.create(name=name, table=published_table)
+        for name in ["a", "b", "b", "c", "d"]
+    ]
+
+
+def test_pages(columns):
+    paginator = KeysetPaginator(Column.objects.all(), 2, ("name", "pk"), 60)
+
+    first = paginator.page()
+    assert first.object_list == columns[:2]
+    assert not first.has_previous()
+
+    second = paginator.page(after=first.next_cursor)
+    assert second.object_list == columns[2:4]
+    assert second.has_previous()
+
+    last = paginator.page(after=second.next_cursor)
+    assert last.object_list == columns[4:]
+    assert not last.has_next()
+
+    assert paginator.page(before=last.previous_cursor).object_list == columns[2:4]
+    back = paginator.page(before=second.previous_cursor)
+    assert back.object_list == columns[:2]
+    assert not back.has_previous()
+    assert back.has_next()
+
+
+def test_descending_pages(published_version, unpublished_version):
+    paginator = KeysetPaginator(Version.objects.all(), 1, ("-pk",), 60)
+
+    first = paginator.page()
+    assert first.object_list == [unpublished_version]
+    assert paginator.page(after=first.next_cursor).object_list == [published_version]
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "nonsense",
+        "a",
+        encode_cursor(["a"]),
+        encode_cursor(["x", "notint"]),
+        encode_cursor(["x", [1]]),
+        encode_cursor(["x", None]),
+    ],
+)
+def test_invalid_cursor(columns, cursor):
+    paginator = KeysetPaginator(Column.objects.all(), 2, ("name", "pk"), 60)
+
+    with pytest.raises(Http404):
+        paginator.page(after=cursor)
+
+    with pytest.raises(Http404):
+        paginator.page(before=cursor)
+
+
+def test_cursor_values_converted(columns):
+    paginator = KeysetPaginator(Column.objects.all(), 2, ("name", "pk"), 60)
+
+    cursor = encode_cursor([columns[1].name, str(columns[1].pk)])
+    assert paginator.page(after=cursor).object_list == columns[2:4]
+
+
+def test_count_cached(columns, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        assert KeysetPaginator(Column.objects.all(), 2, ("name", "pk"), 60).count == 5
+
+    with django_assert_num_queries(0):
+        assert KeysetPaginator(Column.objects.all(), 2, ("name", "pk"), 60).count == 5
+        assert KeysetPaginator(Column.objects.none(), 2, ("name", "pk"), 60).count == 0
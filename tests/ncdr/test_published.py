@@ -0,0 +1,63 @@
+import mock
+import pytest
+from django.core.cache import caches
+
+from ncdr import published
+from ncdr.published import GENERATION_KEY
+
+# Tell pytest all tests in this file need DB access
+# Docs: https://pytest-django.readthedocs.io/en/latest/database.html#enabling-database-access-in-tests  # noqa: E501
+pytestmark = pytest.mark.django_db
+
+
+def test_get(published_version, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        assert published.get() == published_version
+
+    # cached in this process
+    with django_assert_num_queries(0):
+        assert published.get() == published_version
+
+    # and in the cache, for other processes
+    published._cached = None
+    with django_assert_num_queries(0):
+        assert published.get() == published_version
+
+
+def test_get_checks_generation(
+    published_version, unpublished_version, settings, django_assert_num_queries
+):
+    published.get()
+
+    # another worker publishes a Version
+    published_version.is_published = False
+    published_version.save()
+    unpublished_version.is_published = True
+    unpublished_version.save()
+    caches["default"].delete(GENERATION_KEY)
+
+    # this worker keeps its Version until it checks the cache again
+    assert published.get() == published_version
+
+    settings.PUBLISHED_VERSION_CHECK_INTERVAL = 0
+    with django_assert_num_queries(1):
+        assert published.get() == unpublished_version
+
+
+def test_publish_invalidates(published_version, unpublished_version, user):
+    assert published.get() == published_version
+
+    # tests never commit, so run the callback straight away
+    with mock.patch("django.db.transaction.on_commit", side_effect=lambda f: f()):
+        unpublished_version.publish(user)
+
+    assert published.get() == unpublished_version
+
+
+def test_middleware(published_version, client, django_assert_num_queries):
+    published.get()
+
+    with django_assert_num_queries(0):
+        resp = client.get("/about/")
+
+    assert resp.wsgi_request.version == published_version
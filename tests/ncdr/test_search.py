@@ -0,0 +1,453 @@
+import importlib
+import io
+
+import mock
+import pytest
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, connection, transaction
+
+from metrics.models import Metric
+from ncdr.importers.column import set_usage_counts
+from ncdr.models import Column, Database, DataElement, SearchDocument, Table
+from ncdr.search import (
+    ResultList,
+    SearchResults,
+    fuzzy_search,
+    generation_key,
+    has_trigram_support,
+    index_unversioned,
+    index_version,
+    invalidate,
+    search,
+    searchableLUT,
+)
+
+# Tell pytest all tests in this file need DB access
+# Docs: https://pytest-django.readthedocs.io/en/latest/database.html#enabling-database-access-in-tests  # noqa: E501
+pytestmark = pytest.mark.django_db
+
+
+def test_index_version(published_grouping, unpublished_column):
+    version = published_grouping.versions.get()
+
+    assert index_version(version) == 5
+
+    documents = SearchDocument.objects.filter(version=version)
+    assert sorted(documents.values_list("model_name", flat=True)) == [
+        "column",
+        "database",
+        "dataelement",
+        "grouping",
+        "table",
+    ]
+
+    # indexing again replaces the documents
+    assert index_version(version) == 5
+    assert documents.count() == 5
+
+
+def test_build_documents_migration(published_grouping, published_column):
+    migration = importlib.import_module("ncdr.migrations.0024_build_search_documents")
+    version = published_grouping.versions.get()
+    index_version(version)
+
+    def documents():
+        return {
+            (d.model_name, d.object_id): str(d.document)
+            for d in SearchDocument.objects.filter(version=version)
+        }
+
+    # the migration builds the same documents as importing a Version does
+    indexed = documents()
+    SearchDocument.objects.all().delete()
+    with connection.cursor() as cursor:
+        for model_name in searchableLUT:
+            cursor.execute(migration.build_documents(model_name))
+    assert documents() == indexed
+
+    # and leaves any which already exist alone
+    with connection.cursor() as cursor:
+        cursor.execute(migration.build_documents("column"))
+        assert cursor.rowcount == 0
+
+
+def test_search(published_table):
+    version = published_table.schema.database.version
+    Column.objects.create(
+        name="Arrival_Mode", description="How they arrived", table=published_table
+    )
+    Column.objects.create(
+        name="Source", description="The mode of arrival", table=published_table
+    )
+    Column.objects.create(name="Age", table=published_table)
+    index_version(version)
+
+    results = search(Column, version, "arrival mode")
+    # name matches rank above description matches
+    assert [c.name for c in results] == ["Arrival_Mode", "Source"]
+
+    # partial words match
+    assert [c.name for c in search(Column, version, "arr")] == [
+        "Arrival_Mode",
+        "Source",
+    ]
+    assert [c.name for c in search(Column, version, "AGE")] == ["Age"]
+
+
+def test_search_ranking(published_table):
+    version = published_table.version
+    described = Column.objects.create(
+        name="Source", description="The mode", table=published_table
+    )
+    within = Column.objects.create(name="Arrival_Mode", table=published_table)
+    prefixed = Column.objects.create(name="Mode_Of_Arrival", table=published_table)
+    exact = Column.objects.create(name="MODE", table=published_table)
+    index_version(version)
+
+    # exact names, then names starting with the text, then anywhere in the
+    # name, then descriptions
+    results = search(Column, version, "mode")
+    assert list(results) == [exact, prefixed, within, described]
+    assert [c.usage for c in results] == [1, 1, 1, 1]
+
+
+def test_search_ranking_usage(published_table):
+    version = published_table.version
+    unused = Column.objects.create(name="age", table=published_table)
+    used = Column.objects.create(name="age_", table=published_table)
+    data_element = DataElement.objects.create(name="Age", slug="age")
+    data_element.versions.add(version)
+    data_element.column_set.add(
+        used, Column.objects.create(name="other", table=published_table)
+    )
+    set_usage_counts(version)
+    index_version(version)
+
+    # equally good matches go to the most used first
+    results = search(Column, version, "age")
+    assert list(results) == [used, unused]
+    assert [c.usage for c in results] == [2, 1]
+    assert [d.usage for d in search(DataElement, version, "age")] == [2]
+
+
+def test_search_ties_ordered_by_pk(published_table):
+    version = published_table.version
+    # identical Columns, so only their pks tell them apart
+    columns = [
+        Column.objects.create(name="Age", table=published_table) for _ in range(5)
+    ]
+    index_version(version)
+
+    results = search(Column, version, "age")
+    pages = list(results[:2]) + list(results[2:4]) + list(results[4:])
+    assert pages == columns
+
+
+def test_search_current_version_only(published_table, unpublished_table):
+    for table in [published_table, unpublished_table]:
+        index_version(table.schema.database.version)
+
+    results = search(Table, published_table.schema.database.version, "test")
+    assert list(results) == [published_table]
+
+
+@pytest.mark.parametrize("query", ["", "  ", "&!:*"])
+def test_search_without_words(published_database, query):
+    index_version(published_database.version)
+
+    assert not search(Database, published_database.version, query).exists()
+
+
+def test_search_data_elements(published_data_element):
+    index_version(published_data_element.versions.get())
+
+    results = search(DataElement, published_data_element.versions.get(), "tes")
+    assert list(results) == [published_data_element]
+
+
+def test_rebuild_search_index(published_column):
+    call_command("rebuild_search_index", stdout=io.StringIO())
+
+    version = published_column.table.schema.database.version
+    assert list(search(Column, version, "test")) == [published_column]
+
+
+def test_fuzzy_search(published_table, settings):
+    if not has_trigram_support():
+        pytest.skip("pg_trgm isn't installed")
+
+    settings.SEARCH_FUZZY_THRESHOLD = 0.3
+    version = published_table.schema.database.version
+    Column.objects.create(name="Arrival_Mode", table=published_table)
+    Column.objects.create(name="Arrival_Date", table=published_table)
+    Column.objects.create(name="Age", table=published_table)
+
+    results = fuzzy_search(Column, version, "arival_mode")
+    assert [c.name for c in results] == ["Arrival_Mode", "Arrival_Date"]
+    assert results[0].similarity > results[1].similarity
+
+    settings.SEARCH_FUZZY_THRESHOLD = 0.6
+    results = fuzzy_search(Column, version, "arival_mode")
+    assert [c.name for c in results] == ["Arrival_Mode"]
+
+
+def test_fuzzy_search_without_trigram_support(published_column):
+    index_version(published_column.table.schema.database.version)
+
+    with mock.patch("ncdr.search.has_trigram_support", return_value=False):
+        version = published_column.table.schema.database.version
+        assert list(fuzzy_search(Column, version, "tes")) == [published_column]
+        assert not fuzzy_search(Column, version, " ").exists()
+
+
+def test_search_results_fuzzy_without_trigram_support(published_column):
+    version = published_column.table.schema.database.version
+    index_version(version)
+
+    with mock.patch("ncdr.search.has_trigram_support", return_value=False):
+        results = SearchResults(version, "tes", fuzzy=True)
+
+    assert not results.use_trigrams
+    assert results.counts["column"] == 1
+    assert list(results.get_queryset("column")) == [published_column]
+
+
+@pytest.mark.parametrize(
+    "available,error", [(None, None), ((1,), DatabaseError("permission denied"))]
+)
+def test_trigram_migration_without_pg_trgm(available, error):
+    migration = importlib.import_module("ncdr.migrations.0020_trigram_indexes")
+    schema_editor = mock.MagicMock()
+    schema_editor.connection.alias = "default"
+    cursor = schema_editor.connection.cursor.return_value.__enter__.return_value
+    cursor.fetchone.return_value = available
+
+    def execute(sql):
+        if sql.startswith("CREATE EXTENSION"):
+            raise error
+
+    cursor.execute.side_effect = execute
+
+    with mock.patch.object(migration, "logger") as logger:
+        migration.create_trigram_indexes(None, schema_editor)
+
+    logger.warning.assert_called_once()
+    # no indexes are created
+    assert not any("CREATE INDEX" in c[0][0] for c in cursor.execute.call_args_list)
+
+
+def test_search_results_counts(published_column, django_assert_num_queries):
+    version = published_column.table.schema.database.version
+    index_version(version)
+
+    results = SearchResults(version, "tes")
+    with django_assert_num_queries(1):
+        assert results.counts == {
+            "column": 1,
+            "database": 1,
+            "dataelement": 0,
+            "grouping": 0,
+            "table": 1,
+        }
+        assert results.first_match() == "column"
+
+    assert list(results.get_queryset("column")) == [published_column]
+    assert results.get_queryset("column") is results.get_queryset("column")
+
+
+def test_search_results_fuzzy_counts(published_column, django_assert_num_queries):
+    def similar_names(model, version, search_param):
+        return model.objects.filter(name__icontains=search_param)
+
+    with mock.patch("ncdr.search.has_trigram_support", return_value=True):
+        results = SearchResults(
+            published_column.table.schema.database.version, "es", fuzzy=True
+        )
+
+    with mock.patch("ncdr.search.similar_names", similar_names), mock.patch(
+        "ncdr.search.set_similarity_threshold"
+    ) as set_similarity_threshold:
+        # the per model counts are UNIONed into one query
+        with django_assert_num_queries(1):
+            counts = results.counts
+
+    set_similarity_threshold.assert_called_once()
+    assert counts == {
+        "column": 1,
+        "database": 1,
+        "dataelement": 0,
+        "grouping": 0,
+        "table": 1,
+    }
+
+
+def test_search_results_without_words(published_column, django_assert_num_queries):
+    results = SearchResults(published_column.table.schema.database.version, "!")
+
+    with django_assert_num_queries(0):
+        assert results.first_match() is None
+        assert not results.get_queryset("column").exists()
+
+
+def test_search_results_cached(published_column, django_assert_num_queries):
+    version = published_column.table.schema.database.version
+    index_version(version)
+
+    results = SearchResults(version, "tes")
+    counts = results.counts
+    assert results.get_ids("column", 0, 30) == [published_column.pk]
+
+    # the same search, normalised, is served from the cache
+    results = SearchResults(version, " TES ")
+    with django_assert_num_queries(0):
+        assert results.counts == counts
+        assert results.get_ids("column", 0, 30) == [published_column.pk]
+
+
+def test_invalidate(published_column):
+    version = published_column.table.schema.database.version
+    index_version(version)
+    assert SearchResults(version, "tes").counts["column"] == 1
+
+    SearchDocument.objects.filter(version=version).delete()
+    assert SearchResults(version, "tes").counts["column"] == 1
+
+    invalidate(version)
+    assert SearchResults(version, "tes").counts["column"] == 0
+
+
+def test_deleting_version_invalidates(published_column):
+    version = published_column.table.schema.database.version
+    SearchResults(version, "tes").counts
+    assert caches["search"].get(generation_key(version)) is not None
+
+    version.delete()
+
+    assert caches["search"].get(generation_key(version)) is None
+
+
+def test_result_list(published_table, django_assert_num_queries):
+    columns = [
+        Column.objects.create(name=f"test {i}", table=published_table) for i in range(3)
+    ]
+    index_version(published_table.schema.database.version)
+
+    result_list = ResultList(
+        SearchResults(published_table.schema.database.version, "test"), "column"
+    )
+
+    assert len(result_list) == 3
+    assert result_list[1:3] == columns[1:3]
+    assert result_list[0] == columns[0]
+    assert list(result_list) == columns
+    with pytest.raises(IndexError):
+        result_list[3]
+
+    # pages already seen come from the cache, leaving the object query
+    with django_assert_num_queries(1):
+        assert result_list[1:3] == columns[1:3]
+
+
+@pytest.fixture
+def searchable_metrics():
+    # as with METRICS_ENABLED
+    metric = {"model": Metric, "version_link": None}
+    with mock.patch.dict(searchableLUT, {"metric": metric}):
+        yield
+
+
+def test_index_unversioned(metric, published_column, searchable_metrics):
+    version = published_column.table.schema.database.version
+
+    assert index_unversioned() == 1
+    assert index_version(version) == 3
+
+    document = SearchDocument.objects.get(model_name="metric")
+    assert document.object_id == metric.pk
+    assert document.version is None
+
+    assert list(search(Metric, None, "tes")) == [metric]
+
+
+def test_build_documents_migration_metrics(metric, searchable_metrics):
+    migration = importlib.import_module("ncdr.migrations.0024_build_search_documents")
+    index_unversioned()
+    indexed = SearchDocument.objects.get(model_name="metric")
+
+    SearchDocument.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(migration.build_documents("metric"))
+        document = SearchDocument.objects.get(model_name="metric")
+        assert document.version is None
+        assert document.object_id == metric.pk
+        assert str(document.document) == str(indexed.document)
+
+        cursor.execute(migration.build_documents("metric"))
+        assert cursor.rowcount == 0
+
+
+def test_search_results_counts_unsearched_models(published_column):
+    version = published_column.version
+    index_version(version)
+    # left behind by a model which isn't searched any more, like Metrics
+    # when METRICS_ENABLED is turned off
+    SearchDocument.objects.create(
+        version=None, model_name="retired", object_id=1, document="tes"
+    )
+
+    counts = SearchResults(version, "tes").count()
+    assert counts.keys() == searchableLUT.keys()
+    assert counts["column"] == 1
+
+
+def test_index_unversioned_metrics_disabled(metric, published_column):
+    assert "metric" not in searchableLUT
+    version = published_column.version
+    index_version(version)
+
+    # built anyway, so the metrics pages can be turned on without reindexing
+    assert index_unversioned() == 1
+    assert SearchDocument.objects.get(model_name="metric").object_id == metric.pk
+    assert "metric" not in SearchResults(version, "tes").count()
+
+    migration = importlib.import_module("ncdr.migrations.0024_build_search_documents")
+    sql = [operation.sql for operation in migration.Migration.operations]
+    assert migration.build_documents("metric") in sql[0]
+
+
+def test_unversioned_documents_unique(metric, searchable_metrics):
+    index_unversioned()
+    document = SearchDocument.objects.get(model_name="metric")
+
+    with pytest.raises(IntegrityError), transaction.atomic():
+        SearchDocument.objects.create(
+            version=None,
+            model_name="metric",
+            object_id=metric.pk,
+            document=document.document,
+        )
+
+    # indexing again replaces the documents rather than adding to them
+    assert index_unversioned() == 1
+    assert SearchDocument.objects.filter(model_name="metric").count() == 1
+
+
+def test_search_results_with_metrics(
+    metric, published_column, searchable_metrics, django_assert_num_queries
+):
+    version = published_column.table.schema.database.version
+    index_version(version)
+    index_unversioned()
+
+    results = SearchResults(version, "tes")
+    with django_assert_num_queries(1):
+        assert results.counts == {
+            "column": 1,
+            "database": 1,
+            "dataelement": 0,
+            "grouping": 0,
+            "table": 1,
+            "metric": 1,
+        }
+    assert list(results.get_queryset("metric")) == [metric]
@@ -0,0 +1,176 @@
+import io
+
+import mock
+import pytest
+from django.core.management import call_command
+
+from ncdr import search_index
+from ncdr.importers.column import set_usage_counts
+from ncdr.models import Column, DataElement, Version
+from ncdr.search import SearchResults, index_version, searchableLUT
+from ncdr.search_index import InvertedIndex, query_words, tokenise
+
+# Tell pytest all tests in this file need DB access
+# Docs: https://pytest-django.readthedocs.io/en/latest/database.html#enabling-database-access-in-tests  # noqa: E501
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def memory_backend(settings):
+    settings.SEARCH_BACKEND = "memory"
+    yield
+    search_index._index = None
+
+
+def test_tokenise():
+    assert tokenise("Arrival_Mode (NHS-Number)") == ["arrival", "mode", "nhs", "number"]
+    assert tokenise(None) == []
+
+
+def test_query_words():
+    assert query_words("Arrival_Mode (NHS-Number)") == [
+        ["arrival", "mode"],
+        ["nhs"],
+        ["number"],
+    ]
+    assert query_words("_ a__b_") == [["a", "b"]]
+
+
+def test_search(published_table):
+    arrival = Column.objects.create(
+        name="arrival_mode", description="how", table=published_table
+    )
+    described = Column.objects.create(
+        name="other", description="the arrival mode", table=published_table
+    )
+    Column.objects.create(name="arrival", table=published_table)
+    index_version(published_table.version)
+
+    index = InvertedIndex(published_table.version)
+    results = index.search("ARRIV mod")
+
+    # name matches rank above description matches
+    assert results["column"] == [arrival.pk, described.pk]
+    assert results["table"] == []
+    assert index.search("!")["column"] == []
+
+
+def test_search_ranking(published_table):
+    version = published_table.version
+    described = Column.objects.create(
+        name="source", description="the mode", table=published_table
+    )
+    within = Column.objects.create(name="arrival_mode", table=published_table)
+    prefixed = Column.objects.create(name="mode_of_arrival", table=published_table)
+    exact = Column.objects.create(name="MODE", table=published_table)
+    unused = Column.objects.create(name="age", table=published_table)
+    used = Column.objects.create(name="age_", table=published_table)
+    data_element = DataElement.objects.create(name="age", slug="age")
+    data_element.versions.add(version)
+    data_element.column_set.add(used, described)
+    set_usage_counts(version)
+    index_version(version)
+
+    index = InvertedIndex(version)
+
+    # like search.search
+    assert index.search("mode")["column"] == [
+        exact.pk,
+        prefixed.pk,
+        within.pk,
+        described.pk,
+    ]
+    assert index.search("age")["column"] == [used.pk, unused.pk]
+    assert index.search("age")["dataelement"] == [data_element.pk]
+
+
+@pytest.mark.parametrize(
+    "query", ["arrival_mode", "arrival mode", "nhs", "www", "www.nhs", "uk/a", "1.5"]
+)
+def test_search_matches_database(published_table, query):
+    version = published_table.version
+    published_table.link = "https://www.nhs.uk/a"
+    published_table.save()
+    Column.objects.create(name="Arrival_Mode", table=published_table)
+    Column.objects.create(
+        name="Source", description="the mode of arrival", table=published_table
+    )
+    Column.objects.create(name="NHS_Number", description="v1.5", table=published_table)
+    index_version(version)
+
+    results = SearchResults(version, query)
+    results.index = None
+    indexed = InvertedIndex(version).search(query)
+
+    for model_name in searchableLUT:
+        pks = results.get_queryset(model_name).values_list("pk", flat=True)
+        assert sorted(indexed[model_name]) == sorted(pks), model_name
+
+
+def test_memory_report(published_column):
+    index_version(published_column.version)
+    report = InvertedIndex(published_column.version).memory_report()
+
+    assert report["column"]["objects"] == 1
+    assert report["column"]["words"] == 1
+    assert report["column"]["bytes"] > 0
+
+
+def test_get(published_column, unpublished_version, settings):
+    version = published_column.table.schema.database.version
+    assert search_index.get(version) is None
+
+    settings.SEARCH_BACKEND = "memory"
+    try:
+        index = search_index.get(version)
+        assert index.version_pk == version.pk
+        assert search_index.get(version) is index
+        assert search_index.get(unpublished_version) is None
+
+        # publishing another Version rebuilds the index
+        Version.objects.update(is_published=False)
+        unpublished_version.is_published = True
+        assert (
+            search_index.get(unpublished_version).version_pk == unpublished_version.pk
+        )
+    finally:
+        search_index._index = None
+
+
+def test_search_results(published_column, memory_backend, django_assert_num_queries):
+    version = published_column.table.schema.database.version
+    index_version(version)
+    search_index.warm()
+
+    results = SearchResults(version, "tes")
+    with django_assert_num_queries(0):
+        assert results.counts["column"] == 1
+        assert results.get_ids("column", 0, 30) == [published_column.pk]
+
+    # fuzzy searches still use the database
+    assert SearchResults(version, "tes", fuzzy=True).index is None
+
+
+def test_benchmark_search(published_column):
+    index_version(published_column.table.schema.database.version)
+
+    out = io.StringIO()
+    call_command("benchmark_search", "tes", repeat=1, stdout=out)
+
+    output = out.getvalue()
+    assert "column:       1 objects" in output
+    assert "'tes'" in output
+    assert "differ" not in output
+
+
+def test_benchmark_search_reuses_index(published_column, memory_backend):
+    index_version(published_column.version)
+    index = search_index.get(published_column.version)
+
+    with mock.patch(
+        "ncdr.management.commands.benchmark_search.InvertedIndex"
+    ) as InvertedIndex:
+        call_command("benchmark_search", "tes", repeat=1, stdout=io.StringIO())
+
+    InvertedIndex.assert_not_called()
+    assert search_index._index is index
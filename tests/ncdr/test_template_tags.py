@@ -29,3 +29,12 @@ def test_pagination_with_no_args():
     ctx = {"request": request}
     result = pagination(ctx)
     assert result["paginator_query_string"] == ""
+
+
+def test_pagination_with_cursor():
+    qd = QueryDict("after=abc&letter=A")
+    request = mock.MagicMock()
+    request.GET = qd
+    ctx = {"request": request}
+    result = pagination(ctx)
+    assert result["paginator_query_string"] == "&letter=A"
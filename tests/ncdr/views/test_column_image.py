@@ -2,8 +2,11 @@ import json
 from tempfile import NamedTemporaryFile
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from ncdr import published
 from ncdr.models import Column, ColumnImage
 
 # Tell pytest all tests in this file need DB access
@@ -21,6 +24,51 @@ def test_column_image_list(column_image, client, user):
     assert context["object_list"][0].id == column_image.id
 
 
+def test_column_image_list_column_urls(
+    column_image, published_column, unpublished_column, client, user
+):
+    client.force_login(user)
+    url = reverse("column_image_list")
+
+    def get():
+        with CaptureQueriesContext(connection) as context:
+            resp = client.get(url)
+        assert resp.status_code == 200
+        return len(context), resp.context["object_list"]
+
+    # cache the published Version, as the first request would
+    published.get()
+    expected, _ = get()
+
+    # the same path in an unpublished Version isn't linked to
+    for column in [published_column, unpublished_column]:
+        for _ in range(3):
+            ColumnImage.objects.create(
+                image=NamedTemporaryFile(suffix=".jpg").name
+            ).columnimagerelation_set.create(
+                database_name="test",
+                schema_name="test",
+                table_name="test",
+                column_name=column.name,
+            )
+
+    # the same number of queries however many images there are
+    queries, images = get()
+    assert queries == expected
+    links = [link for image in images for link in image.column_links]
+    assert set(links) == {
+        (
+            "test_db_name_1.test_schema_name_1.test_table_name_1.test_column_name_1",
+            None,
+        ),
+        (
+            "test_db_name_2.test_schema_name_2.test_table_name_2.test_column_name_2",
+            None,
+        ),
+        ("test.test.test.test", published_column.get_absolute_url()),
+    }
+
+
 def test_column_image_list_none(client, user):
     client.force_login(user)
     url = reverse("column_image_list")
@@ -1,6 +1,9 @@
 import pytest
 from django.urls import reverse
 
+from ncdr.models import Column, DataElement
+from ncdr.pagination import encode_cursor
+
 # Tell pytest all tests in this file need DB access
 # Docs: https://pytest-django.readthedocs.io/en/latest/database.html#enabling-database-access-in-tests  # noqa: E501
 pytestmark = pytest.mark.django_db
@@ -34,3 +37,62 @@ def test_data_element_list_populated(initial_version, client, published_data_ele
     resp = client.get(url)
 
     assert resp.status_code == 200
+
+
+def test_data_element_list_pages(initial_version, client, published_table):
+    data_elements = []
+    for i in range(51):
+        data_element = DataElement.objects.create(name=f"A {i:02}", slug=f"a-{i}")
+        data_element.versions.add(initial_version)
+        Column.objects.create(
+            name="a", table=published_table, data_element=data_element
+        )
+        data_elements.append(data_element)
+
+    url = reverse("data_element_list")
+    resp = client.get(url, {"letter": "A"})
+
+    assert list(resp.context["object_list"]) == data_elements[:50]
+    assert resp.context["paginator"].count == 51
+    next_cursor = resp.context["page_obj"].next_cursor
+    assert f"?after={next_cursor}&amp;letter=A" in resp.content.decode()
+
+    resp = client.get(url, {"letter": "A", "after": next_cursor})
+    assert list(resp.context["object_list"]) == data_elements[50:]
+    assert not resp.context["page_obj"].has_next()
+
+
+def test_data_element_list_invalid_cursor(initial_version, client):
+    url = reverse("data_element_list")
+    resp = client.get(url, {"after": encode_cursor(["x", "notint"])})
+
+    assert resp.status_code == 404
+
+
+def test_data_element_detail_description(
+    initial_version, client, published_table, unpublished_table
+):
+    data_element = DataElement.objects.create(name="Age", slug="age")
+    data_element.versions.add(initial_version, unpublished_table.version)
+    Column.objects.create(
+        name="age",
+        description="Age at referral",
+        table=unpublished_table,
+        data_element=data_element,
+    )
+
+    url = reverse("data_element_detail", kwargs={"slug": "age"})
+    # no description, and no Column in the published Version to take one from
+    resp = client.get(url)
+    assert resp.status_code == 200
+    assert "Age at referral" not in resp.content.decode()
+
+    Column.objects.create(
+        name="age",
+        description="Age in years",
+        table=published_table,
+        data_element=data_element,
+    )
+    resp = client.get(url)
+    assert "Age in years" in resp.content.decode()
+    assert "Age at referral" not in resp.content.decode()
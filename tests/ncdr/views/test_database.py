@@ -1,6 +1,11 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from ncdr import published
+from ncdr.models import Table
+
 # Tell pytest all tests in this file need DB access
 # Docs: https://pytest-django.readthedocs.io/en/latest/database.html#enabling-database-access-in-tests  # noqa: E501
 pytestmark = pytest.mark.django_db
@@ -13,6 +18,28 @@ def test_database_detail_published_version(initial_version, client, published_da
     assert resp.status_code == 200
 
 
+def test_database_detail_queries(initial_version, client, published_table):
+    url = published_table.schema.database.get_absolute_url()
+
+    def count_queries():
+        with CaptureQueriesContext(connection) as context:
+            resp = client.get(url)
+        assert resp.status_code == 200
+        return len(context), resp
+
+    # cache the published Version, as the first request would
+    published.get()
+    expected, _ = count_queries()
+
+    for i in range(50):
+        Table.objects.create(name=f"test_{i}", schema=published_table.schema)
+
+    # the same number of queries however many Tables there are
+    queries, resp = count_queries()
+    assert queries == expected
+    assert resp.content.decode().count('class="table-link"') == 51
+
+
 def test_database_detail_unpublished_version(
     initial_version, client, unpublished_database
 ):
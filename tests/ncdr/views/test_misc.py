@@ -1,6 +1,10 @@
+from tempfile import NamedTemporaryFile
+
 import pytest
 from django.urls import reverse
 
+from ncdr.models import ColumnImage
+
 # Tell pytest all tests in this file need DB access
 # Docs: https://pytest-django.readthedocs.io/en/latest/database.html#enabling-database-access-in-tests  # noqa: E501
 pytestmark = pytest.mark.django_db
@@ -23,6 +27,25 @@ def test_column_detail_published_version(initial_version, client, published_colu
     assert resp.status_code == 200
 
 
+def test_column_detail_images(initial_version, client, published_column):
+    image = ColumnImage.objects.create(image=NamedTemporaryFile(suffix=".jpg").name)
+    image.columnimagerelation_set.create(
+        database_name="test", schema_name="test", table_name="test", column_name="test"
+    )
+    # images for Columns with the same name elsewhere aren't shown
+    ColumnImage.objects.create(
+        image=NamedTemporaryFile(suffix=".jpg").name
+    ).columnimagerelation_set.create(
+        database_name="other", schema_name="test", table_name="test", column_name="test"
+    )
+
+    url = published_column.get_absolute_url()
+    resp = client.get(url)
+
+    assert resp.status_code == 200
+    assert resp.context["object"].images == [image]
+
+
 def test_column_detail_unpublished_version(initial_version, client, unpublished_column):
     database_name = unpublished_column.table.schema.database.name
     url = reverse(
@@ -1,6 +1,9 @@
 import pytest
 from django.urls import reverse
 
+from ncdr.models import Column
+from ncdr.search import index_version
+
 # Tell pytest all tests in this file need DB access
 # Docs: https://pytest-django.readthedocs.io/en/latest/database.html#enabling-database-access-in-tests  # noqa: E501
 pytestmark = pytest.mark.django_db
@@ -36,3 +39,92 @@ def test_search_populated(initial_version, client, published_column):
         resp = client.get(url)
 
         assert resp.status_code == 200
+
+
+def test_search_results(initial_version, client, published_column):
+    index_version(initial_version)
+
+    url = reverse("search", kwargs={"model_name": "column"})
+    resp = client.get(f"{url}?q=tes")
+
+    assert list(resp.context["object_list"]) == [published_column]
+    counts = {r["name"]: r["count"] for r in resp.context["results"]}
+    assert counts == {
+        "column": 1,
+        "database": 1,
+        "dataelement": 0,
+        "grouping": 0,
+        "table": 1,
+    }
+
+
+def test_search_fuzzy(initial_version, client, published_column):
+    index_version(initial_version)
+
+    url = reverse("search", kwargs={"model_name": "column"})
+    resp = client.get(f"{url}?q=tes&mode=fuzzy")
+
+    assert resp.status_code == 200
+    assert resp.context["fuzzy"]
+    assert resp.context["query"] == "q=tes&mode=fuzzy"
+
+
+def test_search_redirect_first_match(initial_version, client, published_database):
+    index_version(initial_version)
+
+    url = f"{reverse('search_redirect')}?q=tes"
+    resp = client.get(url)
+
+    assert resp.url == "/search/database/?q=tes"
+
+
+def test_search_query_count(
+    initial_version, client, published_column, django_assert_max_num_queries
+):
+    index_version(initial_version)
+    url = reverse("search", kwargs={"model_name": "column"})
+
+    # session/user/version lookups, the counts, the page count and the page
+    with django_assert_max_num_queries(8):
+        client.get(f"{url}?q=tes")
+
+
+def test_suggest(initial_version, client, published_table):
+    Column.objects.create(name="Arrival_Mode", table=published_table)
+    Column.objects.create(name="arrival_date", table=published_table)
+    Column.objects.create(name="departure", table=published_table)
+
+    url = reverse("search_suggest")
+    resp = client.get(url, {"q": "ARR"})
+
+    assert resp.status_code == 200
+    assert [s["name"] for s in resp.json()["suggestions"]] == [
+        "arrival_date",
+        "Arrival_Mode",
+    ]
+    assert resp.json()["suggestions"][1] == {
+        "name": "Arrival_Mode",
+        "model_name": "column",
+        "url": "/search/column/?q=Arrival_Mode",
+    }
+    assert "max-age=300" in resp["Cache-Control"]
+    assert resp["Vary"] == "Cookie"
+
+
+def test_suggest_limit(initial_version, client, published_table):
+    for i in range(3):
+        Column.objects.create(name=f"test {i}", table=published_table)
+
+    url = reverse("search_suggest")
+
+    # the Database, Schema and Table fixtures are all named "test" too
+    names = [s["name"] for s in client.get(url, {"q": "t"}).json()["suggestions"]]
+    assert names == ["test", "test", "test 0", "test 1", "test 2"]
+
+    resp = client.get(url, {"q": "t", "limit": 2})
+    assert len(resp.json()["suggestions"]) == 2
+
+    resp = client.get(url, {"q": "t", "limit": "all"})
+    assert len(resp.json()["suggestions"]) == 5
+
+    assert client.get(url, {"q": " "}).json() == {"suggestions": []}
@@ -1,6 +1,12 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from ncdr import published
+from ncdr.importers.column import set_usage_counts
+from ncdr.models import Column, DataElement, Table
+
 # Tell pytest all tests in this file need DB access
 # Docs: https://pytest-django.readthedocs.io/en/latest/database.html#enabling-database-access-in-tests  # noqa: E501
 pytestmark = pytest.mark.django_db
@@ -26,3 +32,46 @@ def test_table_detail_unpublished(initial_version, client, unpublished_table):
     resp = client.get(url)
 
     assert resp.status_code == 404
+
+
+def test_table_detail_queries(initial_version, client, published_table):
+    url = reverse(
+        "table_detail",
+        kwargs={
+            "db_name": published_table.schema.database.name,
+            "pk": published_table.pk,
+        },
+    )
+
+    def count_queries():
+        with CaptureQueriesContext(connection) as context:
+            resp = client.get(url)
+        assert resp.status_code == 200
+        return len(context), resp
+
+    data_element = DataElement.objects.create(name="Age", slug="age")
+    Column.objects.create(name="Age", data_element=data_element, table=published_table)
+    # cache the published Version, as the first request would
+    published.get()
+    expected, _ = count_queries()
+
+    for i in range(200):
+        Column.objects.create(
+            name=f"Age_{i}", data_element=data_element, table=published_table
+        )
+        Table.objects.create(name=f"test_{i}", schema=published_table.schema)
+    set_usage_counts(published_table.version)
+
+    # the same number of queries however many Tables and Columns there are
+    queries, resp = count_queries()
+    assert queries == expected
+    content = resp.content.decode()
+    assert content.count("Used in 201 places") == 201
+    assert content.count('class="table-link') == 201
+
+
+def test_table_detail_wrong_database(initial_version, client, published_table):
+    url = reverse("table_detail", kwargs={"db_name": "other", "pk": published_table.pk})
+    resp = client.get(url)
+
+    assert resp.status_code == 404
@@ -0,0 +1,222 @@
+"""
+Query and time budgets for every page
+
+A Version is imported from the CSV snapshots in data/csvs/1, once for the
+module and rolled back after it, so pages are rendered with real sized
+Databases, Tables and DataElements.  Every named URL in ncdr.urls and
+metrics.urls needs a budget here, and a page going over its budget fails
+with the queries it repeated most, which are usually an N+1.
+
+How long pages take depends on the machine running the tests so the time
+budgets are only checked with --time-budgets.
+"""
+import collections
+import os
+import re
+import time
+from tempfile import NamedTemporaryFile
+
+import pytest
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, reverse
+from django.utils import timezone
+
+from metrics import urls as metrics_urls
+from ncdr import published
+from ncdr import urls as ncdr_urls
+from ncdr.importers import import_version
+from ncdr.importers.sources import CSVSource
+from ncdr.models import (
+    Column,
+    ColumnImage,
+    Database,
+    DataElement,
+    Grouping,
+    Table,
+    Version,
+)
+
+pytestmark = [pytest.mark.django_db, pytest.mark.urls("tests.urls")]
+
+CSVS = os.path.join(settings.BASE_DIR, "data", "csvs", "1")
+
+# The most queries, and seconds, each page may take.  Pages are requested by
+# a logged in user, which adds the session and User queries to every page.
+# The Data Element and Metric lists check each letter they link to has
+# something under it, with a query per letter.
+BUDGETS = {
+    "about_page": (3, 3),
+    "audit-log": (4, 3),
+    "column_detail": (6, 3),
+    "column_image_create": (3, 3),
+    "column_image_delete": (4, 3),
+    "column_image_edit": (5, 3),
+    "column_image_list": (6, 3),
+    "column_path_options_list": (4, 3),
+    "data_element_detail": (8, 3),
+    "data_element_list": (33, 3),
+    "database_detail": (5, 3),
+    "database_list": (4, 3),
+    "grouping_detail": (7, 3),
+    "grouping_redirect": (4, 3),
+    "index_view": (2, 3),
+    "login": (3, 3),
+    "metrics-about": (3, 3),
+    "metrics-detail": (4, 3),
+    "metrics-list": (32, 3),
+    "metrics-search": (4, 3),
+    "publish_version": (12, 3),
+    "search": (6, 5),
+    "search_redirect": (3, 5),
+    "search_suggest": (8, 5),
+    "switch-to-latest-version": (4, 3),
+    "switch-to-version": (4, 3),
+    "table_detail": (6, 3),
+    "unpublish_version": (4, 3),
+    "version_list": (5, 3),
+}
+
+# these only take POSTs
+POSTED = {"publish_version", "unpublish_version"}
+
+
+def url_names(patterns):
+    """
+    Get the names of the given URL patterns, and those they include, except
+    for other apps' (the admin and auth views)
+    """
+    for pattern in patterns:
+        if isinstance(pattern, URLPattern):
+            if pattern.name:
+                yield pattern.name
+        elif isinstance(pattern, URLResolver) and pattern.namespace is None:
+            # our includes are lists of patterns, the auth views' a module
+            if isinstance(pattern.urlconf_name, list):
+                yield from url_names(pattern.url_patterns)
+
+
+def repeated_queries(queries, limit=5):
+    """Describe the most repeated of the given queries, ignoring their params"""
+    counts = collections.Counter(
+        re.sub(r"'[^']*'|\b\d+\b", "?", query["sql"]) for query in queries
+    )
+    return [f"{count} x {sql}" for sql, count in counts.most_common(limit) if count > 1]
+
+
+@pytest.fixture(scope="module")
+def imported(django_db_setup, django_db_blocker):
+    """Import a published Version from the CSVs, and pick the busiest objects"""
+    with django_db_blocker.unblock(), transaction.atomic():
+        Version.objects.update(is_published=False)
+        version = Version.objects.create(
+            is_published=True, upstream_updated_ts=timezone.now()
+        )
+        import_version(version, None, False, [], CSVSource(CSVS))
+        # autovacuum can't see the uncommitted rows, so without fresh
+        # statistics pages can be planned as if the tables were empty
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        table = (
+            Table.objects.filter(version=version)
+            .select_related("schema__database")
+            .annotate(count=Count("column"))
+            .latest("count")
+        )
+        column_image = ColumnImage.objects.create(
+            image=NamedTemporaryFile(suffix=".jpg").name
+        )
+        for column in table.column_set.all()[:20]:
+            column_image.columnimagerelation_set.create(
+                database_name=table.schema.database.name,
+                schema_name=table.schema.name,
+                table_name=table.name,
+                column_name=column.name,
+            )
+
+        yield {
+            "column": Column.objects.filter(version=version)
+            .select_related("table__schema__database")
+            .latest("usage_count"),
+            "column_image": column_image,
+            "data_element": DataElement.objects.filter(versions=version)
+            .annotate(count=Count("column"))
+            .latest("count"),
+            "database": Database.objects.filter(version=version)
+            .annotate(count=Count("schemas__tables"))
+            .latest("count"),
+            "grouping": Grouping.objects.filter(versions=version)
+            .annotate(count=Count("dataelement"))
+            .latest("count"),
+            "table": table,
+            "version": version,
+        }
+
+        transaction.set_rollback(True)
+
+
+def get_url(name, objects, metric):
+    """Get the URL of the named page, showing the busiest objects"""
+    column = objects["column"]
+    table = objects["table"]
+    kwargs = {
+        "column_detail": {
+            "db_name": column.table.schema.database.name,
+            "pk": column.pk,
+        },
+        "column_image_delete": {"pk": objects["column_image"].pk},
+        "column_image_edit": {"pk": objects["column_image"].pk},
+        "data_element_detail": {"slug": objects["data_element"].slug},
+        "database_detail": {"db_name": objects["database"].name},
+        "grouping_detail": {"slug": objects["grouping"].slug},
+        "metrics-detail": {"pk": metric.pk},
+        "publish_version": {"pk": objects["version"].pk},
+        "search": {"model_name": "column"},
+        "switch-to-version": {"pk": objects["version"].pk},
+        "table_detail": {"db_name": table.schema.database.name, "pk": table.pk},
+        "unpublish_version": {"pk": objects["version"].pk},
+    }
+    query = {
+        "column_path_options_list": "?q=a",
+        "metrics-search": "?q=test",
+        "search": "?q=age",
+        "search_redirect": "?q=age",
+        "search_suggest": "?q=a",
+    }
+    return reverse(name, kwargs=kwargs.get(name)) + query.get(name, "")
+
+
+def test_every_page_has_a_budget():
+    names = set(url_names(ncdr_urls.urlpatterns)) | set(
+        url_names(metrics_urls.urlpatterns)
+    )
+    assert names == BUDGETS.keys()
+
+
+@pytest.mark.parametrize("name", sorted(BUDGETS))
+def test_page_budget(name, imported, client, user, metric, pytestconfig):
+    max_queries, max_seconds = BUDGETS[name]
+    url = get_url(name, imported, metric)
+    client.force_login(user)
+    # as it is after a worker's first request
+    published.get()
+
+    request = client.post if name in POSTED else client.get
+    with CaptureQueriesContext(connection) as context:
+        start = time.perf_counter()
+        resp = request(url)
+        duration = time.perf_counter() - start
+
+    assert resp.status_code in (200, 302), f"{url} returned {resp.status_code}"
+
+    queries = len(context)
+    if queries > max_queries:
+        pytest.fail(
+            f"{url} took {queries} queries, over its budget of {max_queries}\n"
+            + "\n".join(repeated_queries(context.captured_queries))
+        )
+    if pytestconfig.getoption("time_budgets"):
+        assert duration <= max_seconds, f"{url} took {duration:.2f}s of {max_seconds}s"
@@ -0,0 +1,8 @@
+"""
+Every URL, including the metrics pages whatever METRICS_ENABLED is set to
+"""
+from django.urls import include, path
+
+from ncdr.urls import urlpatterns as ncdr_urlpatterns
+
+urlpatterns = ncdr_urlpatterns + [path("metrics/", include("metrics.urls"))]